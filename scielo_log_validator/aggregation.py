@@ -0,0 +1,239 @@
+from datetime import datetime, timedelta
+
+import csv
+import json
+
+from scielo_log_validator import file_utils
+
+
+# Status of a collection day, from the most to the least severe
+STATUS_MISSING = 'missing'
+STATUS_INVALID = 'invalid'
+STATUS_DUPLICATE = 'duplicate'
+STATUS_UNCHECKED = 'unchecked'
+STATUS_VALID = 'valid'
+
+# Collection used for files whose name does not match any known identifier
+UNKNOWN_COLLECTION = 'unknown'
+
+CSV_FIELDS = ['collection', 'date', 'status', 'files', 'valid', 'invalid', 'unchecked', 'servers']
+
+
+def get_result_date(results):
+    """
+    Gets the day a validation result refers to.
+
+    The probable date obtained from the file content is preferred. If it is not available,
+    the date extracted from the file name is used.
+
+    Args:
+        results (dict): The results dictionary returned by validator.pipeline_validate.
+
+    Returns:
+        datetime.date: The day the results refer to, or None if it cannot be determined.
+    """
+    probably_date = results.get('probably_date')
+    if isinstance(probably_date, datetime):
+        return probably_date.date()
+
+    path_date = results.get('path', {}).get('date')
+    if isinstance(path_date, str):
+        try:
+            return datetime.strptime(path_date, '%Y-%m-%d').date()
+        except ValueError:
+            return None
+    return None
+
+
+def get_result_status(results):
+    """
+    Gets the validation status of a single result.
+
+    Args:
+        results (dict): The results dictionary returned by validator.pipeline_validate.
+
+    Returns:
+        str: 'valid' or 'invalid' if the content was validated, 'unchecked' otherwise.
+    """
+    is_valid = results.get('is_valid')
+    if not is_valid:
+        return STATUS_UNCHECKED
+    return STATUS_VALID if is_valid.get('all') else STATUS_INVALID
+
+
+class CoverageReport:
+    """
+    Incrementally aggregates validation results into a collection x day coverage matrix.
+
+    Only counters are kept for each collection day, so the memory needed is proportional
+    to the number of collection days and not to the number of validated files.
+
+    Args:
+        collections (iterable, optional): Collections expected to have files every day.
+                                          Defaults to the collections of the default collection identifiers table.
+        start_date (datetime.date, optional): First day of the report. Defaults to the earliest day seen.
+        end_date (datetime.date, optional): Last day of the report. Defaults to the latest day seen.
+    """
+
+    def __init__(self, collections=None, start_date=None, end_date=None):
+        if collections is None:
+            collections = set(file_utils.get_default_collection_matcher().collection_identifiers.values())
+
+        self.collections = set(collections)
+        self.start_date = start_date
+        self.end_date = end_date
+        self.cells = {}
+        self.undated_files = {}
+        self._min_date = None
+        self._max_date = None
+
+    def add(self, path, results):
+        """
+        Adds a validation result to the report.
+
+        Args:
+            path (str): The path of the validated file.
+            results (dict): The results dictionary returned by validator.pipeline_validate.
+        """
+        collection = results.get('path', {}).get('collection')
+        if not isinstance(collection, str):
+            collection = file_utils.extract_collection_from_path(path) or UNKNOWN_COLLECTION
+        self.collections.add(collection)
+
+        day = get_result_date(results)
+        if day is None:
+            self.undated_files[collection] = self.undated_files.get(collection, 0) + 1
+            return
+
+        if self._min_date is None or day < self._min_date:
+            self._min_date = day
+        if self._max_date is None or day > self._max_date:
+            self._max_date = day
+
+        cell = self.cells.get((collection, day))
+        if cell is None:
+            cell = {'files': 0, STATUS_VALID: 0, STATUS_INVALID: 0, STATUS_UNCHECKED: 0, 'servers': {}}
+            self.cells[(collection, day)] = cell
+
+        cell['files'] += 1
+        cell[get_result_status(results)] += 1
+
+        server = file_utils.extract_file_identifier_from_path(path) or ''
+        cell['servers'][server] = cell['servers'].get(server, 0) + 1
+
+    def get_date_range(self):
+        """
+        Gets the first and last days covered by the report.
+
+        Returns:
+            tuple: The first and last days, or (None, None) if no dated result was added.
+        """
+        return self.start_date or self._min_date, self.end_date or self._max_date
+
+    def iter_rows(self):
+        """
+        Iterates over the report rows, one per collection and day, including missing days.
+
+        Yields:
+            dict: A row with the keys listed in CSV_FIELDS.
+        """
+        start_date, end_date = self.get_date_range()
+        if start_date is None or end_date is None:
+            return
+
+        for collection in sorted(self.collections):
+            day = start_date
+            while day <= end_date:
+                cell = self.cells.get((collection, day))
+                # Files of unknown collections are reported, but no day is expected from them
+                if cell is not None or collection != UNKNOWN_COLLECTION:
+                    yield self._build_row(collection, day, cell)
+                day += timedelta(days=1)
+
+    def _build_row(self, collection, day, cell):
+        if cell is None:
+            return {
+                'collection': collection,
+                'date': day.isoformat(),
+                'status': STATUS_MISSING,
+                'files': 0,
+                STATUS_VALID: 0,
+                STATUS_INVALID: 0,
+                STATUS_UNCHECKED: 0,
+                'servers': {},
+            }
+
+        if cell[STATUS_INVALID]:
+            status = STATUS_INVALID
+        elif any(count > 1 for count in cell['servers'].values()):
+            status = STATUS_DUPLICATE
+        elif cell[STATUS_VALID]:
+            status = STATUS_VALID
+        else:
+            status = STATUS_UNCHECKED
+
+        return {
+            'collection': collection,
+            'date': day.isoformat(),
+            'status': status,
+            'files': cell['files'],
+            STATUS_VALID: cell[STATUS_VALID],
+            STATUS_INVALID: cell[STATUS_INVALID],
+            STATUS_UNCHECKED: cell[STATUS_UNCHECKED],
+            'servers': dict(sorted(cell['servers'].items())),
+        }
+
+    def to_dict(self):
+        """
+        Converts the report to a dictionary organized by collection and day.
+
+        Returns:
+            dict: A dictionary with the date range, the coverage matrix and the number of undated files per collection.
+        """
+        start_date, end_date = self.get_date_range()
+        matrix = {}
+        for row in self.iter_rows():
+            collection = row.pop('collection')
+            matrix.setdefault(collection, {})[row.pop('date')] = row
+
+        return {
+            'start_date': start_date.isoformat() if start_date else None,
+            'end_date': end_date.isoformat() if end_date else None,
+            'collections': matrix,
+            'undated_files': dict(sorted(self.undated_files.items())),
+        }
+
+    def write_json(self, fout):
+        """
+        Writes the report as JSON to a file object.
+
+        Args:
+            fout (file): A text file object.
+        """
+        json.dump(self.to_dict(), fout, indent=2)
+
+    def write_csv(self, fout):
+        """
+        Writes the report as CSV to a file object, one row per collection and day.
+
+        Args:
+            fout (file): A text file object.
+        """
+        writer = csv.DictWriter(fout, fieldnames=CSV_FIELDS)
+        writer.writeheader()
+        for row in self.iter_rows():
+            row['servers'] = ';'.join('%s:%d' % (k, v) for k, v in row['servers'].items())
+            writer.writerow(row)
+
+    def save(self, path):
+        """
+        Saves the report to a file, as CSV if the path ends with '.csv' and as JSON otherwise.
+
+        Args:
+            path (str): The output file path.
+        """
+        with open(path, 'w', newline='') as fout:
+            if path.lower().endswith('.csv'):
+                self.write_csv(fout)
+            else:
+                self.write_json(fout)
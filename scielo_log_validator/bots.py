@@ -0,0 +1,106 @@
+from functools import lru_cache
+
+import os
+import re
+
+from scielo_log_validator import values
+
+
+# Text file with additional user agent patterns of bots, one regular expression per line
+BOT_SIGNATURES_FILE = os.environ.get('BOT_SIGNATURES_FILE', '')
+
+# Number of distinct user agents whose classification is memoized
+BOT_MEMO_SIZE = int(os.environ.get('BOT_MEMO_SIZE', '65536'))
+
+# Classes a user agent may be given
+USER_AGENT_BOT = 'bot'
+USER_AGENT_HUMAN = 'human'
+USER_AGENT_UNKNOWN = 'unknown'
+
+USER_AGENT_CLASSES = (USER_AGENT_BOT, USER_AGENT_HUMAN, USER_AGENT_UNKNOWN)
+
+
+class UserAgentClassifier:
+    """
+    Classifies user agents as bots (crawlers, monitors and HTTP libraries) or humans.
+
+    All signatures are compiled into a single case-insensitive alternation, so a user agent is scanned once
+    whatever the number of signatures. As a log has few distinct user agents repeated over many lines, the
+    classification of the last memo_size distinct user agents is memoized, and most lines cost a dictionary lookup.
+
+    Args:
+        signatures (list, optional): The regular expressions matching the user agents of bots.
+                                     Defaults to values.BOT_USER_AGENT_SIGNATURES.
+        memo_size (int, optional): The number of distinct user agents whose classification is memoized.
+                                   Defaults to BOT_MEMO_SIZE.
+
+    Raises:
+        re.error: If a signature is not a valid regular expression.
+    """
+
+    def __init__(self, signatures=None, memo_size=BOT_MEMO_SIZE):
+        self.signatures = list(values.BOT_USER_AGENT_SIGNATURES if signatures is None else signatures)
+        self.pattern = re.compile('|'.join('(?:%s)' % s for s in self.signatures), re.IGNORECASE)
+        self.classify = lru_cache(maxsize=memo_size)(self._classify)
+
+    def _classify(self, user_agent):
+        """
+        Classifies a user agent.
+
+        Args:
+            user_agent (str): The user agent, as logged.
+
+        Returns:
+            str: 'bot' if it matches a signature, 'unknown' if it is empty, 'human' otherwise.
+        """
+        if not user_agent or user_agent == '-':
+            return USER_AGENT_UNKNOWN
+        if self.pattern.search(user_agent):
+            return USER_AGENT_BOT
+        return USER_AGENT_HUMAN
+
+
+_default_classifier = None
+
+
+def load_bot_signatures(path):
+    """
+    Loads user agent patterns of bots from a text file, one regular expression per line.
+
+    Blank lines and lines starting with # are ignored.
+
+    Args:
+        path (str): The path to the file.
+
+    Returns:
+        list: The patterns.
+    """
+    with open(path) as fin:
+        return [line.strip() for line in fin if line.strip() and not line.lstrip().startswith('#')]
+
+
+def set_default_classifier(classifier):
+    """
+    Replaces the classifier used when none is given explicitly.
+
+    Args:
+        classifier (UserAgentClassifier): The classifier.
+    """
+    global _default_classifier
+    _default_classifier = classifier
+
+
+def get_default_classifier():
+    """
+    Gets the classifier used when none is given explicitly, which is shared so that its memo is reused across files.
+
+    Its signatures are the built-in ones and those of the file indicated by the BOT_SIGNATURES_FILE environment variable, if any.
+
+    Returns:
+        UserAgentClassifier: The default classifier.
+    """
+    global _default_classifier
+    if _default_classifier is None:
+        extra = load_bot_signatures(BOT_SIGNATURES_FILE) if BOT_SIGNATURES_FILE else []
+        _default_classifier = UserAgentClassifier(values.BOT_USER_AGENT_SIGNATURES + extra)
+    return _default_classifier
@@ -0,0 +1,158 @@
+import os
+import time
+
+
+# Maximum number of seconds spent analyzing the content of a file (0 for no limit)
+CONTENT_TIME_BUDGET = float(os.environ.get('CONTENT_TIME_BUDGET', '0'))
+
+# Maximum number of decompressed bytes read to analyze the content of a file (0 for no limit)
+CONTENT_BYTE_BUDGET = int(os.environ.get('CONTENT_BYTE_BUDGET', '0'))
+
+# Reasons a content analysis may stop before the end of a file
+BUDGET_EXCEEDED_TIME = 'time'
+BUDGET_EXCEEDED_BYTES = 'bytes'
+
+
+class ContentBudget:
+    """
+    Wall-clock and decompressed-byte limits of the content analysis of a file.
+
+    The clock starts when the budget is created, and the bytes of every pass over the file are added up.
+    Once a limit is exceeded, the budget stays exceeded, so the analysis stops at the next check and returns
+    a partial summary of the lines read so far.
+
+    Args:
+        seconds (float, optional): The maximum number of seconds. Defaults to 0 (no limit).
+        max_bytes (int, optional): The maximum number of decompressed bytes. Defaults to 0 (no limit).
+        clock (callable, optional): The function giving the current time, in seconds. Defaults to time.monotonic.
+    """
+
+    def __init__(self, seconds=0, max_bytes=0, clock=time.monotonic):
+        self.seconds = seconds
+        self.max_bytes = max_bytes
+        self.clock = clock
+        self.started = clock()
+        self.bytes_read = 0
+        self.exceeded = None
+        self.parent = None
+
+    def check_time(self):
+        """
+        Checks whether the time limit was not exceeded.
+
+        Returns:
+            bool: True if the analysis may go on evaluating lines, False otherwise.
+        """
+        if self.exceeded == BUDGET_EXCEEDED_TIME:
+            return False
+        if self.seconds > 0 and self.clock() - self.started > self.seconds:
+            self.exceeded = self.exceeded or BUDGET_EXCEEDED_TIME
+            return False
+        return True
+
+    def is_exhausted(self):
+        """
+        Checks whether any limit was exceeded.
+
+        Returns:
+            bool: True if the analysis must not read the file any further, False otherwise.
+        """
+        return not self.check_time() or self.exceeded is not None
+
+    def add_bytes(self, size):
+        """
+        Counts bytes read against the budget, and against the budget it is a share of, if any.
+
+        Args:
+            size (int): The number of decompressed bytes read.
+        """
+        self.bytes_read += size
+        if self.parent is not None:
+            self.parent.add_bytes(size)
+
+    def get_share(self, fraction):
+        """
+        Creates a budget for a preliminary pass over the file (e.g., fingerprinting it) that may only spend a fraction
+        of this one, so that the rest is left to the analysis. The bytes read in the preliminary pass are also counted
+        against this budget, and exceeding the share does not exceed this budget.
+
+        Args:
+            fraction (float): The fraction of the time and byte limits given to the preliminary pass.
+
+        Returns:
+            ContentBudget: The budget of the preliminary pass.
+        """
+        share = ContentBudget(self.seconds * fraction, max(1, int(self.max_bytes * fraction)) if self.max_bytes > 0 else 0, self.clock)
+        share.parent = self
+        return share
+
+    def wrap(self, fileobj):
+        """
+        Wraps an open file so that its reads are counted against the budget.
+
+        Args:
+            fileobj (file): The open file, with the decompressed content.
+
+        Returns:
+            BudgetedReader: The wrapped file.
+        """
+        return BudgetedReader(fileobj, self)
+
+    def get_report(self, lines_read):
+        """
+        Describes how the analysis was limited by the budget.
+
+        Args:
+            lines_read (int): The number of lines read before the analysis stopped.
+
+        Returns:
+            dict: A dictionary containing the following keys:
+                - 'exceeded' (str): The limit that was exceeded ('time' or 'bytes').
+                - 'elapsed' (float): The number of seconds spent in the analysis.
+                - 'bytes_read' (int): The number of decompressed bytes read.
+                - 'lines_read' (int): The number of lines read.
+        """
+        return {
+            'exceeded': self.exceeded,
+            'elapsed': round(self.clock() - self.started, 3),
+            'bytes_read': self.bytes_read,
+            'lines_read': lines_read,
+        }
+
+
+class BudgetedReader:
+    """
+    File wrapper that stops returning data once a budget is exceeded.
+
+    When the byte limit is reached, the last block is cut after its last complete line, so that a partial
+    line is not analyzed.
+
+    Args:
+        fileobj (file): The open file, with the decompressed content.
+        budget (ContentBudget): The budget the reads are counted against.
+    """
+
+    def __init__(self, fileobj, budget):
+        self.fileobj = fileobj
+        self.budget = budget
+
+    def read(self, size=-1):
+        if self.budget.is_exhausted():
+            return self.fileobj.read(0)
+
+        if self.budget.max_bytes <= 0:
+            block = self.fileobj.read(size)
+            self.budget.add_bytes(len(block))
+            return block
+
+        # One byte more than the budget allows tells whether the file goes beyond it
+        remaining = self.budget.max_bytes - self.budget.bytes_read
+        block = self.fileobj.read(remaining + 1 if size is None or size < 0 else min(size, remaining + 1))
+
+        if len(block) > remaining:
+            self.budget.exceeded = BUDGET_EXCEEDED_BYTES
+            block = block[:remaining]
+            block = block[:block.rfind(b'\n' if isinstance(block, bytes) else '\n') + 1]
+
+        self.budget.add_bytes(len(block))
+        return block
@@ -0,0 +1,254 @@
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import bz2
+import io
+import mmap
+import os
+
+
+# Number of threads decompressing bzip2 blocks (bz2 releases the GIL while decompressing)
+BZ2_WORKERS = int(os.environ.get('BZ2_WORKERS', str(os.cpu_count() or 1)))
+
+# Minimum size, in bytes, of the bzip2 files whose blocks are decompressed in parallel (smaller ones are read with bz2.open)
+BZ2_PARALLEL_MIN_SIZE = int(os.environ.get('BZ2_PARALLEL_MIN_SIZE', str(8 * 1024 * 1024)))
+
+# Magic numbers that start a compressed block and the end of a stream, 48 bits each
+BLOCK_MAGIC = 0x314159265359
+END_OF_STREAM_MAGIC = 0x177245385090
+
+MAGIC_BITS = 48
+
+# Size of the buffer of the decompressed content returned by open_bz2
+READ_BUFFER_SIZE = 1024 * 1024
+
+
+def _find_magic_bit_offsets(data, magic):
+    """
+    Finds every bit offset at which a 48-bit magic number occurs in the data.
+
+    Bzip2 blocks are not aligned to bytes, so the magic number is searched at each of the 8 possible
+    bit shifts. For each shift, the 5 bytes it fully determines are searched with a fast byte search,
+    and candidates are then checked bit by bit.
+
+    Args:
+        data (bytes or mmap.mmap): The compressed data.
+        magic (int): The 48-bit magic number.
+
+    Returns:
+        list: The sorted bit offsets.
+    """
+    offsets = []
+    for shift in range(8):
+        # Window of 7 bytes: 'shift' bits before the magic number and '8 - shift' bits after it
+        window = magic << (8 - shift)
+        needle = ((window >> 8) & 0xFFFFFFFFFF).to_bytes(5, 'big')
+
+        position = data.find(needle, 1)
+        while position != -1:
+            start = position - 1
+            if start + 7 <= len(data):
+                found = (int.from_bytes(data[start:start + 7], 'big') >> (8 - shift)) & ((1 << MAGIC_BITS) - 1)
+                if found == magic:
+                    offsets.append(start * 8 + shift)
+            position = data.find(needle, position + 1)
+
+    return sorted(offsets)
+
+
+def find_block_segments(data):
+    """
+    Finds the bit ranges of the compressed blocks of a bzip2 file, which may contain several streams.
+
+    A block starts at a block magic number and ends at the next block or end-of-stream magic number.
+
+    Args:
+        data (bytes or mmap.mmap): The compressed data.
+
+    Returns:
+        tuple: A list of (start bit, end bit) ranges and a boolean indicating whether the last
+               block is not followed by any magic number (i.e., the file is truncated).
+    """
+    block_offsets = _find_magic_bit_offsets(data, BLOCK_MAGIC)
+    markers = sorted(block_offsets + _find_magic_bit_offsets(data, END_OF_STREAM_MAGIC))
+    next_marker = {m: n for m, n in zip(markers, markers[1:])}
+
+    segments = []
+    truncated = False
+    for offset in block_offsets:
+        if offset in next_marker:
+            segments.append((offset, next_marker[offset]))
+        else:
+            truncated = True
+    return segments, truncated
+
+
+def build_single_block_stream(data, start_bit, end_bit):
+    """
+    Builds a standalone bzip2 stream containing only the block found between two bit offsets.
+
+    The block is prefixed with a stream header and followed by an end-of-stream magic number and
+    the stream CRC, which, for a single block, is the CRC stored in the block header.
+
+    Args:
+        data (bytes or mmap.mmap): The compressed data.
+        start_bit (int): The bit offset of the block magic number.
+        end_bit (int): The bit offset right after the block.
+
+    Returns:
+        bytes: The bzip2 stream.
+    """
+    first_byte = start_bit // 8
+    last_byte = (end_bit + 7) // 8
+    bits = int.from_bytes(data[first_byte:last_byte], 'big')
+
+    # Drop the bits after the block, then the bits before it
+    bits >>= last_byte * 8 - end_bit
+    n_bits = end_bit - start_bit
+    bits &= (1 << n_bits) - 1
+
+    block_crc = (bits >> (n_bits - MAGIC_BITS - 32)) & 0xFFFFFFFF
+
+    stream_bits = (((bits << MAGIC_BITS) | END_OF_STREAM_MAGIC) << 32) | block_crc
+    n_stream_bits = n_bits + MAGIC_BITS + 32
+    padding = -n_stream_bits % 8
+
+    # Level 9 accepts blocks of any size
+    return b'BZh9' + (stream_bits << padding).to_bytes((n_stream_bits + padding) // 8, 'big')
+
+
+def decompress_segment(data, segment):
+    """
+    Decompresses the block found in a bit range of bzip2 data.
+
+    Args:
+        data (bytes or mmap.mmap): The compressed data.
+        segment (tuple): The (start bit, end bit) range of the block.
+
+    Returns:
+        bytes: The decompressed block.
+
+    Raises:
+        OSError, ValueError: If the range does not contain a valid block.
+    """
+    return bz2.decompress(build_single_block_stream(data, *segment))
+
+
+class ParallelBZ2RawReader(io.RawIOBase):
+    """
+    Reads a bzip2 file by decompressing its blocks in parallel and returning them in order.
+
+    At most 2 * workers blocks are decompressed ahead of the reader. A magic number found by chance inside
+    compressed data splits a block in two invalid parts, which are then joined and decompressed again.
+
+    Args:
+        path (str): The path to the bzip2 file.
+        workers (int, optional): The number of decompressing threads. Defaults to BZ2_WORKERS.
+    """
+
+    def __init__(self, path, workers=BZ2_WORKERS):
+        super().__init__()
+        self._file = open(path, 'rb')
+        self._data = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        segments, self._truncated = find_block_segments(self._data)
+        self._block_count = len(segments)
+        self._segments = deque(segments)
+        self._pending = deque()
+        self._executor = ThreadPoolExecutor(max_workers=max(1, workers))
+        self._max_pending = 2 * max(1, workers)
+        self._chunk = b''
+        self._chunk_offset = 0
+
+    @property
+    def block_count(self):
+        """
+        int: The number of compressed blocks found in the file.
+        """
+        return self._block_count
+
+    def readable(self):
+        return True
+
+    def _submit(self):
+        while self._segments and len(self._pending) < self._max_pending:
+            segment = self._segments.popleft()
+            self._pending.append((segment, self._executor.submit(decompress_segment, self._data, segment)))
+
+    def _next_chunk(self):
+        self._submit()
+        if not self._pending:
+            if self._truncated:
+                raise EOFError('Compressed file ended before the end-of-stream marker was reached')
+            return None
+
+        segment, future = self._pending.popleft()
+        try:
+            chunk = future.result()
+        except (OSError, ValueError):
+            chunk = None
+
+        # Join the segment with the next ones until they form a valid block
+        while chunk is None:
+            if not self._pending:
+                self._submit()
+            if not self._pending:
+                raise OSError('Invalid data stream')
+
+            next_segment, next_future = self._pending.popleft()
+            next_future.cancel()
+            segment = (segment[0], next_segment[1])
+            try:
+                chunk = decompress_segment(self._data, segment)
+            except (OSError, ValueError):
+                chunk = None
+
+        self._submit()
+        return chunk
+
+    def readinto(self, buffer):
+        while self._chunk_offset >= len(self._chunk):
+            chunk = self._next_chunk()
+            if chunk is None:
+                return 0
+            self._chunk = chunk
+            self._chunk_offset = 0
+
+        size = min(len(buffer), len(self._chunk) - self._chunk_offset)
+        buffer[:size] = self._chunk[self._chunk_offset:self._chunk_offset + size]
+        self._chunk_offset += size
+        return size
+
+    def close(self):
+        if not self.closed:
+            for _, future in self._pending:
+                future.cancel()
+            self._executor.shutdown(wait=True)
+            self._pending.clear()
+            self._data.close()
+            self._file.close()
+        super().close()
+
+
+def open_bz2(path, mode='rb', workers=BZ2_WORKERS, min_size=BZ2_PARALLEL_MIN_SIZE):
+    """
+    Opens a bzip2 file for reading, decompressing its blocks in parallel when it has more than one.
+
+    The blocks are only decompressed in parallel on a machine with more than one CPU and for files of at least
+    min_size bytes, since otherwise the threads cannot overlap and bz2.open is faster.
+
+    Args:
+        path (str): The path to the bzip2 file.
+        mode (str, optional): The opening mode; only reading is supported and the content is always binary.
+        workers (int, optional): The number of decompressing threads. Defaults to BZ2_WORKERS.
+        min_size (int, optional): The minimum size of the file, in bytes. Defaults to BZ2_PARALLEL_MIN_SIZE.
+
+    Returns:
+        file: A binary file object with the decompressed content.
+    """
+    if workers > 1 and (os.cpu_count() or 1) > 1 and os.path.getsize(path) >= max(1, min_size):
+        raw = ParallelBZ2RawReader(path, workers)
+        if raw.block_count > 1:
+            return io.BufferedReader(raw, buffer_size=READ_BUFFER_SIZE)
+        raw.close()
+    return bz2.open(path, 'rb')
@@ -0,0 +1,238 @@
+import base64
+import hashlib
+import math
+import os
+import zlib
+
+
+# Number of index bits of the HyperLogLog sketches of a file (2 ** precision registers, with a relative error of about 1.04 / sqrt(2 ** precision))
+HLL_PRECISION = int(os.environ.get('HLL_PRECISION', '12'))
+
+# Number of index bits of the HyperLogLog sketches of each hour of a file, which are smaller since a file has many hours
+HLL_HOUR_PRECISION = int(os.environ.get('HLL_HOUR_PRECISION', '10'))
+
+# IP types whose distinct addresses are counted
+SKETCHED_IP_TYPES = ('local', 'remote')
+
+
+class HyperLogLog:
+    """
+    Fixed-size sketch estimating the number of distinct values added to it.
+
+    Each value is hashed to 64 bits: the first `precision` bits select a register, which keeps the highest
+    position of the first set bit among the remaining bits. Adding a value twice does not change the sketch,
+    and the union of two sets is estimated by merging their sketches, so sketches of chunks, workers and
+    files can be combined in any order.
+
+    Args:
+        precision (int, optional): The number of index bits, between 4 and 16. Defaults to HLL_PRECISION.
+        registers (bytearray, optional): The registers of an existing sketch. Defaults to empty registers.
+
+    Raises:
+        ValueError: If the precision is out of range or does not match the number of registers.
+    """
+
+    def __init__(self, precision=HLL_PRECISION, registers=None):
+        if not 4 <= precision <= 16:
+            raise ValueError('HyperLogLog precision must be between 4 and 16: %s' % precision)
+
+        self.precision = precision
+        self.registers = bytearray(1 << precision) if registers is None else bytearray(registers)
+        if len(self.registers) != 1 << precision:
+            raise ValueError('HyperLogLog with precision %d must have %d registers' % (precision, 1 << precision))
+
+        self._value_bits = 64 - precision
+        self._value_mask = (1 << self._value_bits) - 1
+
+    def add(self, value):
+        """
+        Adds a value to the sketch.
+
+        Args:
+            value (str or bytes): The value (e.g., an IP address).
+        """
+        if isinstance(value, str):
+            value = value.encode('utf-8', errors='surrogateescape')
+        x = int.from_bytes(hashlib.blake2b(value, digest_size=8).digest(), 'big')
+
+        index = x >> self._value_bits
+        rank = self._value_bits - (x & self._value_mask).bit_length() + 1
+        if rank > self.registers[index]:
+            self.registers[index] = rank
+
+    def merge(self, other):
+        """
+        Adds the values of another sketch to this one.
+
+        Args:
+            other (HyperLogLog): A sketch with the same precision.
+
+        Returns:
+            HyperLogLog: This sketch.
+
+        Raises:
+            ValueError: If the sketches have different precisions.
+        """
+        if other.precision != self.precision:
+            raise ValueError('Cannot merge HyperLogLog sketches with precisions %d and %d' % (self.precision, other.precision))
+        self.registers = bytearray(map(max, self.registers, other.registers))
+        return self
+
+    def count(self):
+        """
+        Estimates the number of distinct values added to the sketch.
+
+        Returns:
+            int: The estimate.
+        """
+        m = len(self.registers)
+        alpha = {16: 0.673, 32: 0.697, 64: 0.709}.get(m, 0.7213 / (1 + 1.079 / m))
+        estimate = alpha * m * m / math.fsum(2.0 ** -r for r in self.registers)
+
+        # Linear counting is more accurate while many registers are still empty
+        zeros = self.registers.count(0)
+        if estimate <= 2.5 * m and zeros:
+            estimate = m * math.log(m / zeros)
+
+        return int(round(estimate))
+
+    def to_string(self):
+        """
+        Converts the sketch into a compact string.
+
+        Returns:
+            str: The precision and the compressed registers, in base 64.
+        """
+        return '%d:%s' % (self.precision, base64.b64encode(zlib.compress(bytes(self.registers))).decode('ascii'))
+
+    @classmethod
+    def from_string(cls, value):
+        """
+        Creates a sketch from a string created by to_string.
+
+        Args:
+            value (str): The string.
+
+        Returns:
+            HyperLogLog: The sketch.
+        """
+        precision, registers = value.split(':', 1)
+        return cls(int(precision), zlib.decompress(base64.b64decode(registers)))
+
+    def __eq__(self, other):
+        return isinstance(other, HyperLogLog) and self.precision == other.precision and self.registers == other.registers
+
+    def __repr__(self):
+        return 'HyperLogLog(precision=%d, count=%d)' % (self.precision, self.count())
+
+
+class DistinctIpSketches:
+    """
+    HyperLogLog sketches of the distinct local and remote IPs of a file, overall and per hour.
+
+    Args:
+        precision (int, optional): The precision of the sketches of the file. Defaults to HLL_PRECISION.
+        hour_precision (int, optional): The precision of the sketches of each hour. Defaults to HLL_HOUR_PRECISION.
+    """
+
+    def __init__(self, precision=HLL_PRECISION, hour_precision=HLL_HOUR_PRECISION):
+        self.precision = precision
+        self.hour_precision = hour_precision
+        self.sketches = {ip_type: HyperLogLog(precision) for ip_type in SKETCHED_IP_TYPES}
+        self.hours = {}
+
+    def add(self, ip_type, ip, hour=None):
+        """
+        Adds the IP of a line.
+
+        Args:
+            ip_type (str): The IP type. Types other than local and remote are ignored.
+            ip (str): The IP address.
+            hour (tuple, optional): The (year, month, day, hour) of the line. Defaults to None (unknown hour).
+        """
+        if ip_type not in self.sketches:
+            return
+        self.sketches[ip_type].add(ip)
+
+        if hour is not None:
+            hour_sketches = self.hours.get(hour)
+            if hour_sketches is None:
+                hour_sketches = self.hours[hour] = {t: HyperLogLog(self.hour_precision) for t in SKETCHED_IP_TYPES}
+            hour_sketches[ip_type].add(ip)
+
+    def merge(self, other):
+        """
+        Adds the IPs of other sketches (e.g., of another chunk or file) to these ones.
+
+        Args:
+            other (DistinctIpSketches): The other sketches, with the same precisions.
+
+        Returns:
+            DistinctIpSketches: These sketches.
+        """
+        for ip_type, sketch in other.sketches.items():
+            self.sketches[ip_type].merge(sketch)
+
+        for hour, hour_sketches in other.hours.items():
+            if hour not in self.hours:
+                self.hours[hour] = {t: HyperLogLog(self.hour_precision) for t in SKETCHED_IP_TYPES}
+            for ip_type, sketch in hour_sketches.items():
+                self.hours[hour][ip_type].merge(sketch)
+        return self
+
+    def get_counts(self):
+        """
+        Estimates the number of distinct IPs of each type.
+
+        Returns:
+            dict: A dictionary mapping 'local' and 'remote' to their estimates.
+        """
+        return {ip_type: sketch.count() for ip_type, sketch in self.sketches.items()}
+
+    def get_hour_counts(self):
+        """
+        Estimates the number of distinct IPs of each type in each hour.
+
+        Returns:
+            dict: A dictionary mapping each (year, month, day, hour) to the estimates of its IP types.
+        """
+        return {hour: {t: s.count() for t, s in sketches.items()} for hour, sketches in self.hours.items()}
+
+    def serialize(self):
+        """
+        Converts the sketches into a JSON-compatible dictionary.
+
+        Returns:
+            dict: The sketches, as strings (see HyperLogLog.to_string), with the hours as [year, month, day, hour, sketches] lists.
+        """
+        return {
+            'sketches': {t: s.to_string() for t, s in self.sketches.items()},
+            'hours': [list(hour) + [{t: s.to_string() for t, s in sketches.items()}] for hour, sketches in self.hours.items()],
+        }
+
+    @classmethod
+    def deserialize(cls, serialized):
+        """
+        Creates sketches from a dictionary created by serialize.
+
+        Args:
+            serialized (dict): The JSON-compatible sketches.
+
+        Returns:
+            DistinctIpSketches: The sketches.
+        """
+        sketches = {t: HyperLogLog.from_string(s) for t, s in serialized['sketches'].items()}
+        hours = {tuple(item[:4]): {t: HyperLogLog.from_string(s) for t, s in item[4].items()} for item in serialized['hours']}
+
+        distinct_ips = cls(
+            precision=next(iter(sketches.values())).precision,
+            hour_precision=next(iter(hours.values()))['remote'].precision if hours else HLL_HOUR_PRECISION)
+        distinct_ips.sketches.update(sketches)
+        distinct_ips.hours = hours
+        return distinct_ips
+
+    def __eq__(self, other):
+        return isinstance(other, DistinctIpSketches) and self.sketches == other.sketches and self.hours == other.hours
+
+    def __repr__(self):
+        return 'DistinctIpSketches(%s, hours=%d)' % (', '.join('%s=%d' % item for item in self.get_counts().items()), len(self.hours))
@@ -0,0 +1,149 @@
+import json
+import os
+import socket
+
+from ipaddress import ip_network
+
+
+# JSON file mapping CIDR blocks to IP types, used to classify the addresses of proxies, CDNs and crawlers
+CIDR_TABLE_FILE = os.environ.get('CIDR_TABLE_FILE', '')
+
+# Types an address may be given in a CIDR table
+IP_TYPE_LOCAL = 'local'
+IP_TYPE_REMOTE = 'remote'
+IP_TYPE_UNKNOWN = 'unknown'
+IP_TYPE_PROXY = 'proxy'
+
+IP_TYPES = (IP_TYPE_LOCAL, IP_TYPE_REMOTE, IP_TYPE_UNKNOWN, IP_TYPE_PROXY)
+
+
+class CidrTable:
+    """
+    Classifies IPv4 and IPv6 addresses by the longest CIDR block of a table containing them.
+
+    Blocks are stored in a multibit trie with 8-bit strides, one level per byte of the packed address.
+    A block whose length is not a multiple of 8 is expanded into every value of its last, partial byte,
+    and blocks are inserted from the shortest to the longest, so a lookup only walks the bytes of the address
+    (at most 4 for IPv4 and 16 for IPv6) and the last label found is the one of the longest block.
+
+    Args:
+        blocks (dict): A dictionary mapping CIDR blocks (e.g., '10.1.0.0/16' or '2001:db8::/32') to labels.
+    """
+
+    def __init__(self, blocks):
+        self.blocks = dict(blocks)
+        self._roots = {socket.AF_INET: [{}, {}, None], socket.AF_INET6: [{}, {}, None]}
+
+        networks = [(ip_network(block, strict=False), label) for block, label in self.blocks.items()]
+        for network, label in sorted(networks, key=lambda item: item[0].prefixlen):
+            self._insert(network, label)
+
+    def _insert(self, network, label):
+        family = socket.AF_INET if network.version == 4 else socket.AF_INET6
+        node = self._roots[family]
+        packed = network.network_address.packed
+        full_bytes, partial_bits = divmod(network.prefixlen, 8)
+
+        if network.prefixlen == 0:
+            node[2] = label
+            return
+
+        # Each node holds its children, the labels of its byte values and the label of the whole node
+        for i in range(full_bytes - 1 if partial_bits == 0 else full_bytes):
+            node = node[0].setdefault(packed[i], [{}, {}, None])
+
+        if partial_bits == 0:
+            node[1][packed[full_bytes - 1]] = label
+        else:
+            first = packed[full_bytes]
+            for value in range(first, first + (1 << (8 - partial_bits))):
+                node[1][value] = label
+
+    def lookup(self, ip):
+        """
+        Gets the label of the longest block containing an address.
+
+        Args:
+            ip (str): The IPv4 or IPv6 address.
+
+        Returns:
+            str: The label of the block, or None if the address is invalid or no block contains it.
+        """
+        if ':' in ip:
+            family = socket.AF_INET6
+        else:
+            family = socket.AF_INET
+
+        try:
+            packed = socket.inet_pton(family, ip)
+        except (OSError, ValueError):
+            return None
+
+        node = self._roots[family]
+        label = node[2]
+        for value in packed:
+            labels, children = node[1], node[0]
+            if value in labels:
+                label = labels[value]
+            node = children.get(value)
+            if node is None:
+                break
+        return label
+
+
+_default_cidr_table = None
+_default_cidr_table_loaded = False
+
+
+def load_cidr_table(path):
+    """
+    Loads a CIDR table from a JSON file.
+
+    The file must contain a JSON object mapping CIDR blocks to IP types, e.g.
+    {"200.136.72.0/24": "proxy", "2001:db8::/32": "local"}. Addresses of 'proxy' blocks are not counted as
+    the client of a request, whose address is then taken from the forwarded IP list, if any.
+
+    Args:
+        path (str): The path to the JSON file.
+
+    Returns:
+        CidrTable: The table.
+
+    Raises:
+        ValueError: If the file content is not a JSON object mapping valid CIDR blocks to known IP types.
+    """
+    with open(path) as fin:
+        loaded = json.load(fin)
+
+    if not isinstance(loaded, dict) or not all(isinstance(k, str) and v in IP_TYPES for k, v in loaded.items()):
+        raise ValueError('File %s must contain a JSON object mapping CIDR blocks to one of %s' % (path, ', '.join(IP_TYPES)))
+
+    return CidrTable(loaded)
+
+
+def set_default_cidr_table(cidr_table):
+    """
+    Replaces the CIDR table used when none is given explicitly.
+
+    Args:
+        cidr_table (CidrTable): The table, or None to classify addresses only by their built-in categories.
+    """
+    global _default_cidr_table, _default_cidr_table_loaded
+    _default_cidr_table = cidr_table
+    _default_cidr_table_loaded = True
+
+
+def get_default_cidr_table():
+    """
+    Gets the CIDR table used when none is given explicitly.
+
+    It is loaded from the JSON file indicated by the CIDR_TABLE_FILE environment variable, if any.
+
+    Returns:
+        CidrTable: The default table, or None if there is none.
+    """
+    global _default_cidr_table, _default_cidr_table_loaded
+    if not _default_cidr_table_loaded:
+        _default_cidr_table = load_cidr_table(CIDR_TABLE_FILE) if CIDR_TABLE_FILE else None
+        _default_cidr_table_loaded = True
+    return _default_cidr_table
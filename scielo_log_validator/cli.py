@@ -0,0 +1,312 @@
+# -*- coding: UTF-8 -*-
+from argparse import ArgumentParser
+from functools import partial
+from pprint import pprint
+
+import json
+import os
+import signal
+import sys
+
+from scielo_log_validator import (
+    aggregation,
+    bots,
+    budget,
+    cidr,
+    columnar,
+    file_utils,
+    fingerprint,
+    invalid_lines,
+    prefetch,
+    profiling,
+    storage,
+    traffic,
+    validator,
+    values,
+    watch,
+    work_queue,
+    worker_pool,
+)
+
+
+# Default message for the application
+COMMAND_LINE_SCRIPT_MESSAGE = '''
+SciELO Log Validator
+
+This script is responsible for validating log usage records obtained from the SciELO Network Apache Servers.
+A validation is composed of two main aspects as follows:
+    1) Validation with regard to the file name
+    2) Validation with regard to the file content
+'''
+
+
+def build_validate_kwargs(params):
+    """
+    Builds the keyword arguments of validator.pipeline_validate given by the command line, shared by its execution modes.
+
+    Args:
+        params (argparse.Namespace): The parsed command line arguments.
+
+    Returns:
+        dict: The keyword arguments, without the path and the objects shared by the files of a run (e.g., the fingerprint index).
+    """
+    return {
+        'sample_size': params.sample_size,
+        'buffer_size': params.buffer_size,
+        'days_delta': params.days_delta,
+        'apply_path_validation': params.apply_path_validation,
+        'apply_content_validation': params.apply_content_validation,
+        'block_size': params.block_size,
+        'queue_depth': params.reader_queue_depth,
+        'adaptive_sampling': params.adaptive_sampling,
+        'detect_mime': params.detect_mime is not False,
+        'time_budget': params.time_budget,
+        'byte_budget': params.byte_budget,
+        'distinct_ips': params.distinct_ips,
+        'distinct_ip_rule': params.distinct_ip_rule,
+        'user_agents': params.user_agents,
+        'invalid_samples': params.invalid_samples,
+    }
+
+
+def build_parser():
+    """
+    Builds the parser of the command line arguments.
+
+    Returns:
+        argparse.ArgumentParser: The parser.
+    """
+    parser = ArgumentParser()
+
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument('-p', '--path', help='File or directory to be checked (- reads a file from the standard input); http(s):// and s3:// URLs are read with range requests, and s3:// URLs ending with / are listed as directories')
+    source.add_argument('--inventory', help='File listing one path per line (- reads the list from the standard input) whose names are validated without reading the files; results are printed as JSON lines')
+    source.add_argument('--work', help='SQLite queue file (e.g., on storage shared by several nodes) whose jobs are leased and validated until none is left', default=None)
+    source.add_argument('--queue_status', help='SQLite queue file whose job counts and failures are printed (and whose results are written to --coverage_report)', default=None)
+    parser.add_argument('--enqueue', help='SQLite queue file (created if it does not exist) the files of --path or --inventory are added to, instead of validating them', default=None)
+    parser.add_argument('--queue_batch_size', help='Number of jobs a worker leases at a time', default=1, type=int)
+    parser.add_argument('--name', help='Original file name of the log read from the standard input, used for path validation', default=None)
+    parser.add_argument('-s', '--sample_size', help='Sample size to be checked (must be between 0 and 1)', default=0.1, type=float)
+    parser.add_argument('--adaptive_sampling', help='Size the content sample of each file for a target precision of its estimates (ADAPTIVE_SAMPLE_MARGIN) instead of using the sample size', action='store_true', default=False)
+    parser.add_argument('-b', '--buffer_size', help='Buffer size for file type checking', default=2048, type=int)
+    parser.add_argument('-d', '--days_delta', help='Number of days to determine the threshold for significant date difference', default=5, type=int)
+    parser.add_argument('--block_size', help='Number of decompressed bytes read at a time in the content analysis', default=validator.READ_BLOCK_SIZE, type=int)
+    parser.add_argument('--time_budget', help='Maximum number of seconds spent analyzing the content of each file, after which it is validated from the lines read so far (0 for no limit)', default=budget.CONTENT_TIME_BUDGET, type=float)
+    parser.add_argument('--byte_budget', help='Maximum number of decompressed bytes read to analyze the content of each file, after which it is validated from the lines read so far (0 for no limit)', default=budget.CONTENT_BYTE_BUDGET, type=int)
+    parser.add_argument('--reader_queue_depth', help='Number of blocks a reader thread may decompress ahead of the content analysis (0 disables the reader thread)', default=validator.READER_QUEUE_DEPTH, type=int)
+    parser.add_argument('--prefetch_files', help='Number of files of a directory read into the OS cache, on a separate thread, ahead of the file being validated', default=prefetch.PREFETCH_FILES, type=int)
+    parser.add_argument('--prefetch_bytes', help='Maximum number of bytes of the files read ahead that are not validated yet', default=prefetch.PREFETCH_BYTES, type=int)
+    parser.add_argument('--drop_cache', help='Drop the pages of each file of a directory from the OS cache once it is validated', action='store_true', default=prefetch.DROP_CACHE_AFTER_READ)
+    parser.add_argument('--external_decompressor', help='Decompress files with an external command (e.g., pigz, igzip, zstd) when one is found on PATH', action='store_true', default=file_utils.USE_EXTERNAL_DECOMPRESSOR)
+    parser.add_argument('--no_path_validation', help='Deactivate path validation', action='store_false', dest='apply_path_validation', default=True)
+    parser.add_argument('--no_content_validation', help='Deactivate content validation', action='store_false', dest='apply_content_validation', default=True)
+    parser.add_argument('--detect_mime', help='Detect the MIME type of the files of an inventory (by default, only with --path)', action='store_true', dest='detect_mime', default=None)
+    parser.add_argument('--no_mime_detection', help='Do not open files to detect their MIME type in path validation', action='store_false', dest='detect_mime')
+    parser.add_argument('--collection_identifiers', help='JSON file mapping additional file name identifiers to collection IDs', default=None)
+    parser.add_argument('--distinct_ips', help='Estimate the number of distinct local and remote IPs of each file, overall and per hour, with HyperLogLog sketches', action='store_true', default=False)
+    parser.add_argument('--distinct_ip_rule', help='Validate the IP distribution from the distinct IPs instead of the lines (implies --distinct_ips)', action='store_true', default=False)
+    parser.add_argument('--user_agents', help='Count the lines of each file whose user agent is a bot (crawler, monitor or HTTP library) or a human', action='store_true', default=False)
+    parser.add_argument('--bot_signatures', help='Text file with additional user agent patterns of bots, one regular expression per line', default=None)
+    parser.add_argument('--invalid_samples', help='Number of invalid lines of each file kept as examples, with their line numbers, byte offsets and the reason they are invalid', default=invalid_lines.INVALID_LINE_SAMPLE_SIZE, type=int)
+    parser.add_argument('--cidr_table', help='JSON file mapping CIDR blocks (e.g., of proxies, CDNs and crawlers) to IP types (local, remote, unknown or proxy)', default=None)
+    parser.add_argument('--traffic_baseline', help='JSON file with the per-collection hour-of-day baseline used to detect traffic anomalies (created if it does not exist)', default=None)
+    parser.add_argument('--fingerprint_index', help='JSON file indexing the content fingerprints of validated files, used to skip duplicated files (created if it does not exist)', default=None)
+    parser.add_argument('--watch', help='Keep watching the directory and validate files as they are written into it (until interrupted)', action='store_true', default=False)
+    parser.add_argument('--watch_debounce', help='Number of seconds a file must stay unchanged before it is validated in watch mode', default=watch.WATCH_DEBOUNCE_SECONDS, type=float)
+    parser.add_argument('--workers', help='Number of processes validating files in parallel in watch mode (all CPUs by default) and directory mode (none by default)', default=None, type=int)
+    parser.add_argument('--worker_max_files', help='Number of files a worker process of the directory mode validates before it is replaced (0 for no limit)', default=worker_pool.WORKER_MAX_FILES, type=int)
+    parser.add_argument('--worker_max_rss', help='Resident memory, in MB, above which a worker process of the directory mode is replaced (0 for no limit)', default=worker_pool.WORKER_MAX_RSS_MB, type=int)
+    parser.add_argument('--coverage_report', help='File to write the collection x day coverage report to (CSV if it ends with .csv, JSON otherwise)', default=None)
+    parser.add_argument('--profile', help='Directory to write the cProfile profiles of slow files and the summary of the hottest functions to', default=None)
+    parser.add_argument('--profile_min_seconds', help='Minimum number of seconds a file must take to be validated for its profile to be written', default=profiling.PROFILE_MIN_SECONDS, type=float)
+    parser.add_argument('--profile_memory', help='Trace the memory allocations of the profiled files with tracemalloc', action='store_true', default=False)
+    parser.add_argument('--columnar_store', help='Directory of the columnar store the hour histograms, IP counts and verdicts of the validated files are appended to', default=None)
+    return parser
+
+
+def main():
+    """
+    Validates the files given by the command line, in the execution mode given by its arguments
+    (a file, a directory, the standard input, an inventory, a shared queue or a watched directory).
+    """
+    parser = build_parser()
+    params = parser.parse_args()
+
+    file_utils.USE_EXTERNAL_DECOMPRESSOR = params.external_decompressor
+
+    if params.collection_identifiers:
+        file_utils.set_default_collection_identifiers(file_utils.load_collection_identifiers(params.collection_identifiers))
+
+    if params.cidr_table:
+        cidr.set_default_cidr_table(cidr.load_cidr_table(params.cidr_table))
+
+    if params.bot_signatures:
+        bots.set_default_classifier(bots.UserAgentClassifier(values.BOT_USER_AGENT_SIGNATURES + bots.load_bot_signatures(params.bot_signatures)))
+
+    coverage_report = aggregation.CoverageReport() if params.coverage_report else None
+    columnar_store = columnar.ColumnarStore(params.columnar_store) if params.columnar_store else None
+
+    if params.path and storage.is_remote_path(params.path) and params.path.endswith('/') and not storage.can_list(params.path):
+        parser.error('%s cannot be listed; only s3:// directories are supported' % params.path)
+
+    if params.enqueue:
+        # Add the files to a queue, to be validated by workers (possibly on several nodes)
+        if params.inventory:
+            paths = validator.iter_inventory_paths(params.inventory)
+        elif params.path and validator.get_execution_mode(params.path) == 'validate-directory':
+            paths = validator.iter_directory_files(params.path)
+        elif params.path and params.path != '-':
+            paths = [params.path]
+        else:
+            parser.error('--enqueue requires --path (a file or a directory) or --inventory')
+
+        added = work_queue.SqliteWorkQueue(params.enqueue).enqueue(paths)
+        print('%d jobs added to %s' % (added, params.enqueue))
+        return
+
+    if params.queue_status:
+        # Report the progress of a queue and collect the results written back by the workers
+        status_queue = work_queue.SqliteWorkQueue(params.queue_status)
+        print(json.dumps(status_queue.get_counts()))
+        for file_path, error in status_queue.iter_failures():
+            print(json.dumps({file_path: error}))
+
+        if coverage_report is not None or columnar_store is not None:
+            for file_path, results in status_queue.iter_results():
+                if coverage_report is not None:
+                    coverage_report.add(file_path, results)
+
+                if columnar_store is not None:
+                    columnar_store.add(file_path, results)
+
+        if coverage_report is not None:
+            coverage_report.save(params.coverage_report)
+
+        if columnar_store is not None:
+            columnar_store.close()
+        return
+
+    if params.inventory:
+        # Validate the file names of an inventory, printing one JSON object per line
+        for file_path, results in validator.pipeline_validate_paths(
+            validator.iter_inventory_paths(params.inventory),
+            apply_path_validation=params.apply_path_validation,
+            detect_mime=bool(params.detect_mime)):
+            print(json.dumps({file_path: results}))
+
+            if coverage_report is not None:
+                coverage_report.add(file_path, results)
+
+            if columnar_store is not None:
+                columnar_store.add(file_path, results)
+
+        if coverage_report is not None:
+            coverage_report.save(params.coverage_report)
+
+        if columnar_store is not None:
+            columnar_store.close()
+        return
+
+    # Determine the execution mode based on the provided path
+    execution_mode = 'work' if params.work else validator.get_execution_mode(params.path)
+
+    print(COMMAND_LINE_SCRIPT_MESSAGE)
+
+    traffic_baseline = traffic.TrafficBaseline(params.traffic_baseline) if params.traffic_baseline else None
+    fingerprint_index = fingerprint.FingerprintIndex(params.fingerprint_index) if params.fingerprint_index else None
+    profiler = profiling.FileProfiler(params.profile, min_seconds=params.profile_min_seconds, trace_memory=params.profile_memory) if params.profile else None
+    validate_kwargs = build_validate_kwargs(params)
+
+    def handle_result(file_path, results):
+        # The traffic profile only needs the content summary, so it is analyzed here, where the baseline is shared by every file
+        if traffic_baseline is not None and 'content' in results:
+            results['traffic'] = validator.validate_traffic_profile(file_path, results, traffic_baseline)
+        print(file_path)
+        pprint(results)
+        sys.stdout.flush()
+
+        if coverage_report is not None:
+            coverage_report.add(file_path, results)
+
+        if columnar_store is not None:
+            columnar_store.add(file_path, results)
+
+    if execution_mode == 'work':
+        # Validate the jobs of a shared queue; the traffic baseline and the fingerprint index are local files
+        # that several nodes cannot update at once
+        if traffic_baseline is not None or fingerprint_index is not None:
+            parser.error('--traffic_baseline and --fingerprint_index are not supported with --work')
+
+        stopping = []
+        signal.signal(signal.SIGTERM, lambda *_: stopping.append(True))
+
+        try:
+            work_queue.run_worker(work_queue.SqliteWorkQueue(params.work), partial(validator.pipeline_validate, profiler=profiler, **validate_kwargs), handle_result, batch_size=params.queue_batch_size, should_stop=lambda: bool(stopping))
+        except KeyboardInterrupt:
+            pass
+
+    elif params.watch:
+        if execution_mode != 'validate-directory' or storage.is_remote_path(params.path):
+            parser.error('--watch requires a local directory')
+        if fingerprint_index is not None:
+            parser.error('--fingerprint_index is not supported with --watch')
+        if profiler is not None:
+            # Files are validated in other processes, whose profiles would not be summarized
+            parser.error('--profile is not supported with --watch')
+
+        stopping = []
+        signal.signal(signal.SIGTERM, lambda *_: stopping.append(True))
+
+        # An interrupted watch reports the validations already running before returning, so their results are saved below
+        with watch.create_worker_pool(params.workers or os.cpu_count() or 1) as executor:
+            watch.watch([params.path], partial(validator.pipeline_validate, **validate_kwargs), handle_result, executor, debounce=params.watch_debounce, should_stop=lambda: bool(stopping))
+
+    elif execution_mode == 'validate-file':
+        # Validate a single file
+        handle_result(params.path, validator.pipeline_validate(path=params.path, fingerprint_index=fingerprint_index, profiler=profiler, **validate_kwargs))
+
+    elif execution_mode == 'validate-stream':
+        # Validate a single file read from the standard input, which is read only once and has no file to open
+        for argument in ('adaptive_sampling', 'detect_mime', 'time_budget', 'byte_budget'):
+            del validate_kwargs[argument]
+        handle_result(params.name or '', validator.pipeline_validate_stream(fileobj=sys.stdin.buffer, name=params.name, profiler=profiler, **validate_kwargs))
+
+    elif execution_mode == 'validate-directory' and not params.apply_content_validation:
+        # Validate the names of all files in a directory, in batches
+        for file_path, results in validator.pipeline_validate_paths(
+            validator.iter_directory_files(params.path),
+            apply_path_validation=params.apply_path_validation,
+            detect_mime=validate_kwargs['detect_mime']):
+            handle_result(file_path, results)
+
+    elif execution_mode == 'validate-directory' and params.workers:
+        # Validate all files in a directory with worker processes, replaced as they grow
+        if fingerprint_index is not None or profiler is not None:
+            parser.error('--fingerprint_index and --profile are not supported with --workers')
+
+        with worker_pool.RecyclingWorkerPool(partial(validator.pipeline_validate, **validate_kwargs), params.workers, max_files=params.worker_max_files, max_rss=params.worker_max_rss * 1024 * 1024) as pool:
+            for file_path, results in pool.imap_unordered(validator.iter_directory_files(params.path)):
+                handle_result(file_path, results)
+
+            for stats in pool.get_stats():
+                print(json.dumps(stats), file=sys.stderr)
+
+    elif execution_mode == 'validate-directory':
+        # Validate all files in a directory, reading the next ones ahead
+        for file_path in prefetch.Prefetcher(validator.iter_directory_files(params.path), files=params.prefetch_files, max_bytes=params.prefetch_bytes, drop_cache=params.drop_cache):
+            handle_result(file_path, validator.pipeline_validate(path=file_path, fingerprint_index=fingerprint_index, profiler=profiler, **validate_kwargs))
+
+    if coverage_report is not None:
+        coverage_report.save(params.coverage_report)
+
+    if columnar_store is not None:
+        columnar_store.close()
+
+    if profiler is not None:
+        print('Profile summary written to %s' % profiler.save_summary(), file=sys.stderr)
+
+    if traffic_baseline is not None:
+        traffic_baseline.save()
+
+    if fingerprint_index is not None:
+        fingerprint_index.save()
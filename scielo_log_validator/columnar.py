@@ -0,0 +1,397 @@
+from array import array
+from datetime import timedelta
+
+import json
+import os
+
+from scielo_log_validator import aggregation, file_utils
+
+
+# Number of files buffered in memory before they are appended to the columnar store
+COLUMNAR_FLUSH_FILES = int(os.environ.get('COLUMNAR_FLUSH_FILES', '10000'))
+
+# Columns of the files table, with their array type codes
+FILE_COLUMNS = (
+    ('day', 'B'),
+    ('server', 'I'),
+    ('status', 'B'),
+    ('total_lines', 'q'),
+    ('invalid_lines', 'q'),
+    ('local_ips', 'q'),
+    ('remote_ips', 'q'),
+    ('unknown_ips', 'q'),
+)
+
+# Columns of the hours table, with one row per file and hour of its content
+HOUR_COLUMNS = (
+    ('file', 'I'),
+    ('year', 'H'),
+    ('month', 'B'),
+    ('day', 'B'),
+    ('hour', 'B'),
+    ('lines', 'q'),
+)
+
+# Values of the status column
+STATUSES = (aggregation.STATUS_VALID, aggregation.STATUS_INVALID, aggregation.STATUS_UNCHECKED)
+
+# Partition of the files whose date is not known
+UNDATED_PARTITION = 'undated'
+
+# Value of the count columns of files whose content was not analyzed
+MISSING_COUNT = -1
+
+
+class Partition:
+    """
+    Columns of the files of a collection and month, as loaded from a columnar store.
+
+    Args:
+        path (str): The directory of the partition.
+        collection (str): The collection.
+        month (str): The month, as YYYY-MM, or 'undated'.
+        files (dict): A dictionary mapping the names of the columns of the files table to arrays.
+        hours (dict): A dictionary mapping the names of the columns of the hours table to arrays.
+        servers (list): The server names, indexed by the server column.
+    """
+
+    def __init__(self, path, collection, month, files, hours, servers):
+        self.path = path
+        self.collection = collection
+        self.month = month
+        self.files = files
+        self.hours = hours
+        self.servers = servers
+
+    def __len__(self):
+        return len(next(iter(self.files.values()))) if self.files else 0
+
+    def get_paths(self):
+        """
+        Loads the paths of the files, which are only needed to identify them.
+
+        Returns:
+            list: The paths, indexed like the rows of the files table.
+        """
+        with open(os.path.join(self.path, 'paths.jsonl')) as fin:
+            return [json.loads(line) for _, line in zip(range(len(self)), fin)]
+
+
+class ColumnarStore:
+    """
+    Append-only local store of the hour histograms, IP counts and verdicts of validated files, for fast scans
+    over millions of files.
+
+    The store is partitioned by collection and month (of the date the results refer to, see
+    aggregation.get_result_date), in directories named <collection>/<YYYY-MM>. Each partition holds a files table
+    (one row per file) and an hours table (one row per file and hour of its content), and each of their columns
+    is a file of fixed-width binary values in the machine byte order, read at once into an array. Server names are
+    dictionary-encoded, and file paths are kept apart in a JSON lines file.
+
+    Files are buffered in memory and appended by flush, which writes the hours before the files, so that a
+    partition interrupted while being written is truncated to its last complete file when it is opened again.
+    A store must have a single writer at a time.
+
+    Args:
+        root (str): The directory of the store, created if it does not exist.
+        flush_files (int, optional): The number of files buffered before they are written. Defaults to COLUMNAR_FLUSH_FILES.
+    """
+
+    def __init__(self, root, flush_files=COLUMNAR_FLUSH_FILES):
+        self.root = root
+        self.flush_files = flush_files
+        self._buffers = {}
+        self._buffered_files = 0
+
+    def _get_partition_path(self, collection, month):
+        return os.path.join(self.root, collection, month)
+
+    def _open_buffer(self, collection, month):
+        path = self._get_partition_path(collection, month)
+        os.makedirs(path, exist_ok=True)
+
+        servers = _load_servers(path)
+        rows = _repair_partition(path)
+        buffer = {
+            'path': path,
+            'rows': rows,
+            'servers': servers,
+            'server_ids': {server: i for i, server in enumerate(servers)},
+            'files': {name: array(typecode) for name, typecode in FILE_COLUMNS},
+            'hours': {name: array(typecode) for name, typecode in HOUR_COLUMNS},
+            'paths': [],
+        }
+        self._buffers[(collection, month)] = buffer
+        return buffer
+
+    def add(self, path, results):
+        """
+        Adds the results of a file to the store.
+
+        Args:
+            path (str): The path of the validated file.
+            results (dict): The results dictionary returned by validator.pipeline_validate.
+        """
+        collection = results.get('path', {}).get('collection')
+        if not isinstance(collection, str):
+            collection = file_utils.extract_collection_from_path(path) or aggregation.UNKNOWN_COLLECTION
+
+        day = aggregation.get_result_date(results)
+        month = day.strftime('%Y-%m') if day is not None else UNDATED_PARTITION
+
+        buffer = self._buffers.get((collection, month)) or self._open_buffer(collection, month)
+
+        server = file_utils.extract_file_identifier_from_path(path) or ''
+        server_id = buffer['server_ids'].get(server)
+        if server_id is None:
+            server_id = buffer['server_ids'][server] = len(buffer['servers'])
+            buffer['servers'].append(server)
+
+        summary = results.get('content', {}).get('summary', {})
+        total_lines = summary.get('total_lines')
+        analyzed = isinstance(total_lines, int)
+        ips = summary.get('ips', {})
+
+        row = buffer['rows'] + len(buffer['paths'])
+        files = buffer['files']
+        files['day'].append(day.day if day is not None else 0)
+        files['server'].append(server_id)
+        files['status'].append(STATUSES.index(aggregation.get_result_status(results)))
+        files['total_lines'].append(total_lines if analyzed else MISSING_COUNT)
+        files['invalid_lines'].append(summary.get('invalid_lines', MISSING_COUNT) if analyzed else MISSING_COUNT)
+        for ip_type in ('local', 'remote', 'unknown'):
+            files[ip_type + '_ips'].append(ips.get(ip_type, 0) if analyzed else MISSING_COUNT)
+
+        hours = buffer['hours']
+        for (year, month_number, day_number, hour), lines in sorted(summary.get('datetimes', {}).items()):
+            hours['file'].append(row)
+            hours['year'].append(year)
+            hours['month'].append(month_number)
+            hours['day'].append(day_number)
+            hours['hour'].append(hour)
+            hours['lines'].append(lines)
+
+        buffer['paths'].append(path)
+        self._buffered_files += 1
+        if self._buffered_files >= self.flush_files:
+            self.flush()
+
+    def flush(self):
+        """
+        Appends the buffered files to their partitions.
+        """
+        for buffer in self._buffers.values():
+            if not buffer['paths']:
+                continue
+            path = buffer['path']
+
+            # Hours first, so that the files of a partial write are never referenced by missing hours
+            for table in ('hours', 'files'):
+                for name, values in buffer[table].items():
+                    with open(os.path.join(path, '%s.%s' % (table, name)), 'ab') as fout:
+                        values.tofile(fout)
+                    del values[:]
+
+            with open(os.path.join(path, 'paths.jsonl'), 'a') as fout:
+                fout.writelines(json.dumps(p) + '\n' for p in buffer['paths'])
+
+            _save_servers(path, buffer['servers'])
+            buffer['rows'] += len(buffer['paths'])
+            buffer['paths'] = []
+
+        self._buffered_files = 0
+
+    def close(self):
+        """
+        Appends the buffered files and releases the buffers.
+        """
+        self.flush()
+        self._buffers = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+        return False
+
+    def iter_partitions(self, collections=None, months=None):
+        """
+        Iterates over the partitions of the store.
+
+        Args:
+            collections (iterable, optional): The collections to include. Defaults to all.
+            months (iterable, optional): The months to include, as YYYY-MM. Defaults to all.
+
+        Yields:
+            tuple: The collection and the month of each partition.
+        """
+        if not os.path.isdir(self.root):
+            return
+
+        collections = set(collections) if collections is not None else None
+        months = set(months) if months is not None else None
+        for collection in sorted(os.listdir(self.root)):
+            collection_path = os.path.join(self.root, collection)
+            if not os.path.isdir(collection_path) or (collections is not None and collection not in collections):
+                continue
+            for month in sorted(os.listdir(collection_path)):
+                if months is None or month in months:
+                    yield collection, month
+
+    def load(self, collection, month, file_columns=None, hour_columns=None):
+        """
+        Loads the columns of a partition.
+
+        Args:
+            collection (str): The collection.
+            month (str): The month, as YYYY-MM, or 'undated'.
+            file_columns (iterable, optional): The columns of the files table to load. Defaults to all.
+            hour_columns (iterable, optional): The columns of the hours table to load. Defaults to all.
+
+        Returns:
+            Partition: The partition, with the files of a partial write left out.
+        """
+        path = self._get_partition_path(collection, month)
+        rows = _count_rows(path)
+
+        files = {}
+        for name, typecode in FILE_COLUMNS:
+            if file_columns is None or name in file_columns:
+                files[name] = _read_column(os.path.join(path, 'files.' + name), typecode, rows)
+
+        file_ids = _read_column(os.path.join(path, 'hours.file'), 'I')
+        hour_rows = _count_hour_rows(file_ids, rows)
+        hours = {}
+        for name, typecode in HOUR_COLUMNS:
+            if hour_columns is None or name in hour_columns:
+                hours[name] = file_ids[:hour_rows] if name == 'file' else _read_column(os.path.join(path, 'hours.' + name), typecode, hour_rows)
+
+        return Partition(path, collection, month, files, hours, _load_servers(path))
+
+    def get_hour_counts(self, collections=None, months=None):
+        """
+        Adds up the lines of each hour of the content of the files of each server.
+
+        The lines are those of the sample evaluated in the content analysis, so they are proportional to the
+        traffic of each hour, and an hour without lines had no traffic in the sample.
+
+        Args:
+            collections (iterable, optional): The collections to include. Defaults to all.
+            months (iterable, optional): The months to include, as YYYY-MM. Defaults to all.
+
+        Returns:
+            dict: A dictionary mapping each (collection, server) to a dictionary mapping (year, month, day, hour) to lines.
+        """
+        counts = {}
+        for collection, month in self.iter_partitions(collections, months):
+            partition = self.load(collection, month, file_columns=('server',))
+            file_servers = partition.files['server']
+            server_counts = [counts.setdefault((collection, server), {}) for server in partition.servers]
+
+            hours = partition.hours
+            for file_id, year, month_number, day, hour, lines in zip(hours['file'], hours['year'], hours['month'], hours['day'], hours['hour'], hours['lines']):
+                hour_counts = server_counts[file_servers[file_id]]
+                key = (year, month_number, day, hour)
+                hour_counts[key] = hour_counts.get(key, 0) + lines
+        return counts
+
+
+def find_silent_hours(hour_counts, start, end):
+    """
+    Finds the hours of a period in which servers had no lines.
+
+    Args:
+        hour_counts (dict): The hour counts returned by ColumnarStore.get_hour_counts.
+        start (datetime.datetime): The first hour of the period.
+        end (datetime.datetime): The last hour of the period.
+
+    Returns:
+        dict: A dictionary mapping each (collection, server) to the list of (year, month, day, hour) without lines.
+    """
+    start = start.replace(minute=0, second=0, microsecond=0)
+    period = []
+    current = start
+    while current <= end:
+        period.append((current.year, current.month, current.day, current.hour))
+        current += timedelta(hours=1)
+
+    return {key: [hour for hour in period if not counts.get(hour)] for key, counts in hour_counts.items()}
+
+
+def _load_servers(path):
+    try:
+        with open(os.path.join(path, 'servers.json')) as fin:
+            return json.load(fin)
+    except FileNotFoundError:
+        return []
+
+
+def _save_servers(path, servers):
+    tmp_path = os.path.join(path, 'servers.json.tmp')
+    with open(tmp_path, 'w') as fout:
+        json.dump(servers, fout)
+    os.replace(tmp_path, os.path.join(path, 'servers.json'))
+
+
+def _get_column_length(path, typecode):
+    try:
+        return os.path.getsize(path) // array(typecode).itemsize
+    except FileNotFoundError:
+        return 0
+
+
+def _count_rows(path):
+    # Files whose columns or path were not all written are left out
+    lengths = [_get_column_length(os.path.join(path, 'files.' + name), typecode) for name, typecode in FILE_COLUMNS]
+    try:
+        with open(os.path.join(path, 'paths.jsonl'), 'rb') as fin:
+            lengths.append(sum(block.count(b'\n') for block in iter(lambda: fin.read(1024 * 1024), b'')))
+    except FileNotFoundError:
+        lengths.append(0)
+    return min(lengths)
+
+
+def _count_hour_rows(file_ids, rows):
+    # Hours are written before their files, so those of files left out are at the end
+    hour_rows = len(file_ids)
+    while hour_rows > 0 and file_ids[hour_rows - 1] >= rows:
+        hour_rows -= 1
+    return hour_rows
+
+
+def _read_column(path, typecode, length=None):
+    values = array(typecode)
+    if length is None:
+        length = _get_column_length(path, typecode)
+    if length > 0:
+        with open(path, 'rb') as fin:
+            values.fromfile(fin, length)
+    return values
+
+
+def _repair_partition(path):
+    """
+    Truncates the tables of a partition to its last complete file, before new files are appended.
+
+    Returns:
+        int: The number of files of the partition.
+    """
+    rows = _count_rows(path)
+    hour_rows = _count_hour_rows(_read_column(os.path.join(path, 'hours.file'), 'I'), rows)
+
+    for table, columns, length in (('files', FILE_COLUMNS, rows), ('hours', HOUR_COLUMNS, hour_rows)):
+        for name, typecode in columns:
+            column_path = os.path.join(path, '%s.%s' % (table, name))
+            if os.path.exists(column_path) and _get_column_length(column_path, typecode) > length:
+                with open(column_path, 'r+b') as fout:
+                    fout.truncate(length * array(typecode).itemsize)
+
+    paths_path = os.path.join(path, 'paths.jsonl')
+    if os.path.exists(paths_path):
+        with open(paths_path, 'rb') as fin:
+            lines = fin.readlines()
+        if len(lines) != rows:
+            with open(paths_path, 'wb') as fout:
+                fout.writelines(lines[:rows])
+    return rows
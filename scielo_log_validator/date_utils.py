@@ -3,6 +3,11 @@ from datetime import datetime, timedelta
 import re
 
 
+# Formats of the dates accepted by clean_date
+COMPACT_DATE_PATTERN = re.compile(r'^\d{8}$')
+DASHED_DATE_PATTERN = re.compile(r'^\d{4}-\d{2}-\d{2}$')
+
+
 def clean_date(date_str):
     """
     Cleans and formats a date string.
@@ -20,9 +25,9 @@ def clean_date(date_str):
     Raises:
         ValueError: If the date string does not match the expected patterns.
     """
-    if re.match(r'^\d{8}$', date_str):
+    if COMPACT_DATE_PATTERN.match(date_str):
         return f"{date_str[:4]}-{date_str[4:6]}-{date_str[6:]}"
-    elif re.match(r'^\d{4}-\d{2}-\d{2}$', date_str):
+    elif DASHED_DATE_PATTERN.match(date_str):
         return date_str
     else:
         raise ValueError(f"Invalid date format: {date_str}")
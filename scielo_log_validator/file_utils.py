@@ -1,32 +1,137 @@
 from gzip import GzipFile
 
 import bz2
+import json
 import magic
+import io
 import os
+import queue
 import re
+import shutil
+import subprocess
+import tempfile
+import threading
 
-from scielo_log_validator import exceptions, values, date_utils
+from scielo_log_validator import bz2_utils, exceptions, storage, values, date_utils
 
 
+# JSON file with collection identifiers to be added to values.COLLECTION_FILE_NAME_IDENTIFIERS
+COLLECTION_IDENTIFIERS_FILE = os.environ.get('COLLECTION_IDENTIFIERS_FILE')
+
 # Define the default handlers for different MIME types
 DEFAULT_MIME_HANDLERS = {
     'application/gzip': GzipFile,
     'application/x-gzip': GzipFile,
-    'application/x-bzip2': bz2.open,
+    'application/x-bzip2': bz2_utils.open_bz2,
     'application/text': open,
     'text/plain': open,
     'application/x-empty': None
 }
 
 
-def open_file(path, mime_handlers=DEFAULT_MIME_HANDLERS, buffer_size=2048):
+# Decompressor commands tried, in order, when decompressing each MIME type in a subprocess (the file path is appended)
+EXTERNAL_DECOMPRESSORS = {
+    'application/gzip': [['pigz', '-dc'], ['igzip', '-dc']],
+    'application/x-gzip': [['pigz', '-dc'], ['igzip', '-dc']],
+    'application/x-bzip2': [['lbzip2', '-dc'], ['pbzip2', '-dc']],
+    'application/zstd': [['zstd', '-dc']],
+}
+
+# Whether compressed files are decompressed by an external command found on PATH, if any
+USE_EXTERNAL_DECOMPRESSOR = os.environ.get('USE_EXTERNAL_DECOMPRESSOR', '').lower() in ('1', 'true', 'yes')
+
+# Size of the buffer used to read the output of external decompressors
+EXTERNAL_DECOMPRESSOR_BUFFER_SIZE = 1024 * 1024
+
+
+def find_external_decompressor(file_mime, external_decompressors=None):
+    """
+    Finds a decompressor command available on PATH for a MIME type.
+
+    Args:
+        file_mime (str): The MIME type of the file.
+        external_decompressors (dict, optional): A dictionary mapping MIME types to lists of commands.
+                                                 Defaults to EXTERNAL_DECOMPRESSORS.
+
+    Returns:
+        list: The first command whose program is found on PATH, or None if there is none.
+    """
+    if external_decompressors is None:
+        external_decompressors = EXTERNAL_DECOMPRESSORS
+
+    for command in external_decompressors.get(file_mime, []):
+        if shutil.which(command[0]):
+            return command
+    return None
+
+
+class ExternalDecompressorReader(io.RawIOBase):
+    """
+    Reads the decompressed content of a file from the standard output of a decompressor subprocess.
+
+    When the subprocess ends with an error (e.g., a truncated or corrupted file), reading raises
+    exceptions.TruncatedLogFileError. Its standard error goes to a temporary file, so a decompressor writing
+    many warnings never blocks on a full pipe while its standard output is being read.
+
+    Args:
+        command (list): The decompressor command, to which the file path is appended.
+        path (str): The path to the compressed file.
+    """
+
+    def __init__(self, command, path):
+        super().__init__()
+        self.path = path
+        self._stderr = tempfile.TemporaryFile()
+        try:
+            self._process = subprocess.Popen(list(command) + [path], stdin=subprocess.DEVNULL, stdout=subprocess.PIPE, stderr=self._stderr)
+        except BaseException:
+            self._stderr.close()
+            raise
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        size = self._process.stdout.readinto(buffer)
+        if size == 0:
+            self._check_exit_status()
+        return size
+
+    def _check_exit_status(self):
+        if self._process.wait() != 0:
+            self._stderr.seek(0)
+            error = self._stderr.read()
+            raise exceptions.TruncatedLogFileError('Arquivo %s está truncado: %s' % (self.path, error.decode(errors='ignore').strip()))
+
+    def close(self):
+        if not self.closed:
+            # The subprocess is still running when the file is closed before its end
+            if self._process.poll() is None:
+                self._process.kill()
+            self._process.wait()
+            self._process.stdout.close()
+            self._stderr.close()
+        super().close()
+
+
+def open_file(path, mime_handlers=DEFAULT_MIME_HANDLERS, buffer_size=2048, use_external_decompressor=None, external_decompressors=None):
     """
     Opens a file and returns its content based on its MIME type.
 
+    Compressed files can be decompressed by an external command (e.g., pigz), which is often faster
+    than the in-process decompressors. If no command is available, the in-process handler is used.
+
+    Remote objects (http://, https:// and s3:// paths) are read sequentially with range requests
+    (see storage.RangeReader) and decompressed by the handlers of DEFAULT_STREAM_MIME_HANDLERS.
+
     Args:
-        path (str): The path to the file to be opened.
+        path (str): The path to the file to be opened, or the URL of a remote object.
         mime_handlers (dict, optional): A dictionary mapping MIME types to handler functions. 
                                         Defaults to DEFAULT_MIME_HANDLERS.
+        use_external_decompressor (bool, optional): Whether to use an external decompressor if available.
+                                                    Defaults to USE_EXTERNAL_DECOMPRESSOR.
+        external_decompressors (dict, optional): A dictionary mapping MIME types to lists of decompressor commands.
+                                                 Defaults to EXTERNAL_DECOMPRESSORS.
 
     Raises:
         exceptions.InvalidLogFileMimeError: If the file's MIME type is not supported.
@@ -37,6 +142,21 @@ def open_file(path, mime_handlers=DEFAULT_MIME_HANDLERS, buffer_size=2048):
     """
     file_mime = extract_mime_from_path(path, buffer_size)
 
+    if use_external_decompressor is None:
+        use_external_decompressor = USE_EXTERNAL_DECOMPRESSOR
+
+    if storage.is_remote_path(path):
+        if file_mime == 'application/x-empty':
+            raise exceptions.LogFileIsEmptyError('File %s is empty' % path)
+        if file_mime not in mime_handlers or file_mime not in DEFAULT_STREAM_MIME_HANDLERS:
+            raise exceptions.InvalidLogFileMimeError('File %s is invalid' % path)
+        return storage.open_remote(path, wrap=DEFAULT_STREAM_MIME_HANDLERS[file_mime])
+
+    if use_external_decompressor:
+        command = find_external_decompressor(file_mime, external_decompressors)
+        if command is not None:
+            return io.BufferedReader(ExternalDecompressorReader(command, path), buffer_size=EXTERNAL_DECOMPRESSOR_BUFFER_SIZE)
+
     if file_mime not in mime_handlers:
         raise exceptions.InvalidLogFileMimeError('File %s is invalid' % path)
 
@@ -51,12 +171,153 @@ def open_file(path, mime_handlers=DEFAULT_MIME_HANDLERS, buffer_size=2048):
     return mime_handlers[file_mime](path, open_mode)
 
 
+def iter_line_batches(fin, block_size=1024 * 1024):
+    """
+    Reads an open file in large blocks and yields its lines in batches, one batch per block.
+
+    Reading large blocks lets the decompressor work on big chunks, and splitting them into lines
+    is done at once for the whole block. Lines do not keep their line breaks.
+
+    Args:
+        fin (file): An open file, in binary or text mode.
+        block_size (int, optional): The number of (decompressed) bytes read at a time. Defaults to 1 MB.
+
+    Yields:
+        list: The lines of each block, the last line of a block being completed with the next block.
+    """
+    remainder = None
+    while True:
+        block = fin.read(block_size)
+        if not block:
+            break
+
+        if remainder:
+            block = remainder + block
+        lines = block.split(b'\n' if isinstance(block, bytes) else '\n')
+        remainder = lines.pop()
+        if lines:
+            yield lines
+
+    # The last line is yielded even if it does not end with a line break
+    if remainder:
+        yield [remainder]
+
+
+def iter_line_batches_threaded(fin, block_size=1024 * 1024, queue_depth=4):
+    """
+    Reads an open file in large blocks on a separate thread and yields its lines in batches.
+
+    The reader thread decompresses blocks into a bounded queue while the caller processes the previous
+    batches, so reading, decompressing and parsing overlap (zlib and bz2 release the GIL while inflating).
+    Errors raised while reading (e.g., EOFError for truncated files) are raised again in the caller.
+
+    Args:
+        fin (file): An open file, in binary or text mode.
+        block_size (int, optional): The number of (decompressed) bytes read at a time. Defaults to 1 MB.
+        queue_depth (int, optional): The maximum number of batches waiting to be processed. Defaults to 4.
+
+    Yields:
+        list: The lines of each block, as in iter_line_batches.
+    """
+    batches = queue.Queue(maxsize=max(1, queue_depth))
+    stop = threading.Event()
+    end = object()
+
+    def _put(item):
+        while not stop.is_set():
+            try:
+                batches.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _read():
+        try:
+            for batch in iter_line_batches(fin, block_size):
+                if not _put(batch):
+                    return
+            _put(end)
+        except BaseException as e:
+            _put(e)
+
+    reader = threading.Thread(target=_read, name='line-batch-reader', daemon=True)
+    reader.start()
+
+    try:
+        while True:
+            item = batches.get()
+            if item is end:
+                break
+            if isinstance(item, BaseException):
+                raise item
+            yield item
+    finally:
+        # Stop the reader when the caller stops early, so that the file can be closed safely
+        stop.set()
+        reader.join()
+
+
+# Define the handlers that decompress streams of different MIME types
+DEFAULT_STREAM_MIME_HANDLERS = {
+    'application/gzip': lambda fileobj: GzipFile(fileobj=fileobj, mode='rb'),
+    'application/x-gzip': lambda fileobj: GzipFile(fileobj=fileobj, mode='rb'),
+    'application/x-bzip2': lambda fileobj: bz2.BZ2File(fileobj, mode='rb'),
+    'application/text': lambda fileobj: fileobj,
+    'text/plain': lambda fileobj: fileobj,
+    'application/x-empty': None,
+}
+
+
+def open_stream(fileobj, stream_mime_handlers=DEFAULT_STREAM_MIME_HANDLERS, buffer_size=2048):
+    """
+    Opens a binary stream (e.g., the standard input or a pipe) and returns its decompressed content.
+
+    The MIME type is detected from the first bytes of the stream, which are peeked without being consumed,
+    so the stream is read only once and does not need to be stored in a file.
+
+    Args:
+        fileobj (file): A readable binary file object.
+        stream_mime_handlers (dict, optional): A dictionary mapping MIME types to functions that wrap a stream.
+                                               Defaults to DEFAULT_STREAM_MIME_HANDLERS.
+        buffer_size (int, optional): The number of bytes used for MIME type detection. Defaults to 2048.
+
+    Raises:
+        exceptions.InvalidLogFileMimeError: If the stream's MIME type is not supported.
+        exceptions.LogFileIsEmptyError: If the stream is empty.
+
+    Returns:
+        tuple: The MIME type of the stream and a binary file object with its decompressed content.
+    """
+    if not hasattr(fileobj, 'peek'):
+        fileobj = io.BufferedReader(fileobj, buffer_size=max(buffer_size, io.DEFAULT_BUFFER_SIZE))
+
+    mime = magic.Magic(mime=True)
+    stream_mime = mime.from_buffer(fileobj.peek(buffer_size)[:buffer_size])
+
+    if stream_mime not in stream_mime_handlers:
+        raise exceptions.InvalidLogFileMimeError('Stream is invalid (%s)' % stream_mime)
+
+    if stream_mime == 'application/x-empty':
+        raise exceptions.LogFileIsEmptyError('Stream is empty')
+
+    return stream_mime, stream_mime_handlers[stream_mime](fileobj)
+
+
+# Patterns of the dates found in file names, tried in order
+DATE_PATTERNS = [re.compile(values.PATTERN_Y_M_D), re.compile(values.PATTERN_YMD)]
+
+PAPERBOY_PATTERN = re.compile(values.PATTERN_PAPERBOY)
+
+
 def extract_mime_from_path(path, buffer_size=2048):
     """
     Determines the MIME type of a file based on its content.
 
+    The MIME type of a remote object is determined from its first bytes, fetched with a single range request.
+
     Args:
-        path (str): The file path to read and determine the MIME type.
+        path (str): The file path (or the URL of a remote object) to read and determine the MIME type.
         buffer_size (int, optional): The number of bytes to read from the file for MIME type detection. Defaults to 2048.
 
     Returns:
@@ -67,35 +328,228 @@ def extract_mime_from_path(path, buffer_size=2048):
         IOError: If there is an error reading the file.
     """
     mime = magic.Magic(mime=True)
+    if storage.is_remote_path(path):
+        return mime.from_buffer(storage.read_head(path, buffer_size))
+
     with open(path, 'rb') as fin:
         magic_code = mime.from_buffer(fin.read(buffer_size))
         return magic_code
 
 
+def build_trie_pattern(words):
+    """
+    Builds a regular expression that matches any of the given words, factored as a trie.
+
+    Words sharing a prefix share a branch of the expression (e.g., ['_scielo.pe', '_scielo.pepsic']
+    becomes '_scielo\\.pe(?:psic)?'), so the regular expression engine compares each character of
+    the input once instead of once per word. Optional branches are greedy, hence the longest word
+    is matched at a given position.
+
+    Args:
+        words (iterable): The words to be matched.
+
+    Returns:
+        str: The regular expression, or an empty string if there are no words.
+    """
+    trie = {}
+    for word in words:
+        node = trie
+        for char in word:
+            node = node.setdefault(char, {})
+        node[''] = {}
+
+    def _build(node):
+        branches = [re.escape(char) + _build(child) for char, child in sorted(node.items()) if char]
+        if not branches:
+            return ''
+        if '' in node:
+            return '(?:%s)?' % '|'.join(branches)
+        if len(branches) == 1:
+            return branches[0]
+        return '(?:%s)' % '|'.join(branches)
+
+    return _build(trie)
+
+
+class CollectionMatcher:
+    """
+    Matches file names against collection file name identifiers in a single pass.
+
+    All identifiers are compiled into one trie-shaped regular expression, so the cost of a match
+    depends on the length of the file name and not on the number of identifiers. The expression is
+    a lookahead, so the longest identifier starting at every position is found, even if it overlaps
+    with another one. When several identifiers occur in a file name, the longest one is returned,
+    and ties are resolved by the leftmost position, so the result does not depend on the order of
+    the identifiers table.
+
+    Args:
+        collection_identifiers (dict): A dictionary where keys are file name identifiers and values are collection IDs.
+    """
+
+    def __init__(self, collection_identifiers):
+        self.collection_identifiers = dict(collection_identifiers)
+
+        pattern = build_trie_pattern(i for i in self.collection_identifiers if i)
+        self.pattern = re.compile('(?=(%s))' % pattern) if pattern else None
+
+    def match(self, path):
+        """
+        Finds the file name identifier present in the file name of the given path.
+
+        Args:
+            path (str): The file path to be checked for collection identifiers.
+
+        Returns:
+            str: The longest file name identifier found in the file name, otherwise None.
+        """
+        if self.pattern is None:
+            return None
+
+        matches = [m.group(1) for m in self.pattern.finditer(os.path.basename(path))]
+        if not matches:
+            return None
+        if len(matches) == 1:
+            return matches[0]
+        return max(matches, key=len)
+
+    def get_collection(self, path):
+        """
+        Gets the collection ID of the given path.
+
+        Args:
+            path (str): The file path to be checked for collection identifiers.
+
+        Returns:
+            str: The collection ID if an identifier is found in the file name, otherwise None.
+        """
+        identifier = self.match(path)
+        if identifier is None:
+            return None
+        return self.collection_identifiers[identifier]
+
+
+_default_collection_matcher = None
+
+
+def load_collection_identifiers(path, base=None):
+    """
+    Loads collection file name identifiers from a JSON file.
+
+    The file must contain a JSON object mapping file name identifiers to collection IDs,
+    e.g. {"_scielo.1.br": "scl"}. Its entries are added to (and override) the base table.
+
+    Args:
+        path (str): The path to the JSON file.
+        base (dict, optional): The table to be extended. Defaults to values.COLLECTION_FILE_NAME_IDENTIFIERS.
+
+    Returns:
+        dict: The resulting collection identifiers table.
+
+    Raises:
+        ValueError: If the file content is not a JSON object of strings.
+    """
+    if base is None:
+        base = values.COLLECTION_FILE_NAME_IDENTIFIERS
+
+    with open(path) as fin:
+        loaded = json.load(fin)
+
+    if not isinstance(loaded, dict) or not all(isinstance(k, str) and isinstance(v, str) for k, v in loaded.items()):
+        raise ValueError('File %s must contain a JSON object mapping file name identifiers to collection IDs' % path)
+
+    collection_identifiers = dict(base)
+    collection_identifiers.update(loaded)
+    return collection_identifiers
+
+
+def set_default_collection_identifiers(collection_identifiers):
+    """
+    Replaces the collection identifiers table used when none is given explicitly.
+
+    Args:
+        collection_identifiers (dict): A dictionary where keys are file name identifiers and values are collection IDs.
+    """
+    global _default_collection_matcher
+    _default_collection_matcher = CollectionMatcher(collection_identifiers)
+
+
+def get_default_collection_matcher():
+    """
+    Gets the matcher used when no collection identifiers are given explicitly.
+
+    It is built from values.COLLECTION_FILE_NAME_IDENTIFIERS, extended with the JSON file
+    indicated by the COLLECTION_IDENTIFIERS_FILE environment variable, if any.
+
+    Returns:
+        CollectionMatcher: The default matcher.
+    """
+    global _default_collection_matcher
+    if _default_collection_matcher is None:
+        if COLLECTION_IDENTIFIERS_FILE:
+            collection_identifiers = load_collection_identifiers(COLLECTION_IDENTIFIERS_FILE)
+        else:
+            collection_identifiers = values.COLLECTION_FILE_NAME_IDENTIFIERS
+        _default_collection_matcher = CollectionMatcher(collection_identifiers)
+    return _default_collection_matcher
+
+
+def get_collection_matcher(collection_identifiers=None):
+    """
+    Gets a matcher for the given collection identifiers.
+
+    Args:
+        collection_identifiers (dict or CollectionMatcher, optional): A dictionary where keys are file name identifiers
+                                                                      and values are collection IDs, or a matcher.
+                                                                      If not provided, the default matcher is used.
+
+    Returns:
+        CollectionMatcher: The matcher.
+    """
+    if collection_identifiers is None:
+        return get_default_collection_matcher()
+    if isinstance(collection_identifiers, CollectionMatcher):
+        return collection_identifiers
+    return CollectionMatcher(collection_identifiers)
+
+
 def extract_collection_from_path(path, collection_identifiers=None):
     """
     Extracts the collection identifier from the given file path.
 
-    This function iterates over a dictionary of collection file name identifiers
-    and checks if any of these identifiers are present in the provided file path.
-    If a match is found, the corresponding collection ID is returned.
+    The file name is matched against all collection file name identifiers at once,
+    and the collection ID of the longest identifier found is returned.
 
     Args:
         path (str): The file path to be checked for collection identifiers.
-        collection_identifiers (dict, optional): A dictionary where keys are file name identifiers 
-                                                 and values are collection IDs. 
-                                                 If not provided, defaults to values.COLLECTION_FILE_NAME_IDENTIFIERS.
+        collection_identifiers (dict or CollectionMatcher, optional): A dictionary where keys are file name identifiers 
+                                                                      and values are collection IDs, or a matcher built from it.
+                                                                      If not provided, defaults to values.COLLECTION_FILE_NAME_IDENTIFIERS
+                                                                      extended with the COLLECTION_IDENTIFIERS_FILE environment variable.
 
     Returns:
         str: The collection identifier if found in the file path, otherwise None.
     """
-    if collection_identifiers is None:
-        collection_identifiers = values.COLLECTION_FILE_NAME_IDENTIFIERS
+    return get_collection_matcher(collection_identifiers).get_collection(path)
 
-    for file_identifier, collection_id in collection_identifiers.items():
-        if file_identifier in path:
-            return collection_id
-    return None
+
+def extract_file_identifier_from_path(path, collection_identifiers=None):
+    """
+    Extracts the file name identifier (e.g., '_scielo.1.br') from the given file path.
+
+    The file name identifier distinguishes the servers of a same collection,
+    which share the collection ID but not the identifier.
+
+    Args:
+        path (str): The file path to be checked for collection identifiers.
+        collection_identifiers (dict or CollectionMatcher, optional): A dictionary where keys are file name identifiers 
+                                                                      and values are collection IDs, or a matcher built from it.
+                                                                      If not provided, defaults to values.COLLECTION_FILE_NAME_IDENTIFIERS
+                                                                      extended with the COLLECTION_IDENTIFIERS_FILE environment variable.
+
+    Returns:
+        str: The file name identifier if found in the file path, otherwise None.
+    """
+    return get_collection_matcher(collection_identifiers).match(path)
 
 
 def extract_file_extension_from_path(path):
@@ -132,8 +586,8 @@ def extract_date_from_path(path):
         None
     """
     _, tail = os.path.split(path)
-    for pattern in [values.PATTERN_Y_M_D, values.PATTERN_YMD]:
-        match = re.search(pattern, tail)
+    for pattern in DATE_PATTERNS:
+        match = pattern.search(tail)
         if match:
             return date_utils.clean_date(match.group())
 
@@ -149,6 +603,6 @@ def has_paperboy_format(path):
         bool: True if the filename matches the Paperboy format, False otherwise.
     """
     _, tail = os.path.split(path)
-    if re.match(values.PATTERN_PAPERBOY, tail):
+    if PAPERBOY_PATTERN.match(tail):
         return True
     return False
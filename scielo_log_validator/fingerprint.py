@@ -0,0 +1,229 @@
+import hashlib
+import json
+import os
+
+from scielo_log_validator import cardinality, exceptions, file_utils
+
+
+# Number of decompressed bytes hashed at the beginning and at the end of a file
+FINGERPRINT_SAMPLE_BYTES = int(os.environ.get('FINGERPRINT_SAMPLE_BYTES', str(64 * 1024)))
+
+# Fraction of the content budget of a file that fingerprinting it may spend, the rest being left to the content analysis
+FINGERPRINT_BUDGET_SHARE = float(os.environ.get('FINGERPRINT_BUDGET_SHARE', '0.5'))
+
+# Number of decompressed bytes read at a time while fingerprinting a file
+FINGERPRINT_READ_SIZE = 1024 * 1024
+
+
+def compute_fingerprint(path, sample_bytes=FINGERPRINT_SAMPLE_BYTES, buffer_size=2048, content_budget=None):
+    """
+    Computes a content fingerprint of a log file in a single decompression pass.
+
+    The file is read in large blocks, so counting its lines this way is faster than iterating over them.
+
+    Args:
+        path (str): The path to the file.
+        sample_bytes (int, optional): The number of decompressed bytes hashed at the beginning and at the end of the file.
+        buffer_size (int, optional): The buffer size for file type checking. Defaults to 2048.
+        content_budget (budget.ContentBudget, optional): The time and byte limits the reading is counted against. Defaults to None
+                                                         (no limit). If they are exceeded, the fingerprint only covers the lines read.
+
+    Returns:
+        dict: A dictionary containing the following keys:
+            - 'head' (str): The hash of the first sample_bytes of the decompressed content.
+            - 'tail' (str): The hash of the last sample_bytes of the decompressed content.
+            - 'bytes' (int): The size of the decompressed content.
+            - 'total_lines' (int): The number of lines in the file.
+
+    Raises:
+        exceptions.TruncatedLogFileError: If the file is truncated.
+        exceptions.InvalidLogFileMimeError: If the file has an invalid MIME type.
+        exceptions.LogFileIsEmptyError: If the file is empty.
+    """
+    head = b''
+    tail = b''
+    size = 0
+    total_lines = 0
+    last_char = None
+
+    try:
+        with file_utils.open_file(path=path, buffer_size=buffer_size) as fin:
+            if content_budget is not None:
+                fin = content_budget.wrap(fin)
+            while True:
+                block = fin.read(FINGERPRINT_READ_SIZE)
+                if not block:
+                    break
+
+                total_lines += block.count(b'\n' if isinstance(block, bytes) else '\n')
+                last_char = block[-1:]
+
+                if isinstance(block, str):
+                    block = block.encode('utf-8', errors='surrogateescape')
+
+                size += len(block)
+                if len(head) < sample_bytes:
+                    head += block[:sample_bytes - len(head)]
+                tail = (tail + block)[-sample_bytes:]
+    except EOFError:
+        raise exceptions.TruncatedLogFileError('Arquivo %s está truncado' % path)
+
+    # The last line is counted even if it does not end with a line break
+    if last_char not in (None, b'\n', '\n'):
+        total_lines += 1
+
+    return {
+        'head': hashlib.sha1(head).hexdigest(),
+        'tail': hashlib.sha1(tail).hexdigest(),
+        'bytes': size,
+        'total_lines': total_lines,
+    }
+
+
+def is_same_content(fingerprint, other):
+    """
+    Checks whether two fingerprints belong to files with the same content.
+
+    Args:
+        fingerprint (dict): A fingerprint, as returned by compute_fingerprint.
+        other (dict): Another fingerprint.
+
+    Returns:
+        bool: True if the fingerprints match, False otherwise.
+    """
+    return all(fingerprint[k] == other[k] for k in ('head', 'tail', 'bytes', 'total_lines'))
+
+
+def serialize_summary(summary):
+    """
+    Converts a content summary into a JSON-compatible dictionary.
+
+    Args:
+        summary (dict): A content summary, as returned by validator.analyze_log_content.
+
+    Returns:
+        dict: The JSON-compatible summary.
+    """
+    serialized = dict(summary)
+    serialized['datetimes'] = [list(k) + [v] for k, v in summary.get('datetimes', {}).items()]
+    if 'distinct_ips' in summary:
+        serialized['distinct_ips'] = summary['distinct_ips'].serialize()
+    return serialized
+
+
+def deserialize_summary(serialized):
+    """
+    Converts a dictionary created by serialize_summary back into a content summary.
+
+    Args:
+        serialized (dict): The JSON-compatible summary.
+
+    Returns:
+        dict: The content summary.
+    """
+    summary = dict(serialized)
+    summary['datetimes'] = {tuple(item[:4]): item[4] for item in serialized.get('datetimes', [])}
+    if 'distinct_ips' in serialized:
+        summary['distinct_ips'] = cardinality.DistinctIpSketches.deserialize(serialized['distinct_ips'])
+    return summary
+
+
+class FingerprintIndex:
+    """
+    Index of the content fingerprints of validated files, stored in a local JSON file.
+
+    Files with the same fingerprint are exact duplicates, so the content summary of the first one can be
+    reused for the others. Files sharing only the beginning of their content (e.g., a truncated or extended
+    re-upload) or their hour histogram are near duplicates.
+
+    Args:
+        path (str, optional): The JSON file the index is loaded from and saved to.
+    """
+
+    def __init__(self, path=None):
+        self.path = path
+        self.entries = {}
+        self._by_head = {}
+        self._by_hours = {}
+
+        if path and os.path.exists(path):
+            with open(path) as fin:
+                for file_path, entry in json.load(fin).items():
+                    self.add(file_path, entry)
+
+    def add(self, path, entry):
+        """
+        Adds or replaces the entry of a file.
+
+        Args:
+            path (str): The path of the file.
+            entry (dict): A fingerprint, as returned by compute_fingerprint, optionally with the keys
+                          'hours' (the hour histogram), 'sample_size' and 'summary' (a serialized content summary).
+        """
+        self.remove(path)
+        self.entries[path] = entry
+        self._by_head.setdefault(entry['head'], set()).add(path)
+        if entry.get('hours'):
+            self._by_hours.setdefault(tuple(entry['hours']), set()).add(path)
+
+    def remove(self, path):
+        """
+        Removes the entry of a file, if it exists.
+
+        Args:
+            path (str): The path of the file.
+        """
+        entry = self.entries.pop(path, None)
+        if entry is None:
+            return
+        self._by_head.get(entry['head'], set()).discard(path)
+        if entry.get('hours'):
+            self._by_hours.get(tuple(entry['hours']), set()).discard(path)
+
+    def find_exact(self, fingerprint, sample_size=None):
+        """
+        Finds an indexed file with the same content and a reusable content summary.
+
+        Args:
+            fingerprint (dict): A fingerprint, as returned by compute_fingerprint.
+            sample_size (float, optional): The sample size the reusable summary must have been computed with.
+
+        Returns:
+            str: The path of the indexed file, or None if there is none.
+        """
+        for other_path in sorted(self._by_head.get(fingerprint['head'], ())):
+            other = self.entries[other_path]
+            if is_same_content(fingerprint, other) and other.get('summary') is not None and other.get('sample_size') == sample_size:
+                return other_path
+        return None
+
+    def find_near(self, path, fingerprint, hours=None):
+        """
+        Finds the indexed files whose content overlaps with the content of the given file.
+
+        Args:
+            path (str): The path of the file, which is never reported as a duplicate of itself.
+            fingerprint (dict): A fingerprint, as returned by compute_fingerprint.
+            hours (list, optional): The hour histogram of the file.
+
+        Returns:
+            list: The sorted paths of the indexed files with the same beginning or the same hour histogram.
+        """
+        near = set(self._by_head.get(fingerprint['head'], ()))
+        if hours and any(hours):
+            near.update(self._by_hours.get(tuple(hours), ()))
+        near.discard(path)
+        return sorted(near)
+
+    def save(self, path=None):
+        """
+        Saves the index to a JSON file.
+
+        Args:
+            path (str, optional): The output file path. Defaults to the path the index was loaded from.
+        """
+        path = path or self.path
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'w') as fout:
+            json.dump(self.entries, fout)
+        os.replace(tmp_path, path)
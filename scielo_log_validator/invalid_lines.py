@@ -0,0 +1,107 @@
+import os
+import random
+
+from scielo_log_validator import sampling
+
+
+# Number of invalid lines kept as examples in the content summary (0 disables the collection)
+INVALID_LINE_SAMPLE_SIZE = int(os.environ.get('INVALID_LINE_SAMPLE_SIZE', '0'))
+
+# Maximum number of characters of an invalid line kept as an example
+INVALID_LINE_MAX_LENGTH = int(os.environ.get('INVALID_LINE_MAX_LENGTH', '1000'))
+
+# Reasons a line may be invalid
+INVALID_NO_MATCH = 'no_match'
+INVALID_BAD_DATE = 'bad_date'
+INVALID_UNDECODABLE = 'undecodable'
+INVALID_TRUNCATED = 'truncated'
+
+INVALID_CATEGORIES = (INVALID_NO_MATCH, INVALID_BAD_DATE, INVALID_UNDECODABLE, INVALID_TRUNCATED)
+
+
+def categorize_invalid_line(line, decoded_line, matched):
+    """
+    Determines why a line is invalid, checking only what the parsing did not already tell.
+
+    Args:
+        line (bytes or str): The line, as read.
+        decoded_line (str): The decoded line.
+        matched (bool): Whether a log pattern matched the line (in which case its date could not be parsed).
+
+    Returns:
+        str: 'bad_date' if a pattern matched, 'undecodable' if the line is not valid UTF-8, 'truncated' if it has
+             an unterminated quoted field (e.g., the last line of a file cut while being written), 'no_match' otherwise.
+    """
+    if matched:
+        return INVALID_BAD_DATE
+
+    if isinstance(line, bytes):
+        try:
+            line.decode()
+        except UnicodeDecodeError:
+            return INVALID_UNDECODABLE
+
+    if decoded_line.count('"') % 2 == 1:
+        return INVALID_TRUNCATED
+
+    return INVALID_NO_MATCH
+
+
+class InvalidLineCollector:
+    """
+    Counts the invalid lines of a file by category and keeps a uniform random sample of them.
+
+    The sample is a reservoir of a fixed number of lines (see sampling.ReservoirSampler), so memory does not
+    grow with the number of invalid lines, and the details of a line (e.g., its byte offset) are only computed
+    if it enters the reservoir.
+
+    Args:
+        size (int, optional): The number of invalid lines kept. Defaults to INVALID_LINE_SAMPLE_SIZE.
+        max_length (int, optional): The maximum number of characters kept of each line. Defaults to INVALID_LINE_MAX_LENGTH.
+        rng (random.Random, optional): The random number generator. Defaults to a generator with a fixed seed,
+                                       so that results are reproducible.
+    """
+
+    def __init__(self, size=INVALID_LINE_SAMPLE_SIZE, max_length=INVALID_LINE_MAX_LENGTH, rng=None):
+        self.max_length = max_length
+        self.categories = dict.fromkeys(INVALID_CATEGORIES, 0)
+        self.reservoir = sampling.ReservoirSampler(size, rng or random.Random(0))
+
+    def add(self, line, category, line_number=None, get_offset=None):
+        """
+        Adds an invalid line.
+
+        Args:
+            line (bytes or str): The line, as read.
+            category (str): The reason the line is invalid (see categorize_invalid_line).
+            line_number (int, optional): The number of the line in the file, starting at 1. Defaults to None (unknown).
+            get_offset (callable, optional): A function returning the offset of the line in the decompressed content.
+                                             Defaults to None (unknown offset).
+        """
+        self.categories[category] += 1
+
+        if not self.reservoir.keeps_next():
+            self.reservoir.add_batch((None,))
+            return
+
+        if isinstance(line, bytes):
+            line = line.decode('utf-8', errors='backslashreplace')
+        self.reservoir.add_batch(({
+            'line_number': line_number,
+            'offset': get_offset() if get_offset is not None else None,
+            'category': category,
+            'text': line[:self.max_length],
+        },))
+
+    def get_report(self):
+        """
+        Describes the invalid lines added so far.
+
+        Returns:
+            dict: A dictionary containing the following keys:
+                - 'categories' (dict): The number of invalid lines of each category.
+                - 'samples' (list): The invalid lines kept, sorted by line number, each with the keys
+                                    'line_number', 'offset', 'category' and 'text'.
+        """
+        samples = sorted(self.reservoir.lines, key=lambda sample: (sample['line_number'] is None, sample['line_number'] or 0))
+        return {'categories': self.categories, 'samples': samples}
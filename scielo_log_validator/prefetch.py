@@ -0,0 +1,196 @@
+from collections import deque
+
+import os
+import queue
+import threading
+
+from scielo_log_validator import storage
+
+
+# Number of files read ahead of the file being validated in directory mode (0 disables prefetching)
+PREFETCH_FILES = int(os.environ.get('PREFETCH_FILES', '0'))
+
+# Maximum number of bytes of the files read ahead that are not validated yet
+PREFETCH_BYTES = int(os.environ.get('PREFETCH_BYTES', str(256 * 1024 * 1024)))
+
+# Number of bytes read at a time by the prefetching thread
+PREFETCH_BLOCK_SIZE = int(os.environ.get('PREFETCH_BLOCK_SIZE', str(1024 * 1024)))
+
+# Whether the pages of a file are dropped from the OS cache once it is validated, so that validation does not
+# evict the cache of other processes (e.g., a database)
+DROP_CACHE_AFTER_READ = os.environ.get('DROP_CACHE_AFTER_READ', '').lower() in ('1', 'true', 'yes')
+
+
+def advise(path, advice, length=0):
+    """
+    Gives the OS a hint about the future use of a file, if posix_fadvise is available.
+
+    Args:
+        path (str): The file path.
+        advice (int): The advice (e.g., os.POSIX_FADV_WILLNEED).
+        length (int, optional): The number of bytes from the start of the file the advice applies to.
+                                Defaults to 0 (the whole file).
+
+    Returns:
+        bool: True if the advice was given, False otherwise (e.g., not on Linux, or a remote path).
+    """
+    if not hasattr(os, 'posix_fadvise') or storage.is_remote_path(path):
+        return False
+    try:
+        fd = os.open(path, os.O_RDONLY)
+    except OSError:
+        return False
+    try:
+        os.posix_fadvise(fd, 0, length, advice)
+        return True
+    except OSError:
+        return False
+    finally:
+        os.close(fd)
+
+
+def drop_from_cache(path):
+    """
+    Asks the OS to drop the cached pages of a file (POSIX_FADV_DONTNEED).
+
+    Args:
+        path (str): The file path.
+
+    Returns:
+        bool: True if the advice was given, False otherwise.
+    """
+    return advise(path, getattr(os, 'POSIX_FADV_DONTNEED', 4))
+
+
+class Prefetcher:
+    """
+    Iterates over file paths while the next files are read into the OS cache on a separate thread,
+    so that the disk reads the next files while the current one is parsed.
+
+    Each file read ahead is first announced to the OS (POSIX_FADV_WILLNEED) and then read in blocks,
+    which the thread does without holding the GIL. The files read ahead and not yet validated take
+    at most max_bytes, and a file is no longer read ahead once its validation starts.
+
+    Args:
+        paths (iterable): The file paths, in the order they are validated.
+        files (int, optional): The number of files read ahead. Defaults to PREFETCH_FILES.
+        max_bytes (int, optional): The maximum number of bytes read ahead. Defaults to PREFETCH_BYTES.
+        drop_cache (bool, optional): Whether to drop the pages of each file from the OS cache once the next one
+                                     is requested. Defaults to DROP_CACHE_AFTER_READ.
+        block_size (int, optional): The number of bytes read at a time. Defaults to PREFETCH_BLOCK_SIZE.
+    """
+
+    def __init__(self, paths, files=PREFETCH_FILES, max_bytes=PREFETCH_BYTES, drop_cache=DROP_CACHE_AFTER_READ, block_size=PREFETCH_BLOCK_SIZE):
+        self.paths = iter(paths)
+        self.files = max(0, files)
+        self.max_bytes = max_bytes
+        self.drop_cache = drop_cache
+        self.block_size = block_size
+
+        # Files waiting to be validated, as [index, path, number of bytes allocated to read ahead]
+        self.window = deque()
+        self.allocated_bytes = 0
+        self.prefetched_bytes = 0
+        self.current_index = -1
+        self._next_index = 0
+        self._exhausted = False
+        self._queue = queue.Queue()
+        self._thread = None
+
+    def _pull(self, count):
+        while not self._exhausted and len(self.window) < count:
+            try:
+                path = next(self.paths)
+            except StopIteration:
+                self._exhausted = True
+                break
+            self.window.append([self._next_index, path, 0])
+            self._next_index += 1
+
+    def _schedule(self):
+        # The byte budget freed by the files already validated is given to the next files, in order
+        for entry in self.window:
+            index, path, allocated = entry
+            if allocated or storage.is_remote_path(path):
+                continue
+            try:
+                size = os.path.getsize(path)
+            except OSError:
+                continue
+            if size == 0:
+                continue
+
+            allocated = min(size, self.max_bytes - self.allocated_bytes)
+            if allocated <= 0:
+                break
+            entry[2] = allocated
+            self.allocated_bytes += allocated
+            self._submit(index, path, allocated)
+
+    def _submit(self, index, path, length):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='prefetcher', daemon=True)
+            self._thread.start()
+        self._queue.put((index, path, length))
+
+    def _run(self):
+        buffer = memoryview(bytearray(self.block_size))
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            index, path, length = item
+            if index <= self.current_index:
+                continue
+            try:
+                self._read(index, path, length, buffer)
+            except OSError:
+                continue
+
+    def _read(self, index, path, length, buffer):
+        advise(path, getattr(os, 'POSIX_FADV_WILLNEED', 3), length)
+
+        with open(path, 'rb', buffering=0) as fin:
+            read = 0
+            while read < length and index > self.current_index:
+                size = fin.readinto(buffer[:min(self.block_size, length - read)])
+                if not size:
+                    break
+                read += size
+        self.prefetched_bytes += read
+
+    def __iter__(self):
+        previous = None
+        try:
+            while True:
+                self._pull(1)
+                if not self.window:
+                    break
+
+                index, path, allocated = self.window.popleft()
+                self.current_index = index
+                self.allocated_bytes -= allocated
+
+                # The previous file is validated once the next one is requested
+                if previous is not None and self.drop_cache:
+                    drop_from_cache(previous)
+                previous = path
+
+                self._pull(self.files)
+                self._schedule()
+                yield path
+
+            if previous is not None and self.drop_cache:
+                drop_from_cache(previous)
+        finally:
+            self.close()
+
+    def close(self):
+        """
+        Stops the prefetching thread.
+        """
+        if self._thread is not None:
+            self.current_index = self._next_index
+            self._queue.put(None)
+            self._thread.join()
+            self._thread = None
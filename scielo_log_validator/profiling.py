@@ -0,0 +1,166 @@
+import cProfile
+import json
+import os
+import pstats
+import re
+import time
+import tracemalloc
+
+
+# Minimum number of seconds a file must take to be validated for its profile to be written
+PROFILE_MIN_SECONDS = float(os.environ.get('PROFILE_MIN_SECONDS', '10'))
+
+# Number of frames kept for each allocation traced with tracemalloc
+PROFILE_TRACEMALLOC_FRAMES = int(os.environ.get('PROFILE_TRACEMALLOC_FRAMES', '5'))
+
+# Number of functions listed in the summary of a batch run
+PROFILE_TOP_FUNCTIONS = int(os.environ.get('PROFILE_TOP_FUNCTIONS', '20'))
+
+# Characters replaced in the file names of the profiles
+UNSAFE_FILE_NAME_CHARS = re.compile(r'[^\w.-]')
+
+
+class FileProfiler:
+    """
+    Runs the validation of each file under cProfile (and optionally tracemalloc), to find out why some files are slow.
+
+    The profile of a file that takes at least min_seconds (including the profiling overhead) is written to the
+    directory as <n>_<file name>.pstats, which can be read with pstats or snakeviz, along with its allocations
+    (<n>_<file name>.tracemalloc, which can be read with tracemalloc.Snapshot.load) if memory is traced. The
+    functions of every file are added up, so the hottest ones of a batch run are summarized at the end.
+
+    Args:
+        directory (str): The directory the profiles are written to, created if it does not exist.
+        min_seconds (float, optional): The minimum duration of the profiled files. Defaults to PROFILE_MIN_SECONDS.
+        trace_memory (bool, optional): Whether to trace the memory allocations with tracemalloc. Defaults to False.
+        clock (callable, optional): The function giving the current time, in seconds. Defaults to time.perf_counter.
+    """
+
+    def __init__(self, directory, min_seconds=PROFILE_MIN_SECONDS, trace_memory=False, clock=time.perf_counter):
+        self.directory = directory
+        self.min_seconds = min_seconds
+        self.trace_memory = trace_memory
+        self.clock = clock
+        self.files = 0
+        self.seconds = 0.0
+        self.slow_files = []
+        self.functions = {}
+        os.makedirs(directory, exist_ok=True)
+
+    def profile(self, path, func, /, *args, **kwargs):
+        """
+        Calls a function validating a file under the profilers.
+
+        Args:
+            path (str): The path of the file, used to name its profile.
+            func (callable): The function.
+            *args: The positional arguments of the function.
+            **kwargs: The keyword arguments of the function.
+
+        Returns:
+            The value returned by the function.
+        """
+        started_tracing = self.trace_memory and not tracemalloc.is_tracing()
+        if started_tracing:
+            tracemalloc.start(PROFILE_TRACEMALLOC_FRAMES)
+        elif self.trace_memory:
+            tracemalloc.reset_peak()
+
+        profiler = cProfile.Profile()
+        started = self.clock()
+        try:
+            profiler.enable()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                profiler.disable()
+        finally:
+            seconds = self.clock() - started
+            # Snapshots are large, so only those of the files whose profiles are written are taken
+            snapshot = tracemalloc.take_snapshot() if self.trace_memory and seconds >= self.min_seconds else None
+            peak_memory = tracemalloc.get_traced_memory()[1] if self.trace_memory else None
+            if started_tracing:
+                tracemalloc.stop()
+            self._add_profile(path, seconds, profiler, snapshot, peak_memory)
+
+    def _add_profile(self, path, seconds, profiler, snapshot, peak_memory):
+        self.files += 1
+        self.seconds += seconds
+
+        stats = pstats.Stats(profiler)
+        for function, (_, calls, total_time, cumulative_time, _) in stats.stats.items():
+            totals = self.functions.get(function)
+            if totals is None:
+                totals = self.functions[function] = [0, 0.0, 0.0]
+            totals[0] += calls
+            totals[1] += total_time
+            totals[2] += cumulative_time
+
+        if seconds < self.min_seconds:
+            return
+
+        name = '%d_%s' % (self.files, UNSAFE_FILE_NAME_CHARS.sub('_', os.path.basename(path)) or 'stream')
+        slow_file = {'path': path, 'seconds': round(seconds, 3), 'profile': os.path.join(self.directory, name + '.pstats')}
+        stats.dump_stats(slow_file['profile'])
+
+        if snapshot is not None:
+            slow_file['allocations'] = os.path.join(self.directory, name + '.tracemalloc')
+            slow_file['peak_memory'] = peak_memory
+            snapshot.dump(slow_file['allocations'])
+
+        self.slow_files.append(slow_file)
+
+    def get_top_functions(self, limit=PROFILE_TOP_FUNCTIONS):
+        """
+        Lists the functions that took the longest, added up over all the profiled files.
+
+        Args:
+            limit (int, optional): The number of functions. Defaults to PROFILE_TOP_FUNCTIONS.
+
+        Returns:
+            list: Dictionaries with the 'function' (as file:line(name)), its number of 'calls', its 'total_time' (excluding
+                  the functions it called) and its 'cumulative_time', in seconds, sorted by decreasing total time.
+        """
+        top_functions = sorted(self.functions.items(), key=lambda item: item[1][1], reverse=True)[:limit]
+        return [
+            {
+                'function': pstats.func_std_string(function),
+                'calls': calls,
+                'total_time': round(total_time, 6),
+                'cumulative_time': round(cumulative_time, 6),
+            }
+            for function, (calls, total_time, cumulative_time) in top_functions
+        ]
+
+    def get_summary(self, limit=PROFILE_TOP_FUNCTIONS):
+        """
+        Summarizes the profiled files.
+
+        Args:
+            limit (int, optional): The number of functions listed. Defaults to PROFILE_TOP_FUNCTIONS.
+
+        Returns:
+            dict: A dictionary with the number of 'files', their 'seconds', the 'slow_files' whose profiles were written
+                  and the 'top_functions' (see get_top_functions).
+        """
+        return {
+            'files': self.files,
+            'seconds': round(self.seconds, 3),
+            'slow_files': self.slow_files,
+            'top_functions': self.get_top_functions(limit),
+        }
+
+    def save_summary(self, limit=PROFILE_TOP_FUNCTIONS):
+        """
+        Writes the summary to the summary.json file of the directory.
+
+        Args:
+            limit (int, optional): The number of functions listed. Defaults to PROFILE_TOP_FUNCTIONS.
+
+        Returns:
+            str: The path of the summary.
+        """
+        path = os.path.join(self.directory, 'summary.json')
+        with open(path, 'w') as fout:
+            json.dump(self.get_summary(limit), fout, indent=2)
+        return path
@@ -0,0 +1,255 @@
+from statistics import NormalDist
+
+import math
+import os
+import random
+
+
+# Maximum error of the proportions estimated by adaptive sampling (e.g., 0.01 for plus or minus one percentage point)
+ADAPTIVE_SAMPLE_MARGIN = float(os.environ.get('ADAPTIVE_SAMPLE_MARGIN', '0.01'))
+
+# Confidence level of the error bounds of adaptive sampling
+ADAPTIVE_SAMPLE_CONFIDENCE = float(os.environ.get('ADAPTIVE_SAMPLE_CONFIDENCE', '0.95'))
+
+# Number of lines of the pilot sample used to estimate the variance of the proportions
+ADAPTIVE_PILOT_LINES = int(os.environ.get('ADAPTIVE_PILOT_LINES', '1000'))
+
+# Maximum number of passes that grow the sample after the pilot one
+ADAPTIVE_MAX_REFINEMENT_PASSES = int(os.environ.get('ADAPTIVE_MAX_REFINEMENT_PASSES', '2'))
+
+
+def get_z_score(confidence=ADAPTIVE_SAMPLE_CONFIDENCE):
+    """
+    Gets the two-sided z-score of a confidence level.
+
+    Args:
+        confidence (float, optional): The confidence level, between 0 and 1. Defaults to ADAPTIVE_SAMPLE_CONFIDENCE.
+
+    Returns:
+        float: The z-score (e.g., 1.96 for 0.95).
+    """
+    return NormalDist().inv_cdf(0.5 + confidence / 2.0)
+
+
+def get_adjusted_proportion(successes, sample_lines, confidence=ADAPTIVE_SAMPLE_CONFIDENCE):
+    """
+    Gets the proportion of a sample adjusted towards 0.5, as in the Agresti-Coull interval.
+
+    The adjustment keeps the error bounds of a proportion observed close to 0 or 1 from collapsing to zero,
+    so that a small sample in which every line looks the same does not stop the sampling too early.
+
+    Args:
+        successes (int): The number of lines of the sample with the property (e.g., with a remote IP).
+        sample_lines (int): The number of lines in the sample.
+        confidence (float, optional): The confidence level. Defaults to ADAPTIVE_SAMPLE_CONFIDENCE.
+
+    Returns:
+        float: The adjusted proportion.
+    """
+    z = get_z_score(confidence)
+    return (successes + z * z / 2.0) / (sample_lines + z * z)
+
+
+def compute_margin(successes, sample_lines, total_lines, confidence=ADAPTIVE_SAMPLE_CONFIDENCE):
+    """
+    Computes the error bound of a proportion estimated from a sample of lines drawn without replacement.
+
+    Args:
+        successes (int): The number of lines of the sample with the property.
+        sample_lines (int): The number of lines in the sample.
+        total_lines (int): The number of lines in the file.
+        confidence (float, optional): The confidence level. Defaults to ADAPTIVE_SAMPLE_CONFIDENCE.
+
+    Returns:
+        float: The margin of error, which is 0 if every line was evaluated.
+    """
+    if sample_lines >= total_lines:
+        return 0.0
+
+    z = get_z_score(confidence)
+    proportion = get_adjusted_proportion(successes, sample_lines, confidence)
+    finite_population_correction = float(total_lines - sample_lines) / (total_lines - 1)
+    variance = proportion * (1 - proportion) / (sample_lines + z * z) * finite_population_correction
+    return z * math.sqrt(variance)
+
+
+def compute_required_sample_size(successes, sample_lines, total_lines, margin=ADAPTIVE_SAMPLE_MARGIN, confidence=ADAPTIVE_SAMPLE_CONFIDENCE):
+    """
+    Computes the number of lines needed to estimate a proportion within a margin of error.
+
+    Args:
+        successes (int): The number of lines of the sample with the property (e.g., with a remote IP).
+        sample_lines (int): The number of lines in the sample.
+        total_lines (int): The number of lines in the file.
+        margin (float, optional): The target margin of error. Defaults to ADAPTIVE_SAMPLE_MARGIN.
+        confidence (float, optional): The confidence level. Defaults to ADAPTIVE_SAMPLE_CONFIDENCE.
+
+    Returns:
+        int: The required number of lines, at most total_lines.
+    """
+    z = get_z_score(confidence)
+    proportion = get_adjusted_proportion(successes, sample_lines, confidence)
+
+    required = z * z * proportion * (1 - proportion) / (margin * margin)
+    required = required / (1 + (required - 1) / total_lines)
+    return min(total_lines, int(math.ceil(required)))
+
+
+def get_dominant_day(datetimes):
+    """
+    Gets the day with the most lines in the datetime counts of a content summary.
+
+    Args:
+        datetimes (dict): A dictionary with counts of occurrences of each datetime (year, month, day, hour).
+
+    Returns:
+        tuple: The (year, month, day) of the dominant day and its number of lines, or (None, 0) if there are no datetimes.
+    """
+    days = {}
+    for (year, month, day, _), count in datetimes.items():
+        days[(year, month, day)] = days.get((year, month, day), 0) + count
+
+    if not days:
+        return None, 0
+    return max(days.items(), key=lambda item: (item[1], item[0]))
+
+
+def get_sample_proportions(summary):
+    """
+    Gets the counts of the proportions targeted by adaptive sampling from a content summary.
+
+    Args:
+        summary (dict): A content summary, as returned by validator.analyze_log_content.
+
+    Returns:
+        tuple: The number of evaluated lines, of lines with a remote IP and of lines from the dominant day.
+    """
+    sample_lines = sum(summary['ips'].values())
+    _, dominant_day_lines = get_dominant_day(summary['datetimes'])
+    return sample_lines, summary['ips']['remote'], dominant_day_lines
+
+
+def compute_required_lines(summary, total_lines, margin=ADAPTIVE_SAMPLE_MARGIN, confidence=ADAPTIVE_SAMPLE_CONFIDENCE):
+    """
+    Computes the number of lines needed to estimate both the remote IP ratio and the dominant day share
+    within a margin of error, given the sample summarized so far.
+
+    Args:
+        summary (dict): A content summary, as returned by validator.analyze_log_content.
+        total_lines (int): The number of lines in the file.
+        margin (float, optional): The target margin of error. Defaults to ADAPTIVE_SAMPLE_MARGIN.
+        confidence (float, optional): The confidence level. Defaults to ADAPTIVE_SAMPLE_CONFIDENCE.
+
+    Returns:
+        int: The required number of lines.
+    """
+    sample_lines, remote_lines, dominant_day_lines = get_sample_proportions(summary)
+    return max(
+        compute_required_sample_size(remote_lines, sample_lines, total_lines, margin, confidence),
+        compute_required_sample_size(dominant_day_lines, sample_lines, total_lines, margin, confidence),
+    )
+
+
+def get_error_bounds(summary, total_lines, confidence=ADAPTIVE_SAMPLE_CONFIDENCE):
+    """
+    Computes the estimates and error bounds of the remote IP ratio and of the dominant day share of a sample.
+
+    Args:
+        summary (dict): A content summary, as returned by validator.analyze_log_content.
+        total_lines (int): The number of lines in the file.
+        confidence (float, optional): The confidence level. Defaults to ADAPTIVE_SAMPLE_CONFIDENCE.
+
+    Returns:
+        dict: A dictionary containing the following keys:
+            - 'sample_lines' (int): The number of evaluated lines.
+            - 'confidence' (float): The confidence level of the margins.
+            - 'remote_ratio' (dict): The estimated share of lines with a remote IP and its margin.
+            - 'dominant_day' (dict): The dominant day (YYYY-MM-DD), its estimated share of lines and its margin.
+    """
+    sample_lines, remote_lines, dominant_day_lines = get_sample_proportions(summary)
+    dominant_day, _ = get_dominant_day(summary['datetimes'])
+
+    remote_ratio = float(remote_lines) / sample_lines if sample_lines else 0.0
+    dominant_day_share = float(dominant_day_lines) / sample_lines if sample_lines else 0.0
+
+    return {
+        'sample_lines': sample_lines,
+        'confidence': confidence,
+        'remote_ratio': {
+            'estimate': remote_ratio,
+            'margin': compute_margin(remote_lines, sample_lines, total_lines, confidence),
+        },
+        'dominant_day': {
+            'date': '%04d-%02d-%02d' % dominant_day if dominant_day else None,
+            'share': dominant_day_share,
+            'margin': compute_margin(dominant_day_lines, sample_lines, total_lines, confidence),
+        },
+    }
+
+
+class ReservoirSampler:
+    """
+    Keeps a uniform random sample of a fixed number of lines from a sequence of unknown length.
+
+    The positions of the lines that enter the sample are drawn with geometric jumps (Vitter's algorithm L),
+    so the cost of the lines that are skipped is negligible and the sampler can run in a counting pass.
+    The positions (starting at 0) of the kept lines are in `positions`, in the same order as `lines`.
+
+    Args:
+        size (int): The number of lines to keep.
+        rng (random.Random, optional): The random number generator. Defaults to a new unseeded generator.
+    """
+
+    def __init__(self, size, rng=None):
+        self.size = size
+        self.rng = rng or random.Random()
+        self.lines = []
+        self.positions = []
+        self.line_counter = 0
+        self._weight = 1.0
+        self._next_line = None
+
+    def _draw_next_line(self):
+        self._weight *= math.exp(math.log(1.0 - self.rng.random()) / self.size)
+        jump = math.floor(math.log(1.0 - self.rng.random()) / math.log(1.0 - self._weight)) if self._weight < 1.0 else 0
+        self._next_line += jump + 1
+
+    def keeps_next(self):
+        """
+        Tells whether the next line added will enter the sample, so that a costly item is only built when it is kept.
+
+        Returns:
+            bool: True if the next line will be kept, False otherwise.
+        """
+        if self.size <= 0:
+            return False
+        return len(self.lines) < self.size or self._next_line == self.line_counter
+
+    def add_batch(self, batch):
+        """
+        Adds the next lines of the sequence.
+
+        Args:
+            batch (list): The lines.
+        """
+        batch_start = self.line_counter
+        self.line_counter += len(batch)
+
+        if self.size <= 0:
+            return
+
+        # Fill the reservoir with the first lines
+        if len(self.lines) < self.size:
+            missing = self.size - len(self.lines)
+            self.lines.extend(batch[:missing])
+            self.positions.extend(range(batch_start, batch_start + min(missing, len(batch))))
+            if len(self.lines) < self.size:
+                return
+            self._next_line = self.size - 1
+            self._draw_next_line()
+
+        while self._next_line < self.line_counter:
+            index = self.rng.randrange(self.size)
+            self.lines[index] = batch[self._next_line - batch_start]
+            self.positions[index] = self._next_line
+            self._draw_next_line()
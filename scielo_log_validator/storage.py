@@ -0,0 +1,655 @@
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import datetime, timezone
+from urllib.parse import quote, urlsplit
+from xml.etree import ElementTree
+
+import hashlib
+import hmac
+import http.client
+import io
+import os
+import threading
+
+
+# Number of bytes fetched by each range request
+STORAGE_CHUNK_SIZE = int(os.environ.get('STORAGE_CHUNK_SIZE', str(8 * 1024 * 1024)))
+
+# Number of range requests issued ahead of the reading position (0 fetches each range when it is read)
+STORAGE_READ_AHEAD = int(os.environ.get('STORAGE_READ_AHEAD', '4'))
+
+# Number of seconds to wait for the storage server
+STORAGE_TIMEOUT = float(os.environ.get('STORAGE_TIMEOUT', '60'))
+
+# Endpoint of an S3-compatible service (e.g., http://localhost:9000 for MinIO), addressed with path-style URLs.
+# If empty, s3:// paths are read from AWS with virtual-hosted-style URLs
+S3_ENDPOINT_URL = os.environ.get('S3_ENDPOINT_URL', '')
+
+# Credentials and region used to sign S3 requests (requests are not signed if there are no credentials)
+AWS_ACCESS_KEY_ID = os.environ.get('AWS_ACCESS_KEY_ID', '')
+AWS_SECRET_ACCESS_KEY = os.environ.get('AWS_SECRET_ACCESS_KEY', '')
+AWS_SESSION_TOKEN = os.environ.get('AWS_SESSION_TOKEN', '')
+AWS_REGION = os.environ.get('AWS_REGION', os.environ.get('AWS_DEFAULT_REGION', 'us-east-1'))
+
+REMOTE_SCHEMES = ('http://', 'https://', 's3://')
+
+EMPTY_PAYLOAD_SHA256 = hashlib.sha256(b'').hexdigest()
+
+S3_XML_NAMESPACE = '{http://s3.amazonaws.com/doc/2006-03-01/}'
+
+
+class RangeNotSupportedError(OSError):
+    """
+    Raised when a server answers a range request with the whole object.
+    """
+
+
+def is_remote_path(path):
+    """
+    Checks whether a path is the URL of an object in a remote storage.
+
+    Args:
+        path (str): The path.
+
+    Returns:
+        bool: True if the path starts with http://, https:// or s3://, False otherwise.
+    """
+    return isinstance(path, str) and path.startswith(REMOTE_SCHEMES)
+
+
+def encode_query(query):
+    """
+    Encodes query parameters as in the canonical requests of AWS Signature Version 4, sorted and fully URI-encoded.
+
+    Args:
+        query (dict): The query parameters.
+
+    Returns:
+        str: The encoded query string.
+    """
+    return '&'.join('%s=%s' % (quote(k, safe='-_.~'), quote(str(v), safe='-_.~')) for k, v in sorted(query.items()))
+
+
+def sign_s3_request(method, host, path, query, headers, access_key, secret_key, region, session_token=None, now=None):
+    """
+    Signs an S3 request without payload with AWS Signature Version 4.
+
+    Args:
+        method (str): The HTTP method.
+        host (str): The host of the request, with its port if it is not the default one.
+        path (str): The URI-encoded path of the request.
+        query (dict): The query parameters of the request.
+        headers (dict): The headers of the request to be signed (e.g., Range).
+        access_key (str): The access key ID.
+        secret_key (str): The secret access key.
+        region (str): The region of the bucket.
+        session_token (str, optional): The session token of temporary credentials.
+        now (datetime, optional): The UTC time of the request. Defaults to the current time.
+
+    Returns:
+        dict: The headers of the request, with the signature in the Authorization header.
+    """
+    now = now or datetime.now(timezone.utc)
+    amz_date = now.strftime('%Y%m%dT%H%M%SZ')
+    date_stamp = now.strftime('%Y%m%d')
+
+    signed = {k.lower(): str(v).strip() for k, v in headers.items()}
+    signed.update({'host': host, 'x-amz-date': amz_date, 'x-amz-content-sha256': EMPTY_PAYLOAD_SHA256})
+    if session_token:
+        signed['x-amz-security-token'] = session_token
+
+    signed_headers = ';'.join(sorted(signed))
+    canonical_request = '\n'.join([
+        method,
+        path,
+        encode_query(query),
+        ''.join('%s:%s\n' % (k, signed[k]) for k in sorted(signed)),
+        signed_headers,
+        EMPTY_PAYLOAD_SHA256,
+    ])
+
+    scope = '%s/%s/s3/aws4_request' % (date_stamp, region)
+    string_to_sign = '\n'.join(['AWS4-HMAC-SHA256', amz_date, scope, hashlib.sha256(canonical_request.encode()).hexdigest()])
+
+    key = ('AWS4' + secret_key).encode()
+    for part in (date_stamp, region, 's3', 'aws4_request'):
+        key = hmac.new(key, part.encode(), hashlib.sha256).digest()
+    signature = hmac.new(key, string_to_sign.encode(), hashlib.sha256).hexdigest()
+
+    signed['authorization'] = 'AWS4-HMAC-SHA256 Credential=%s/%s, SignedHeaders=%s, Signature=%s' % (access_key, scope, signed_headers, signature)
+    del signed['host']
+    return signed
+
+
+class HttpStorage:
+    """
+    Reads objects served over HTTP(S) with range requests.
+
+    Each thread keeps its own persistent connection to each server, and the threads fetching ranges ahead
+    are shared by all the files, so the range requests of a file (and of the next files of the same server)
+    reuse connections instead of opening one per request.
+
+    Plain HTTP(S) servers have no way to list objects, so their URLs cannot be validated as directories.
+
+    Args:
+        timeout (float, optional): The number of seconds to wait for the server. Defaults to STORAGE_TIMEOUT.
+    """
+
+    can_list = False
+
+    def __init__(self, timeout=STORAGE_TIMEOUT):
+        self.timeout = timeout
+        self._local = threading.local()
+        self._executor = None
+        self._executor_lock = threading.Lock()
+
+    def get_executor(self, workers):
+        """
+        Gets the pool of threads fetching ranges ahead, creating it on first use.
+
+        Args:
+            workers (int): The number of threads of the pool, if it is created.
+
+        Returns:
+            concurrent.futures.ThreadPoolExecutor: The pool.
+        """
+        with self._executor_lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix='range-reader')
+            return self._executor
+
+    def get_location(self, path):
+        """
+        Gets the server and the URI-encoded path of an object.
+
+        Args:
+            path (str): The URL of the object.
+
+        Returns:
+            tuple: The scheme, the host (with its port) and the path of the object.
+        """
+        parts = urlsplit(path)
+        return parts.scheme, parts.netloc, (parts.path or '/') + ('?' + parts.query if parts.query else '')
+
+    def get_headers(self, method, host, path, query, headers):
+        return headers
+
+    def _get_connection(self, scheme, host):
+        connections = getattr(self._local, 'connections', None)
+        if connections is None:
+            connections = self._local.connections = {}
+
+        connection = connections.get((scheme, host))
+        if connection is None:
+            connection = connections[(scheme, host)] = self._create_connection(scheme, host)
+        return connection
+
+    def _create_connection(self, scheme, host):
+        connection_class = http.client.HTTPSConnection if scheme == 'https' else http.client.HTTPConnection
+        return connection_class(host, timeout=self.timeout)
+
+    def _check_status(self, method, path, response):
+        if response.status == 404:
+            raise FileNotFoundError('Object %s does not exist' % path)
+        if response.status >= 400 and response.status != 416:
+            raise OSError('Request %s %s failed with status %d' % (method, path, response.status))
+
+    def send(self, method, path, headers=None, query=None):
+        """
+        Sends a request without reading the body of its response, reconnecting once if a persistent connection
+        was closed by the server. The body must be read (or the connection closed) before the next request of
+        the calling thread to the same server.
+
+        Args:
+            method (str): The HTTP method.
+            path (str): The URL of the object.
+            headers (dict, optional): The headers of the request.
+            query (dict, optional): The query parameters of the request.
+
+        Returns:
+            tuple: The connection and the response.
+
+        Raises:
+            OSError: If the request fails.
+        """
+        scheme, host, url_path = self.get_location(path)
+        query = query or {}
+        request_path = url_path + ('?' + encode_query(query) if query else '')
+
+        for attempt in range(2):
+            connection = self._get_connection(scheme, host)
+            try:
+                connection.request(method, request_path, headers=self.get_headers(method, host, url_path, query, dict(headers or {})))
+                return connection, connection.getresponse()
+            except (http.client.RemoteDisconnected, http.client.CannotSendRequest, ConnectionResetError, BrokenPipeError):
+                connection.close()
+                if attempt:
+                    raise
+
+    def request(self, method, path, headers=None, query=None):
+        """
+        Sends a request and reads its response.
+
+        Args:
+            method (str): The HTTP method.
+            path (str): The URL of the object.
+            headers (dict, optional): The headers of the request.
+            query (dict, optional): The query parameters of the request.
+
+        Returns:
+            tuple: The status, the headers and the body of the response (whose status may be 416 for a range
+                   starting after the end of the object).
+
+        Raises:
+            FileNotFoundError: If the object does not exist.
+            OSError: If the request fails.
+        """
+        _, response = self.send(method, path, headers, query)
+        body = response.read()
+        self._check_status(method, path, response)
+        return response.status, response.headers, body
+
+    def get_size(self, path):
+        """
+        Gets the size of an object.
+
+        Args:
+            path (str): The URL of the object.
+
+        Returns:
+            int: The number of bytes of the object.
+        """
+        _, headers, _ = self.request('HEAD', path)
+        return int(headers['Content-Length'])
+
+    def read_range(self, path, start, end):
+        """
+        Reads a range of bytes of an object.
+
+        Args:
+            path (str): The URL of the object.
+            start (int): The offset of the first byte.
+            end (int): The offset after the last byte.
+
+        Returns:
+            bytes: The bytes of the range, which are fewer than requested at the end of the object.
+
+        Raises:
+            RangeNotSupportedError: If the server ignores the range and sends the whole object, which is not downloaded.
+        """
+        if end <= start:
+            return b''
+
+        connection, response = self.send('GET', path, headers={'Range': 'bytes=%d-%d' % (start, end - 1)})
+
+        # Downloading the whole object for every range would read it once per range, so the connection is dropped instead
+        if response.status == 200:
+            connection.close()
+            raise RangeNotSupportedError('Server of %s does not support range requests' % path)
+
+        body = response.read()
+        self._check_status('GET', path, response)
+
+        # The range starts after the end of the object
+        if response.status == 416:
+            return b''
+        return body
+
+    def open_stream(self, path):
+        """
+        Opens an object for a single sequential read, over a connection of its own (e.g., when its server does
+        not support range requests).
+
+        Args:
+            path (str): The URL of the object.
+
+        Returns:
+            tuple: The connection, to be closed once the object is read, and the response, whose body is the object.
+
+        Raises:
+            FileNotFoundError: If the object does not exist.
+            OSError: If the request fails.
+        """
+        scheme, host, url_path = self.get_location(path)
+        connection = self._create_connection(scheme, host)
+        try:
+            connection.request('GET', url_path, headers=self.get_headers('GET', host, url_path, {}, {}))
+            response = connection.getresponse()
+            self._check_status('GET', path, response)
+            if response.status != 200:
+                raise OSError('Request GET %s failed with status %d' % (path, response.status))
+        except BaseException:
+            connection.close()
+            raise
+        return connection, response
+
+    def list(self, path):
+        raise OSError('Objects of %s cannot be listed' % path)
+
+    def close(self):
+        """
+        Closes the connections of the calling thread and stops the threads fetching ranges ahead.
+        """
+        for connection in getattr(self._local, 'connections', {}).values():
+            connection.close()
+        with self._executor_lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=True)
+                self._executor = None
+
+
+class S3Storage(HttpStorage):
+    """
+    Reads objects of S3 and S3-compatible services (e.g., MinIO), given as s3://bucket/key paths.
+
+    Requests are signed with AWS Signature Version 4 when there are credentials.
+
+    Args:
+        endpoint_url (str, optional): The endpoint of an S3-compatible service. Defaults to S3_ENDPOINT_URL.
+        access_key (str, optional): The access key ID. Defaults to AWS_ACCESS_KEY_ID.
+        secret_key (str, optional): The secret access key. Defaults to AWS_SECRET_ACCESS_KEY.
+        region (str, optional): The region of the buckets. Defaults to AWS_REGION.
+        session_token (str, optional): The session token of temporary credentials. Defaults to AWS_SESSION_TOKEN.
+        timeout (float, optional): The number of seconds to wait for the server. Defaults to STORAGE_TIMEOUT.
+    """
+
+    can_list = True
+
+    def __init__(self, endpoint_url=None, access_key=None, secret_key=None, region=None, session_token=None, timeout=STORAGE_TIMEOUT):
+        super().__init__(timeout)
+        self.endpoint_url = S3_ENDPOINT_URL if endpoint_url is None else endpoint_url
+        self.access_key = AWS_ACCESS_KEY_ID if access_key is None else access_key
+        self.secret_key = AWS_SECRET_ACCESS_KEY if secret_key is None else secret_key
+        self.region = AWS_REGION if region is None else region
+        self.session_token = AWS_SESSION_TOKEN if session_token is None else session_token
+
+    def get_location(self, path):
+        parts = urlsplit(path)
+        bucket, key = parts.netloc, quote(parts.path.lstrip('/'), safe='/~')
+
+        if self.endpoint_url:
+            endpoint = urlsplit(self.endpoint_url)
+            return endpoint.scheme, endpoint.netloc, '%s/%s/%s' % (endpoint.path.rstrip('/'), bucket, key)
+        return 'https', '%s.s3.%s.amazonaws.com' % (bucket, self.region), '/' + key
+
+    def get_headers(self, method, host, path, query, headers):
+        if not self.access_key:
+            return headers
+        return sign_s3_request(method, host, path, query, headers, self.access_key, self.secret_key, self.region, self.session_token)
+
+    def list(self, path):
+        """
+        Lists the objects whose keys start with a prefix.
+
+        Args:
+            path (str): The s3://bucket/prefix path.
+
+        Yields:
+            str: The s3://bucket/key paths of the objects.
+        """
+        parts = urlsplit(path)
+        bucket_path = 's3://%s/' % parts.netloc
+        query = {'list-type': '2', 'prefix': parts.path.lstrip('/')}
+
+        while True:
+            _, _, body = self.request('GET', bucket_path, query=query)
+            root = ElementTree.fromstring(body)
+            for key in root.iter(S3_XML_NAMESPACE + 'Key'):
+                if not key.text.endswith('/'):
+                    yield bucket_path + key.text
+
+            token = root.findtext(S3_XML_NAMESPACE + 'NextContinuationToken')
+            if root.findtext(S3_XML_NAMESPACE + 'IsTruncated') != 'true' or not token:
+                break
+            query['continuation-token'] = token
+
+
+class RangeReader(io.RawIOBase):
+    """
+    Reads a remote object sequentially in ranges, fetching the next ranges on separate threads while the
+    current one is consumed, so that network latency overlaps with decompression and analysis.
+
+    If the server does not support range requests, the rest of the object is read from a single response,
+    which cannot be read out of order.
+
+    Args:
+        path (str): The URL of the object.
+        storage (HttpStorage, optional): The storage of the object. Defaults to the one returned by get_storage.
+        chunk_size (int, optional): The number of bytes of each range. Defaults to STORAGE_CHUNK_SIZE.
+        read_ahead (int, optional): The number of ranges fetched ahead. Defaults to STORAGE_READ_AHEAD.
+        size (int, optional): The size of the object, if already known. Defaults to None (requested to the server).
+    """
+
+    def __init__(self, path, storage=None, chunk_size=STORAGE_CHUNK_SIZE, read_ahead=STORAGE_READ_AHEAD, size=None):
+        super().__init__()
+        self.path = path
+        self.storage = storage or get_storage(path)
+        self.chunk_size = max(1, chunk_size)
+        self.read_ahead = max(0, read_ahead)
+        self.size = self.storage.get_size(path) if size is None else size
+        self.position = 0
+        self._chunks = {}
+        self._executor = self.storage.get_executor(self.read_ahead) if self.read_ahead else None
+        self._stream_connection = None
+        self._stream = None
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def tell(self):
+        return self.position
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        if whence == io.SEEK_CUR:
+            offset += self.position
+        elif whence == io.SEEK_END:
+            offset += self.size
+        if self._stream is not None and max(0, offset) != self.position:
+            raise OSError('Object %s cannot be read out of order, since its server does not support range requests' % self.path)
+        self.position = max(0, offset)
+        return self.position
+
+    def _fetch(self, index):
+        start = index * self.chunk_size
+        return self.storage.read_range(self.path, start, min(self.size, start + self.chunk_size))
+
+    def _get_chunk(self, index):
+        last_index = (self.size - 1) // self.chunk_size
+
+        # Ranges behind the reading position are no longer needed
+        for i in [i for i in self._chunks if i < index or i > index + self.read_ahead]:
+            self._chunks.pop(i).cancel()
+
+        for i in range(index, min(last_index, index + self.read_ahead) + 1):
+            if i not in self._chunks:
+                if self._executor is not None:
+                    self._chunks[i] = self._executor.submit(self._fetch, i)
+                else:
+                    self._chunks[i] = Future()
+                    self._chunks[i].set_result(self._fetch(i))
+
+        return self._chunks[index].result()
+
+    def _open_stream(self):
+        for future in self._chunks.values():
+            future.cancel()
+        self._chunks = {}
+
+        self._stream_connection, self._stream = self.storage.open_stream(self.path)
+        skipped = 0
+        while skipped < self.position:
+            block = self._stream.read(min(self.chunk_size, self.position - skipped))
+            if not block:
+                raise OSError('Object %s is shorter than %d bytes' % (self.path, self.size))
+            skipped += len(block)
+
+    def readinto(self, buffer):
+        if self.position >= self.size:
+            return 0
+
+        if self._stream is None:
+            index, offset = divmod(self.position, self.chunk_size)
+            try:
+                chunk = self._get_chunk(index)
+            except RangeNotSupportedError:
+                self._open_stream()
+            else:
+                size = min(len(buffer), len(chunk) - offset)
+                if size <= 0:
+                    raise OSError('Object %s is shorter than %d bytes' % (self.path, self.size))
+
+                buffer[:size] = chunk[offset:offset + size]
+                self.position += size
+                return size
+
+        size = self._stream.readinto(buffer)
+        if size <= 0:
+            raise OSError('Object %s is shorter than %d bytes' % (self.path, self.size))
+        self.position += size
+        return size
+
+    def close(self):
+        if not self.closed:
+            for future in self._chunks.values():
+                future.cancel()
+            self._chunks = {}
+            if self._stream is not None:
+                self._stream_connection.close()
+        super().close()
+
+
+_storages = {}
+_storages_lock = threading.Lock()
+
+
+def get_storage(path):
+    """
+    Gets the storage of a remote path, shared by all the files of the same kind so that connections are reused.
+
+    Args:
+        path (str): The URL of the object.
+
+    Returns:
+        HttpStorage: The storage (an S3Storage for s3:// paths).
+    """
+    kind = 's3' if path.startswith('s3://') else 'http'
+    with _storages_lock:
+        if kind not in _storages:
+            _storages[kind] = S3Storage() if kind == 's3' else HttpStorage()
+        return _storages[kind]
+
+
+def read_head(path, size):
+    """
+    Reads the first bytes of a remote object with a single range request (e.g., to detect its MIME type).
+
+    Args:
+        path (str): The URL of the object.
+        size (int): The number of bytes.
+
+    Returns:
+        bytes: The first bytes of the object.
+    """
+    remote_storage = get_storage(path)
+    try:
+        return remote_storage.read_range(path, 0, size)
+    except RangeNotSupportedError:
+        connection, response = remote_storage.open_stream(path)
+        try:
+            return response.read(size)
+        finally:
+            connection.close()
+
+
+class RemoteFile:
+    """
+    File object that decompresses a remote object and, when it is closed, also closes the reader of the ranges,
+    since decompressing wrappers (e.g., gzip.GzipFile) leave the file objects they were given open.
+
+    Args:
+        fileobj (file): The decompressed content.
+        reader (io.BufferedReader): The reader of the ranges the content is read from.
+    """
+
+    def __init__(self, fileobj, reader):
+        self.fileobj = fileobj
+        self.reader = reader
+
+    def __getattr__(self, name):
+        return getattr(self.fileobj, name)
+
+    def __iter__(self):
+        return iter(self.fileobj)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+        return False
+
+    @property
+    def closed(self):
+        return self.fileobj.closed
+
+    def close(self):
+        try:
+            self.fileobj.close()
+        finally:
+            self.reader.close()
+
+
+def open_remote(path, chunk_size=STORAGE_CHUNK_SIZE, read_ahead=STORAGE_READ_AHEAD, wrap=None):
+    """
+    Opens a remote object for sequential reading.
+
+    Args:
+        path (str): The URL of the object.
+        chunk_size (int, optional): The number of bytes of each range request. Defaults to STORAGE_CHUNK_SIZE.
+        read_ahead (int, optional): The number of ranges fetched ahead. Defaults to STORAGE_READ_AHEAD.
+        wrap (callable, optional): A function that wraps the binary file object (e.g., to decompress it). Defaults to None.
+
+    Returns:
+        file: The binary file object (an io.BufferedReader), or a RemoteFile with its wrapper, whose closing also
+              stops the ranges fetched ahead.
+    """
+    reader = io.BufferedReader(RangeReader(path, chunk_size=chunk_size, read_ahead=read_ahead), buffer_size=min(chunk_size, 1024 * 1024))
+    if wrap is None:
+        return reader
+
+    try:
+        fileobj = wrap(reader)
+    except BaseException:
+        reader.close()
+        raise
+    if fileobj is reader:
+        return reader
+    return RemoteFile(fileobj, reader)
+
+
+def can_list(path):
+    """
+    Checks whether the storage of a remote path can list objects, so that the path may be validated as a directory.
+
+    Args:
+        path (str): The URL of the directory.
+
+    Returns:
+        bool: True for s3:// paths, False for http(s):// URLs.
+    """
+    return get_storage(path).can_list
+
+
+def list_remote(path):
+    """
+    Lists the objects of a remote directory (an s3://bucket/prefix/ path).
+
+    Args:
+        path (str): The URL of the directory.
+
+    Yields:
+        str: The URLs of the objects.
+    """
+    return get_storage(path).list(path)
@@ -0,0 +1,269 @@
+import hashlib
+import json
+import os
+
+
+# Minimum share of a day's traffic a baseline must expect in an hour for a zero count there to be a gap
+MIN_EXPECTED_HOUR_SHARE = float(os.environ.get('MIN_EXPECTED_HOUR_SHARE', '0.01'))
+
+# Minimum number of lines a file must be expected to have in an hour for a zero count there to be a gap
+MIN_EXPECTED_HOUR_LINES = float(os.environ.get('MIN_EXPECTED_HOUR_LINES', '5'))
+
+# Maximum coefficient of variation of the hour counts for a log to be considered flat-lined
+MAX_FLAT_COEFFICIENT_OF_VARIATION = float(os.environ.get('MAX_FLAT_COEFFICIENT_OF_VARIATION', '0.05'))
+
+# Maximum total variation distance between a file profile and its collection baseline
+MAX_PROFILE_DISTANCE = float(os.environ.get('MAX_PROFILE_DISTANCE', '0.25'))
+
+# Minimum number of files learned by a baseline before it is used to judge other files
+MIN_BASELINE_FILES = int(os.environ.get('MIN_BASELINE_FILES', '7'))
+
+# Weight of a new file in the baseline (exponentially weighted moving average)
+BASELINE_LEARNING_RATE = float(os.environ.get('BASELINE_LEARNING_RATE', '0.1'))
+
+# Number of recent profile fingerprints kept per collection to detect duplicated logs
+MAX_BASELINE_FINGERPRINTS = int(os.environ.get('MAX_BASELINE_FINGERPRINTS', '1000'))
+
+
+def get_hour_histogram(datetimes):
+    """
+    Folds the (year, month, day, hour) counts of a content summary into a 24-hour histogram.
+
+    Args:
+        datetimes (dict): A dictionary with counts of occurrences of each datetime (year, month, day, hour).
+
+    Returns:
+        list: A list of 24 integers, the number of lines of each hour of the day.
+    """
+    histogram = [0] * 24
+    for (_, _, _, hour), count in datetimes.items():
+        histogram[hour] += count
+    return histogram
+
+
+def get_profile_fingerprint(datetimes):
+    """
+    Computes a fingerprint of the datetime counts of a content summary.
+
+    Two logs with the same lines have the same fingerprint, which is used to detect duplicated logs.
+
+    Args:
+        datetimes (dict): A dictionary with counts of occurrences of each datetime (year, month, day, hour).
+
+    Returns:
+        str: The fingerprint, as a hexadecimal string.
+    """
+    return hashlib.sha1(repr(sorted(datetimes.items())).encode()).hexdigest()
+
+
+def get_shares(histogram):
+    """
+    Normalizes a 24-hour histogram so that its values sum up to one.
+
+    Args:
+        histogram (list): A list of 24 counts.
+
+    Returns:
+        list: A list of 24 floats, or None if the histogram is empty.
+    """
+    total = sum(histogram)
+    if total == 0:
+        return None
+    return [float(c) / total for c in histogram]
+
+
+def compute_profile_distance(shares, baseline_shares):
+    """
+    Computes the total variation distance between two 24-hour distributions.
+
+    Args:
+        shares (list): The distribution of a file.
+        baseline_shares (list): The distribution of a baseline.
+
+    Returns:
+        float: A value between 0 (same distribution) and 1 (disjoint distributions).
+    """
+    return sum(abs(a - b) for a, b in zip(shares, baseline_shares)) / 2.0
+
+
+def is_flat(histogram):
+    """
+    Checks whether a 24-hour histogram is flat-lined, i.e., whether every hour has nearly the same count.
+
+    Real traffic varies along the day, so a flat histogram indicates synthetic or repeated content.
+
+    Args:
+        histogram (list): A list of 24 counts.
+
+    Returns:
+        bool: True if the histogram is flat-lined, False otherwise.
+    """
+    total = sum(histogram)
+    if total < 24 * MIN_EXPECTED_HOUR_LINES:
+        return False
+
+    mean = float(total) / 24
+    variance = sum((c - mean) ** 2 for c in histogram) / 24
+    return variance ** 0.5 / mean <= MAX_FLAT_COEFFICIENT_OF_VARIATION
+
+
+def find_gaps(histogram, baseline_shares):
+    """
+    Finds the hours without lines in which lines were expected, e.g., hours of server outages.
+
+    Lines are only expected at the hours of a usable baseline, so there is no default distribution: a uniform one
+    would flag the quiet hours of every collection (see analyze_traffic_profile).
+
+    Args:
+        histogram (list): A list of 24 counts.
+        baseline_shares (list): The expected share of lines of each hour, as learned by the baseline of the collection.
+
+    Returns:
+        list: The hours (0 to 23) without lines in which the baseline expects at least MIN_EXPECTED_HOUR_SHARE of the
+              lines, and at least MIN_EXPECTED_HOUR_LINES of them.
+    """
+    total = sum(histogram)
+    return [
+        hour for hour, count in enumerate(histogram)
+        if count == 0
+        and baseline_shares[hour] >= MIN_EXPECTED_HOUR_SHARE
+        and baseline_shares[hour] * total >= MIN_EXPECTED_HOUR_LINES
+    ]
+
+
+class TrafficBaseline:
+    """
+    Per-collection hour-of-day traffic baseline, learned from previous runs and stored in a local JSON file.
+
+    For each collection, it keeps the expected share of lines of each hour, the number of files learned,
+    and the fingerprints of recently seen profiles.
+
+    Args:
+        path (str, optional): The JSON file the baseline is loaded from and saved to.
+    """
+
+    def __init__(self, path=None):
+        self.path = path
+        self.collections = {}
+
+        if path and os.path.exists(path):
+            with open(path) as fin:
+                self.collections = json.load(fin)
+
+    def get(self, collection):
+        """
+        Gets the baseline of a collection.
+
+        Args:
+            collection (str): The collection ID.
+
+        Returns:
+            dict: A dictionary with the keys 'files', 'shares' and 'fingerprints', or None if there is no baseline.
+        """
+        return self.collections.get(collection)
+
+    def _get_or_create(self, collection):
+        return self.collections.setdefault(collection, {'files': 0, 'shares': None, 'fingerprints': {}})
+
+    def learn(self, collection, histogram):
+        """
+        Learns a new 24-hour histogram of a collection.
+
+        Args:
+            collection (str): The collection ID.
+            histogram (list): A list of 24 counts.
+        """
+        shares = get_shares(histogram)
+        if shares is None:
+            return
+
+        entry = self._get_or_create(collection)
+        if entry['shares'] is None:
+            entry['shares'] = shares
+        else:
+            # Plain average for the first files, then a moving average that follows slow changes
+            rate = max(BASELINE_LEARNING_RATE, 1.0 / (entry['files'] + 1))
+            entry['shares'] = [(1 - rate) * b + rate * s for b, s in zip(entry['shares'], shares)]
+        entry['files'] += 1
+
+    def remember(self, collection, fingerprint, path=None):
+        """
+        Records the profile fingerprint of a file, so that later copies of it are detected.
+
+        Args:
+            collection (str): The collection ID.
+            fingerprint (str): The profile fingerprint of the file.
+            path (str, optional): The path of the file.
+        """
+        fingerprints = self._get_or_create(collection)['fingerprints']
+        fingerprints[fingerprint] = path
+        while len(fingerprints) > MAX_BASELINE_FINGERPRINTS:
+            del fingerprints[next(iter(fingerprints))]
+
+    def save(self, path=None):
+        """
+        Saves the baseline to a JSON file.
+
+        Args:
+            path (str, optional): The output file path. Defaults to the path the baseline was loaded from.
+        """
+        path = path or self.path
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'w') as fout:
+            json.dump(self.collections, fout)
+        os.replace(tmp_path, path)
+
+
+def analyze_traffic_profile(datetimes, baseline_entry=None, path=None):
+    """
+    Compares the 24-hour traffic distribution of a file with the baseline of its collection.
+
+    Only the datetime counts already computed by the content analysis are used, so no extra
+    reading of the file is needed.
+
+    Args:
+        datetimes (dict): A dictionary with counts of occurrences of each datetime (year, month, day, hour).
+        baseline_entry (dict, optional): The baseline of the collection, as returned by TrafficBaseline.get.
+        path (str, optional): The path of the file, so that a file validated again is not a duplicate of itself.
+
+    Returns:
+        dict: A dictionary containing the following keys:
+            - 'hours' (list): The number of lines of each hour of the day.
+            - 'fingerprint' (str): The profile fingerprint.
+            - 'gaps' (list): The hours without lines in which the baseline expects lines (none until the baseline is usable).
+            - 'flat' (bool): Whether every hour has nearly the same number of lines.
+            - 'duplicate_of' (str): The file with the same profile seen before, if any.
+            - 'distance' (float): The distance to the baseline, or None if there is no usable baseline.
+            - 'anomalous' (bool): Whether any of the checks above failed.
+    """
+    histogram = get_hour_histogram(datetimes)
+    fingerprint = get_profile_fingerprint(datetimes)
+
+    baseline_shares = None
+    duplicate_of = None
+    if baseline_entry:
+        if baseline_entry['files'] >= MIN_BASELINE_FILES:
+            baseline_shares = baseline_entry['shares']
+        seen_path = baseline_entry['fingerprints'].get(fingerprint, path)
+        if seen_path != path:
+            duplicate_of = seen_path or ''
+
+    shares = get_shares(histogram)
+    distance = None
+    if shares is not None and baseline_shares is not None:
+        distance = compute_profile_distance(shares, baseline_shares)
+
+    # Until the baseline is usable, no hour is known to have traffic (e.g., the quiet night hours of a small collection),
+    # so gaps are not detected and the first files of a collection can be learned
+    gaps = find_gaps(histogram, baseline_shares) if baseline_shares is not None else []
+    flat = is_flat(histogram)
+
+    return {
+        'hours': histogram,
+        'fingerprint': fingerprint,
+        'gaps': gaps,
+        'flat': flat,
+        'duplicate_of': duplicate_of,
+        'distance': distance,
+        'anomalous': bool(gaps or flat or duplicate_of is not None or (distance is not None and distance > MAX_PROFILE_DISTANCE)),
+    }
@@ -1,14 +1,35 @@
 # -*- coding: UTF-8 -*-
-from argparse import ArgumentParser
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import closing
 from datetime import datetime
+from functools import partial
+from itertools import islice
 
 import os
 import operator
+import random
 import re
+import sys
 
 from ipaddress import ip_address
 
-from scielo_log_validator import date_utils, exceptions, file_utils, values
+from scielo_log_validator import (
+    aggregation,
+    bots,
+    budget,
+    cardinality,
+    cidr,
+    date_utils,
+    exceptions,
+    file_utils,
+    fingerprint,
+    invalid_lines,
+    profiling,
+    sampling,
+    storage,
+    traffic,
+    values,
+)
 
 
 # Minimum acceptable percentage of remote IPs to consider the log file valid
@@ -17,15 +38,29 @@ MIN_ACCEPTABLE_PERCENT_OF_REMOTE_IPS = float(os.environ.get('MIN_ACCEPTABLE_PERC
 # Minimum number of sample lines to be considered in the content validation
 MIN_NUMBER_OF_SAMPLE_LINES = int(os.environ.get('MIN_NUMBER_OF_SAMPLE_LINES', '1000'))
 
-# Default message for the application
-COMMAND_LINE_SCRIPT_MESSAGE = '''
-SciELO Log Validator
+# Number of decompressed bytes read at a time in the content analysis
+READ_BLOCK_SIZE = int(os.environ.get('READ_BLOCK_SIZE', str(1024 * 1024)))
 
-This script is responsible for validating log usage records obtained from the SciELO Network Apache Servers.
-A validation is composed of two main aspects as follows:
-    1) Validation with regard to the file name
-    2) Validation with regard to the file content
-'''
+# Number of blocks a reader thread may decompress ahead of the content analysis (0 disables the reader thread)
+READER_QUEUE_DEPTH = int(os.environ.get('READER_QUEUE_DEPTH', '0'))
+
+# Patterns tried, in order, to parse a log line
+LOG_LINE_PATTERNS = [
+    re.compile(values.PATTERN_NCSA_EXTENDED_LOG_FORMAT),
+    re.compile(values.PATTERN_NCSA_EXTENDED_LOG_FORMAT_DOMAIN),
+    re.compile(values.PATTERN_NCSA_EXTENDED_LOG_FORMAT_WITH_IP_LIST),
+    re.compile(values.PATTERN_NCSA_EXTENDED_LOG_FORMAT_DOMAIN_WITH_IP_LIST),
+]
+
+# Number of file names validated at a time by validate_path_names
+PATH_VALIDATION_BATCH_SIZE = int(os.environ.get('PATH_VALIDATION_BATCH_SIZE', '10000'))
+
+# Content summaries returned when the content of a file cannot be analyzed
+CONTENT_ERRORS = {
+    exceptions.TruncatedLogFileError: 'File is truncated',
+    exceptions.InvalidLogFileMimeError: 'File is invalid',
+    exceptions.LogFileIsEmptyError: 'File is empty',
+}
 
 
 def get_execution_mode(path):
@@ -33,14 +68,24 @@ def get_execution_mode(path):
     Determines the execution mode based on the given path.
 
     Args:
-        path (str): The path to check.
+        path (str): The path to check, which may be the URL of a remote object (or, ending with '/', of a remote directory).
 
     Returns:
-        str: 'validate-file' if the path is a file, 'validate-directory' if the path is a directory.
+        str: 'validate-file' if the path is a file, 'validate-directory' if the path is a directory,
+             'validate-stream' if the path is '-' (the standard input).
 
     Raises:
         FileNotFoundError: If the path does not exist.
+        NotADirectoryError: If the path is the URL of a remote directory whose storage cannot list objects (e.g., an http(s):// URL).
     """
+    if path == '-':
+        return 'validate-stream'
+    if storage.is_remote_path(path):
+        if not path.endswith('/'):
+            return 'validate-file'
+        if not storage.can_list(path):
+            raise NotADirectoryError('Objects of %s cannot be listed; only s3:// directories are supported' % path)
+        return 'validate-directory'
     if os.path.exists(path):
         if os.path.isfile(path):
             return 'validate-file'
@@ -49,17 +94,27 @@ def get_execution_mode(path):
     raise FileNotFoundError()
 
 
-def get_ip_type(ip):
+def get_ip_type(ip, cidr_table=None):
     """
     Determine the type of an IP address.
     Args:
         ip (str): The IP address to be evaluated.
+        cidr_table (cidr.CidrTable, optional): The table of CIDR blocks checked before the built-in categories.
+                                               Defaults to cidr.get_default_cidr_table().
     Returns:
         str: The type of the IP address, which can be one of the following:
             - 'remote': if the IP address is a global address.
             - 'local': if the IP address is private, loopback, or link-local.
-            - 'unknown': if the IP address is invalid or its type cannot be determined.
+            - 'unknown': if the IP address is invalid, belongs to a proxy, or its type cannot be determined.
     """
+    if cidr_table is None:
+        cidr_table = cidr.get_default_cidr_table()
+
+    if cidr_table is not None and ip:
+        ip_type = cidr_table.lookup(ip)
+        if ip_type is not None:
+            # The address of a proxy is not the client's, which is then looked for in the IP list
+            return 'unknown' if ip_type == cidr.IP_TYPE_PROXY else ip_type
 
     try:
         ipa = ip_address(ip)
@@ -167,102 +222,570 @@ def get_total_lines(path, buffer_size=2048):
         raise exceptions.LogFileIsEmptyError('Arquivo %s está vazio' % path)
 
 
-def analyze_log_content(path, total_lines, sample_lines):
+def decode_log_line(line):
+    """
+    Decodes a log line and strips its surrounding whitespace.
+
+    Args:
+        line (bytes or str): The log line.
+
+    Returns:
+        str: The decoded line. Bytes that are not valid UTF-8 are discarded.
+    """
+    try:
+        return line.decode().strip() if isinstance(line, bytes) else line.strip()
+    except UnicodeDecodeError:
+        return line.decode('utf-8', errors='ignore').strip() if isinstance(line, bytes) else line.strip()
+
+
+def parse_log_line(decoded_line):
+    """
+    Matches a log line against the supported log formats and determines the type of its IP address.
+
+    Patterns are tried in order until one of them yields a known IP type, either from the 'ip'
+    field or from the 'ip_list' field.
+
+    Args:
+        decoded_line (str): The decoded log line.
+
+    Returns:
+        tuple: The IP type ('remote', 'local' or 'unknown') and the match of the last pattern tried,
+               which is None if that pattern did not match.
+    """
+    ip_type, _, match = parse_log_line_ip(decoded_line)
+    return ip_type, match
+
+
+def parse_log_line_ip(decoded_line):
+    """
+    Matches a log line like parse_log_line, also returning the IP address its type was determined from.
+
+    Args:
+        decoded_line (str): The decoded log line.
+
+    Returns:
+        tuple: The IP type, the IP address (None if no pattern matched) and the match of the last pattern tried.
+    """
+    match = None
+    ip_type = 'unknown'
+    ip_value = None
+
+    for pattern in LOG_LINE_PATTERNS:
+        match = pattern.match(decoded_line)
+
+        # Match the pattern and extract the IP address
+        if match:
+            content = match.groupdict()
+
+            ip_value = content.get('ip')
+            ip_type = get_ip_type(ip_value)
+
+            if ip_type != 'unknown':
+                break
+            else:
+                for i in content.get('ip_list', '').split(','):
+                    ip_value = i.strip()
+                    ip_type = get_ip_type(ip_value)
+                    if ip_type != 'unknown':
+                        break
+
+                if ip_type != 'unknown':
+                    break
+
+    return ip_type, ip_value, match
+
+
+class LogContentAnalyzer:
+    """
+    Accumulates the summary of the lines of a log file, evaluating one out of every `stride` lines.
+
+    Lines are given in batches, and only the positions to be evaluated are visited, so the cost of the
+    lines that are not sampled is negligible.
+
+    Args:
+        stride (int, optional): The interval between evaluated lines. Defaults to 1 (every line is evaluated).
+        first_line (int, optional): The number (starting at 1) of the first line to be evaluated. Defaults to stride.
+        content_budget (budget.ContentBudget, optional): The budget checked before each evaluated line. Defaults to None (no limit).
+        distinct_ips (bool, optional): Whether to sketch the distinct local and remote IPs of the evaluated lines. Defaults to False.
+        user_agents (bool, optional): Whether to classify the user agents of the evaluated lines as bots or humans. Defaults to False.
+        invalid_samples (int, optional): The number of invalid lines kept as examples, with the categories of all invalid lines
+                                         (see invalid_lines.InvalidLineCollector). Defaults to INVALID_LINE_SAMPLE_SIZE (0, none).
+    """
+
+    def __init__(self, stride=1, first_line=None, content_budget=None, distinct_ips=False, user_agents=False, invalid_samples=invalid_lines.INVALID_LINE_SAMPLE_SIZE):
+        self.stride = stride
+        self.content_budget = content_budget
+        self.next_eval_line = stride if first_line is None else first_line
+        self.line_counter = 0
+        self.ips = {'local': 0, 'remote': 0, 'unknown': 0}
+        self.datetimes = {}
+        self.invalid_lines = 0
+        self.distinct_ips = cardinality.DistinctIpSketches() if distinct_ips else None
+        self.user_agent_classifier = bots.get_default_classifier() if user_agents else None
+        self.user_agents = dict.fromkeys(bots.USER_AGENT_CLASSES, 0)
+        self.invalid_line_collector = invalid_lines.InvalidLineCollector(invalid_samples) if invalid_samples > 0 else None
+
+        # Lines evaluated in earlier passes, which are not evaluated again (None to evaluate every sampled line), as the stride,
+        # first and last evaluated line of each systematic pass, so that tracking them does not grow with the sample
+        self.evaluated_passes = None
+
+        # Numbers of the lines of a random pilot sample, evaluated before the systematic passes (a fixed number of them)
+        self.pilot_line_numbers = frozenset()
+
+        # Position of the current batch in the file, used to locate the invalid lines collected
+        self.positions_known = True
+        self._batch = None
+        self._batch_start = 0
+        self._batch_offset = 0
+
+    def add_batch(self, batch):
+        """
+        Adds the next lines of the file, evaluating those at the sampled positions.
+
+        Args:
+            batch (list): The lines, as bytes or str.
+
+        Returns:
+            bool: True if the batch was fully added, False if the budget was exceeded, in which case
+                  the lines after the last evaluated one are not counted.
+        """
+        batch_end = self.line_counter + len(batch)
+        if self.invalid_line_collector is not None:
+            self._batch = batch
+            self._batch_start = self.line_counter
+
+        while self.next_eval_line <= batch_end:
+            if self.content_budget is not None and not self.content_budget.check_time():
+                self.line_counter = self.next_eval_line - 1
+                return False
+            if self.evaluated_passes is None or not self.was_evaluated(self.next_eval_line):
+                self.evaluate_line(batch[self.next_eval_line - self.line_counter - 1])
+            self.next_eval_line += self.stride
+
+        self.line_counter = batch_end
+        if self.invalid_line_collector is not None:
+            # Lines do not keep their line breaks
+            self._batch_offset += sum(map(len, batch)) + len(batch)
+        return True
+
+    def was_evaluated(self, line_number):
+        """
+        Checks whether a line was evaluated in an earlier pass, given the pilot sample and the earlier passes.
+
+        Args:
+            line_number (int): The number of the line (starting at 1).
+
+        Returns:
+            bool: True if the line is in the pilot sample or at a position of an earlier pass, False otherwise.
+        """
+        if line_number in self.pilot_line_numbers:
+            return True
+        for stride, first_line, last_line in self.evaluated_passes:
+            if first_line <= line_number <= last_line and (line_number - first_line) % stride == 0:
+                return True
+        return False
+
+    def rewind(self, stride=1, first_line=None):
+        """
+        Starts a new pass over the lines of the file, keeping the counts accumulated so far.
+        If evaluated_passes is tracked, the lines evaluated in earlier passes are not evaluated again.
+
+        Args:
+            stride (int, optional): The interval between evaluated lines in the new pass. Defaults to 1.
+            first_line (int, optional): The number of the first line to be evaluated in the new pass. Defaults to stride.
+        """
+        self.stride = stride
+        self.next_eval_line = stride if first_line is None else first_line
+        self.line_counter = 0
+        self.positions_known = True
+        self._batch_offset = 0
+
+    def evaluate_line(self, line):
+        """
+        Parses a line and counts its IP type and datetime.
+
+        Args:
+            line (bytes or str): The log line.
+        """
+        decoded_line = decode_log_line(line)
+        ip_type, ip_value, match = parse_log_line_ip(decoded_line)
+        self.ips[ip_type] += 1
+        hour = None
+
+        # Match the date pattern and extract the datetime
+        if match:
+            content = match.groupdict()
+
+            matched_datetime = content.get('date', '')
+            if self.user_agent_classifier is not None:
+                self.user_agents[self.user_agent_classifier.classify(content.get('user_agent'))] += 1
+            try:
+                hour = get_year_month_day_hour_from_date_str(matched_datetime)
+
+                if hour not in self.datetimes:
+                    self.datetimes[hour] = 0
+                self.datetimes[hour] += 1
+
+            except ValueError:
+                self.invalid_lines += 1
+                if self.invalid_line_collector is not None:
+                    self.add_invalid_line(line, decoded_line, True)
+
+        else:
+            self.invalid_lines += 1
+            if self.invalid_line_collector is not None:
+                self.add_invalid_line(line, decoded_line, False)
+
+        # Evaluating a line twice (e.g., in another pass of adaptive sampling) does not change the sketches
+        if self.distinct_ips is not None:
+            self.distinct_ips.add(ip_type, ip_value, hour)
+
+    def add_invalid_line(self, line, decoded_line, matched):
+        """
+        Categorizes an invalid line and offers it to the reservoir of invalid lines, with its position in the file.
+
+        Args:
+            line (bytes or str): The line, as read.
+            decoded_line (str): The decoded line.
+            matched (bool): Whether a log pattern matched the line.
+        """
+        line_number = get_offset = None
+        if self.positions_known and self._batch is not None:
+            line_number = self.next_eval_line
+            batch, index, offset = self._batch, self.next_eval_line - self._batch_start - 1, self._batch_offset
+            get_offset = lambda: offset + sum(map(len, batch[:index])) + index
+
+        category = invalid_lines.categorize_invalid_line(line, decoded_line, matched)
+        self.invalid_line_collector.add(line, category, line_number, get_offset)
+
+    def get_summary(self, total_lines=None):
+        """
+        Gets the summary of the lines added so far.
+
+        Args:
+            total_lines (int, optional): The total number of lines in the log file. Defaults to the number of lines added.
+
+        Returns:
+            dict: The summary, as described in analyze_log_content.
+        """
+        summary = {
+            'ips': self.ips,
+            'datetimes': self.datetimes,
+            'invalid_lines': self.invalid_lines,
+            'total_lines': self.line_counter if total_lines is None else total_lines,
+        }
+        if self.distinct_ips is not None:
+            summary['distinct_ips'] = self.distinct_ips
+        if self.user_agent_classifier is not None:
+            summary['user_agents'] = self.user_agents
+        if self.invalid_line_collector is not None:
+            summary['invalid_details'] = self.invalid_line_collector.get_report()
+        return summary
+
+
+def add_budget_report(summary, content_budget, lines_read):
+    """
+    Flags a content summary as partial if the analysis was stopped by its budget.
+
+    The total number of lines of a partial summary is replaced with the number of lines read,
+    so that the proportions computed from it refer to the part of the file that was analyzed.
+
+    Args:
+        summary (dict): The content summary.
+        content_budget (budget.ContentBudget): The budget of the analysis, or None if it had no limits.
+        lines_read (int): The number of lines read before the analysis stopped.
+
+    Returns:
+        dict: The same summary, with a 'budget' key (see budget.ContentBudget.get_report) if the budget was exceeded.
+    """
+    if content_budget is not None and content_budget.exceeded is not None:
+        summary['total_lines'] = lines_read
+        summary['budget'] = content_budget.get_report(lines_read)
+    return summary
+
+
+def iter_file_line_batches(data, block_size=READ_BLOCK_SIZE, queue_depth=READER_QUEUE_DEPTH):
+    """
+    Iterates over the lines of an open file in batches, reading on a separate thread if queue_depth is positive.
+
+    Args:
+        data (file): An open file.
+        block_size (int, optional): The number of decompressed bytes read at a time.
+        queue_depth (int, optional): The number of blocks a separate reader thread may decompress ahead.
+
+    Returns:
+        generator: The batches of lines.
+    """
+    if queue_depth > 0:
+        return file_utils.iter_line_batches_threaded(data, block_size, queue_depth)
+    return file_utils.iter_line_batches(data, block_size)
+
+
+def get_sample_stride(sample_size, total_lines=None, min_lines=MIN_NUMBER_OF_SAMPLE_LINES):
+    """
+    Gets the interval between the lines evaluated in the sample of a log file, as validate_content draws it.
+
+    Args:
+        sample_size (float): The fraction of lines to sample for analysis.
+        total_lines (int, optional): The number of lines of the file. Defaults to None (not known), in which case
+                                     the interval is that of a file with many lines.
+        min_lines (int, optional): The number of lines up to which every line is evaluated.
+
+    Returns:
+        int: The stride, the first evaluated line being the stride-th one.
+    """
+    if total_lines is None:
+        return max(1, int(1 / sample_size))
+    if total_lines <= min_lines:
+        return 1
+    return max(1, int(total_lines / max(1, int(total_lines * sample_size))))
+
+
+def analyze_log_content(path, total_lines, sample_lines, block_size=READ_BLOCK_SIZE, queue_depth=READER_QUEUE_DEPTH, content_budget=None, distinct_ips=False, user_agents=False, invalid_samples=invalid_lines.INVALID_LINE_SAMPLE_SIZE):
     """
     Analyzes a log file and provides a summary of its content.
     Args:
         path (str): The file path to the log file.
         total_lines (int): The total number of lines in the log file.
         sample_lines (int): The number of lines to sample for analysis.
+        block_size (int, optional): The number of decompressed bytes read at a time.
+        queue_depth (int, optional): The number of blocks a separate reader thread may decompress ahead of the analysis.
+                                     If 0, blocks are read by the analysis thread itself.
+        content_budget (budget.ContentBudget, optional): The time and byte limits of the analysis. Defaults to None (no limit).
+        distinct_ips (bool, optional): Whether to sketch the distinct local and remote IPs of the sampled lines. Defaults to False.
+        user_agents (bool, optional): Whether to count the bot and human user agents of the sampled lines. Defaults to False.
+        invalid_samples (int, optional): The number of invalid lines of the sample kept as examples. Defaults to INVALID_LINE_SAMPLE_SIZE (0, none).
     Returns:
         dict: A dictionary containing the following keys:
             - 'ips' (dict): A dictionary with counts of 'local' and 'remote' IP addresses.
             - 'datetimes' (dict): A dictionary with counts of occurrences of each datetime (year, month, day, hour).
             - 'invalid_lines' (int): The number of lines that could not be parsed.
-            - 'total_lines' (int): The total number of lines in the log file.
+            - 'total_lines' (int): The total number of lines in the log file (or, if the budget was exceeded, of lines read).
+            - 'budget' (dict): How the analysis was limited (see budget.ContentBudget.get_report), only if the budget was exceeded.
+            - 'distinct_ips' (cardinality.DistinctIpSketches): The sketches of the distinct IPs, overall and per hour, only if distinct_ips is True.
+            - 'user_agents' (dict): The number of lines with a 'bot', 'human' and 'unknown' (empty) user agent, only if user_agents is True.
+            - 'invalid_details' (dict): The categories of the invalid lines and a sample of them (see invalid_lines.InvalidLineCollector.get_report),
+                                        only if invalid_samples is positive.
     Raises:
         exceptions.LogFileIsEmptyError: If the log file is empty.
     """
-    ips = {'local': 0, 'remote': 0, 'unknown': 0}
-    datetimes = {}
-    invalid_lines = 0
-
     try:
-        eval_lines = set(range(0, total_lines + 1, int(total_lines/sample_lines)))
+        stride = max(1, int(total_lines/sample_lines))
     except ZeroDivisionError:
         raise exceptions.LogFileIsEmptyError('Arquivo %s está vazio' % path)
 
-    line_counter = 0
+    # Lines are evaluated at every stride-th position, so only the next target is kept in memory
+    analyzer = LogContentAnalyzer(stride, content_budget=content_budget, distinct_ips=distinct_ips, user_agents=user_agents, invalid_samples=invalid_samples)
 
     with file_utils.open_file(path) as data:
-        for line in data:
-            try:
-                decoded_line = line.decode().strip() if isinstance(line, bytes) else line.strip()
-            except UnicodeDecodeError:
-                decoded_line = line.decode('utf-8', errors='ignore').strip() if isinstance(line, bytes) else line.strip()
-            line_counter += 1
-
-            if line_counter in eval_lines:
-                patterns = [
-                    values.PATTERN_NCSA_EXTENDED_LOG_FORMAT,
-                    values.PATTERN_NCSA_EXTENDED_LOG_FORMAT_DOMAIN,
-                    values.PATTERN_NCSA_EXTENDED_LOG_FORMAT_WITH_IP_LIST,
-                    values.PATTERN_NCSA_EXTENDED_LOG_FORMAT_DOMAIN_WITH_IP_LIST,
-                ]
-
-                match = None
-                ip_type = 'unknown'
-
-                for pattern in patterns:
-                    match = re.match(pattern, decoded_line)
-
-                    # Match the pattern and extract the IP address
-                    if match:
-                        content = match.groupdict()
-                        
-                        ip_value = content.get('ip')
-                        ip_type = get_ip_type(ip_value)
+        if content_budget is not None:
+            data = content_budget.wrap(data)
+        with closing(iter_file_line_batches(data, block_size, queue_depth)) as batches:
+            for batch in batches:
+                if not analyzer.add_batch(batch):
+                    break
+
+    return add_budget_report(analyzer.get_summary(total_lines), content_budget, analyzer.line_counter)
+
+
+def count_lines_with_pilot(path, pilot_lines, rng, buffer_size=2048, block_size=READ_BLOCK_SIZE, queue_depth=READER_QUEUE_DEPTH, content_budget=None):
+    """
+    Counts the number of lines in a file while drawing a uniform random sample of them.
+
+    Args:
+        path (str): The path to the file.
+        pilot_lines (int): The number of lines to sample.
+        rng (random.Random): The random number generator.
+        buffer_size (int, optional): The buffer size for file type checking. Defaults to 2048.
+        block_size (int, optional): The number of decompressed bytes read at a time.
+        queue_depth (int, optional): The number of blocks a separate reader thread may decompress ahead of the counting.
+        content_budget (budget.ContentBudget, optional): The time and byte limits of the counting. Defaults to None (no limit).
+
+    Returns:
+        tuple: The number of lines in the file (or, if the budget was exceeded, of lines read), the list of sampled lines
+               and the list of their line numbers (starting at 1).
+
+    Raises:
+        exceptions.TruncatedLogFileError: If the file is truncated.
+        exceptions.InvalidLogFileMimeError: If the file has an invalid MIME type.
+        exceptions.LogFileIsEmptyError: If the file is empty.
+    """
+    reservoir = sampling.ReservoirSampler(pilot_lines, rng)
+
+    try:
+        with file_utils.open_file(path=path, buffer_size=buffer_size) as data:
+            if content_budget is not None:
+                data = content_budget.wrap(data)
+            with closing(iter_file_line_batches(data, block_size, queue_depth)) as batches:
+                for batch in batches:
+                    reservoir.add_batch(batch)
+    except EOFError:
+        raise exceptions.TruncatedLogFileError('Arquivo %s está truncado' % path)
 
-                        if ip_type != 'unknown':
-                            break
-                        else:
-                            for i in content.get('ip_list', '').split(','):
-                                ip_type = get_ip_type(i.strip())
-                                if ip_type != 'unknown':
-                                    break
+    return reservoir.line_counter, reservoir.lines, [position + 1 for position in reservoir.positions]
 
-                            if ip_type != 'unknown':
-                                break
 
-                ips[ip_type] += 1
+def analyze_log_content_adaptive(path, total_lines=None, margin=sampling.ADAPTIVE_SAMPLE_MARGIN, confidence=sampling.ADAPTIVE_SAMPLE_CONFIDENCE, pilot_lines=sampling.ADAPTIVE_PILOT_LINES, min_lines=MIN_NUMBER_OF_SAMPLE_LINES, buffer_size=2048, block_size=READ_BLOCK_SIZE, queue_depth=READER_QUEUE_DEPTH, seed=None, content_budget=None, distinct_ips=False, user_agents=False, invalid_samples=invalid_lines.INVALID_LINE_SAMPLE_SIZE):
+    """
+    Analyzes a log file with a sample just large enough to estimate the remote IP ratio and the share of the
+    dominant day within a margin of error, so the number of parsed lines per file is roughly constant instead of
+    linear in its size.
+
+    A pilot sample is drawn at random while the lines are counted (or, if the number of lines is already known,
+    in a systematic pass). The number of lines needed for the target precision is then computed from the pilot
+    proportions, and further systematic passes, starting at a random line, grow the sample while it is too small.
+    The cost is bounded in parsing, not in reading: the file is decompressed in full to count its lines, and once
+    more for each pass that grows the sample.
+
+    Args:
+        path (str): The file path to the log file.
+        total_lines (int, optional): The number of lines of the file, if already known. Defaults to None (lines are counted).
+        margin (float, optional): The target margin of error of the estimated proportions.
+        confidence (float, optional): The confidence level of the margin of error.
+        pilot_lines (int, optional): The number of lines of the pilot sample.
+        min_lines (int, optional): The number of lines up to which every line is evaluated.
+        buffer_size (int, optional): The buffer size for file type checking. Defaults to 2048.
+        block_size (int, optional): The number of decompressed bytes read at a time.
+        queue_depth (int, optional): The number of blocks a separate reader thread may decompress ahead of the analysis.
+        seed (optional): The seed of the random sampling. Defaults to the path, so that results are reproducible.
+        content_budget (budget.ContentBudget, optional): The time and byte limits of all passes. Defaults to None (no limit).
+                                                         If the counting pass exceeds them, the pilot sample of the lines
+                                                         read so far is analyzed; if a later pass does, it stops early.
+        distinct_ips (bool, optional): Whether to sketch the distinct local and remote IPs of the sampled lines. Defaults to False.
+        user_agents (bool, optional): Whether to count the bot and human user agents of the sampled lines. Defaults to False.
+        invalid_samples (int, optional): The number of invalid lines of the sample kept as examples. Defaults to INVALID_LINE_SAMPLE_SIZE (0, none).
+
+    Returns:
+        dict: The summary, as described in analyze_log_content, with a 'sampling' key containing the
+              error bounds of the estimates (see sampling.get_error_bounds).
+
+    Raises:
+        exceptions.TruncatedLogFileError: If the log file is truncated.
+        exceptions.InvalidLogFileMimeError: If the log file has an invalid MIME type.
+        exceptions.LogFileIsEmptyError: If the log file is empty.
+    """
+    rng = random.Random(path if seed is None else seed)
+    analyzer = LogContentAnalyzer(distinct_ips=distinct_ips, user_agents=user_agents, invalid_samples=invalid_samples)
+
+    if total_lines is None:
+        total_lines, pilot, pilot_line_numbers = count_lines_with_pilot(path, pilot_lines, rng, buffer_size=buffer_size, block_size=block_size, queue_depth=queue_depth, content_budget=content_budget)
+        exhausted = content_budget is not None and content_budget.is_exhausted()
+        if total_lines == 0 and not exhausted:
+            raise exceptions.LogFileIsEmptyError('Arquivo %s está vazio' % path)
+        # The lines of the pilot sample are drawn at random, so their positions are not known
+        analyzer.positions_known = False
+        if exhausted:
+            analyzer.add_batch(pilot)
+            required_lines = 0
+        elif total_lines > min_lines:
+            analyzer.add_batch(pilot)
+            required_lines = sampling.compute_required_lines(analyzer.get_summary(), total_lines, margin, confidence)
+        else:
+            pilot_line_numbers = []
+            required_lines = total_lines
+        passes = 0
+    else:
+        if total_lines == 0:
+            raise exceptions.LogFileIsEmptyError('Arquivo %s está vazio' % path)
+        pilot_line_numbers = []
+        required_lines = total_lines if total_lines <= min_lines else min(total_lines, pilot_lines)
+        passes = -1
+
+    # Lines of the pilot sample and of earlier passes are skipped, so that no line is counted twice
+    analyzer.pilot_line_numbers = frozenset(pilot_line_numbers)
+    analyzer.evaluated_passes = []
+
+    # The pilot sample is analyzed in full, and the budget is checked in the passes that grow it
+    analyzer.content_budget = content_budget
+
+    sample_lines = sum(analyzer.ips.values())
+    while sample_lines < required_lines and passes < sampling.ADAPTIVE_MAX_REFINEMENT_PASSES:
+        if content_budget is not None and content_budget.is_exhausted():
+            break
+
+        stride = max(1, total_lines // (required_lines - sample_lines))
+        first_line = rng.randint(1, stride)
+        analyzer.rewind(stride, first_line)
+
+        with file_utils.open_file(path) as data:
+            if content_budget is not None:
+                data = content_budget.wrap(data)
+            with closing(iter_file_line_batches(data, block_size, queue_depth)) as batches:
+                for batch in batches:
+                    if not analyzer.add_batch(batch):
+                        break
+
+        # The pass stopped before its next position, whether at the end of the file or of the budget
+        analyzer.evaluated_passes.append((stride, first_line, analyzer.next_eval_line - stride))
+
+        summary = analyzer.get_summary(total_lines)
+        sample_lines = sum(summary['ips'].values())
+        required_lines = max(required_lines, sampling.compute_required_lines(summary, total_lines, margin, confidence))
+        passes += 1
+
+    # Lines were all read by the counting pass, unless it exceeded the budget, in which case total_lines counts those read
+    summary = add_budget_report(analyzer.get_summary(total_lines), content_budget, total_lines)
+    summary['sampling'] = sampling.get_error_bounds(summary, total_lines, confidence)
+    return summary
+
+
+def analyze_log_stream(data, sample_size=0.1, min_lines=MIN_NUMBER_OF_SAMPLE_LINES, block_size=READ_BLOCK_SIZE, queue_depth=READER_QUEUE_DEPTH, content_budget=None, distinct_ips=False, user_agents=False, invalid_samples=invalid_lines.INVALID_LINE_SAMPLE_SIZE):
+    """
+    Analyzes the decompressed content of a log stream in a single pass and provides a summary of its content.
+
+    As the number of lines is not known in advance, one out of every int(1 / sample_size) lines is evaluated,
+    which are the lines validate_content evaluates in a file with many lines (see get_sample_stride).
+    The first lines are kept until the stream is known to have more than min_lines lines; if it has not,
+    every line is evaluated, as validate_content does for small files.
 
-                # Match the date pattern and extract the datetime
-                if match:
-                    content = match.groupdict()
+    Args:
+        data (file): A file object with the decompressed content (e.g., as returned by file_utils.open_stream).
+        sample_size (float, optional): The fraction of lines to sample for analysis. Defaults to 0.1.
+        min_lines (int, optional): The number of lines up to which every line is evaluated.
+        block_size (int, optional): The number of decompressed bytes read at a time.
+        queue_depth (int, optional): The number of blocks a separate reader thread may decompress ahead of the analysis.
+        content_budget (budget.ContentBudget, optional): The time and byte limits of the analysis. Defaults to None (no limit).
+        distinct_ips (bool, optional): Whether to sketch the distinct local and remote IPs of the sampled lines. Defaults to False.
+        user_agents (bool, optional): Whether to count the bot and human user agents of the sampled lines. Defaults to False.
+        invalid_samples (int, optional): The number of invalid lines of the sample kept as examples. Defaults to INVALID_LINE_SAMPLE_SIZE (0, none).
+
+    Returns:
+        dict: The summary, as described in analyze_log_content.
+
+    Raises:
+        exceptions.LogFileIsEmptyError: If the stream has no lines.
+    """
+    # Ensure that the sample size is within the valid range
+    if sample_size > 1.0 or sample_size < 0.001:
+        sample_size = 1.0
+
+    analyzer = LogContentAnalyzer(get_sample_stride(sample_size), content_budget=content_budget, distinct_ips=distinct_ips, user_agents=user_agents, invalid_samples=invalid_samples)
+    first_lines = []
 
-                    matched_datetime = content.get('date', '')
-                    try:
-                        year, month, day, hour = get_year_month_day_hour_from_date_str(matched_datetime)
+    if content_budget is not None:
+        data = content_budget.wrap(data)
 
-                        if (year, month, day, hour) not in datetimes:
-                            datetimes[(year, month, day, hour)] = 0
-                        datetimes[(year, month, day, hour)] += 1
-                        
-                    except ValueError:
-                        invalid_lines += 1
+    with closing(iter_file_line_batches(data, block_size, queue_depth)) as batches:
+        for batch in batches:
+            if first_lines is not None:
+                first_lines.extend(batch)
+                if len(first_lines) <= min_lines:
+                    continue
+                batch, first_lines = first_lines, None
+            if not analyzer.add_batch(batch):
+                break
 
-                else:
-                    invalid_lines += 1
+    # Small streams (or the first lines of a stream that exceeded its budget) are fully evaluated
+    if first_lines is not None:
+        if not first_lines and (content_budget is None or content_budget.exceeded is None):
+            raise exceptions.LogFileIsEmptyError('Stream is empty')
+        analyzer = LogContentAnalyzer(distinct_ips=distinct_ips, user_agents=user_agents, invalid_samples=invalid_samples)
+        analyzer.add_batch(first_lines)
 
-    return {
-        'ips': ips,
-        'datetimes': datetimes,
-        'invalid_lines': invalid_lines,
-        'total_lines': total_lines
-    }
+    return add_budget_report(analyzer.get_summary(), content_budget, analyzer.line_counter)
 
 
-def validate_ip_distribution(results):
+def validate_ip_distribution(results, distinct_ips=False):
     """
     Validates the distribution of remote and local IPs in the given results.
 
@@ -270,6 +793,10 @@ def validate_ip_distribution(results):
     It returns True if the percentage of remote IPs is higher than the percentage of local IPs or if
     the percentage of remote IPs exceeds a predefined minimum acceptable percentage.
 
+    With distinct_ips, and if the summary has sketches of the distinct IPs, the percentages are computed
+    over the distinct local and remote IPs instead of the lines, so that a single busy address (e.g., a local
+    health checker or an aggressive crawler) does not decide the verdict.
+
     Args:
         results (dict): A dictionary containing the results with the following structure:
             {
@@ -283,14 +810,34 @@ def validate_ip_distribution(results):
                     }
                 }
             }
+        distinct_ips (bool, optional): Whether to compare the numbers of distinct IPs instead. Defaults to False.
 
     Returns:
         bool: True if the distribution of IPs is valid, False otherwise.
     """
+    sketches = results.get('content', {}).get('summary', {}).get('distinct_ips')
+    if distinct_ips and sketches is not None:
+        counts = sketches.get_counts()
+        return validate_ip_counts(counts['remote'], counts['local'], counts['remote'] + counts['local'])
+
     remote_ips = results.get('content', {}).get('summary', {}).get('ips', {}).get('remote', 0)
     local_ips = results.get('content', {}).get('summary', {}).get('ips', {}).get('local', 0)
     total_lines = results.get('content', {}).get('summary', {}).get('total_lines', 0)
+    return validate_ip_counts(remote_ips, local_ips, total_lines)
+
+
+def validate_ip_counts(remote_ips, local_ips, total_lines):
+    """
+    Checks whether remote IPs are frequent enough compared with local IPs.
+
+    Args:
+        remote_ips (int): The number of remote IPs (or of lines with a remote IP).
+        local_ips (int): The number of local IPs (or of lines with a local IP).
+        total_lines (int): The number the percentages are computed from.
 
+    Returns:
+        bool: True if the distribution of IPs is valid, False otherwise.
+    """
     # If there are no lines with detected IPs or the validation was not executed
     if (remote_ips == 0 and local_ips == 0) or total_lines == 0:
         return False
@@ -352,12 +899,52 @@ def validate_date_consistency(results, days_delta=5):
     return True
 
 
-def validate_path_name(path):
+def validate_traffic_profile(path, results, traffic_baseline):
+    """
+    Validates the hour-of-day traffic profile of a log file against the baseline of its collection.
+
+    Files without anomalies are learned by the baseline, and the profile fingerprint of every new file
+    is recorded so that copies of it are detected later.
+
+    Args:
+        path (str): The file path to the log file.
+        results (dict): The results dictionary containing the content analysis.
+        traffic_baseline (traffic.TrafficBaseline): The per-collection baseline.
+
+    Returns:
+        dict: The traffic profile analysis (see traffic.analyze_traffic_profile).
+        dict: An error message if the content has no dates.
+    """
+    file_content_dates = results.get('content', {}).get('summary', {}).get('datetimes')
+    if not file_content_dates:
+        return {'error': 'Content has no dates'}
+
+    collection = results.get('path', {}).get('collection')
+    if not isinstance(collection, str):
+        collection = file_utils.extract_collection_from_path(path) or aggregation.UNKNOWN_COLLECTION
+
+    baseline_entry = traffic_baseline.get(collection)
+    profile = traffic.analyze_traffic_profile(file_content_dates, baseline_entry, path)
+
+    # A file validated again is neither recorded nor learned twice
+    if baseline_entry and profile['fingerprint'] in baseline_entry['fingerprints']:
+        return profile
+
+    traffic_baseline.remember(collection, profile['fingerprint'], path)
+    if not profile['anomalous']:
+        traffic_baseline.learn(collection, profile['hours'])
+
+    return profile
+
+
+def validate_path_name(path, detect_mime=True):
     """
     Validates the file path by extracting various attributes.
 
     Args:
         path (str): The file path to be validated.
+        detect_mime (bool, optional): Whether to open the file to detect its MIME type. Defaults to True.
+                                      It must be False when the path is only a name (e.g., of a stream).
 
     Returns:
         dict: A dictionary containing the extracted attributes from the file path.
@@ -372,6 +959,8 @@ def validate_path_name(path):
         (file_utils.extract_mime_from_path, 'mimetype'),
         (file_utils.extract_file_extension_from_path, 'extension'),
     ]:
+        if func_name == 'mimetype' and not detect_mime:
+            continue
         try:
             results[func_name] = func_impl(path)
         except Exception as e:
@@ -380,16 +969,112 @@ def validate_path_name(path):
     return results
 
 
-def validate_content(path, sample_size=0.1, buffer_size=2048, min_lines=MIN_NUMBER_OF_SAMPLE_LINES):
+def detect_mime_from_path(path, buffer_size=2048):
+    """
+    Detects the MIME type of a file, as validate_path_name does.
+
+    Args:
+        path (str): The file path.
+        buffer_size (int, optional): The number of bytes read for MIME type detection. Defaults to 2048.
+
+    Returns:
+        str or dict: The MIME type of the file, or a dictionary with the error if it could not be read.
+    """
+    try:
+        return file_utils.extract_mime_from_path(path, buffer_size=buffer_size)
+    except Exception as e:
+        return {'error': str(e)}
+
+
+def validate_path_names(paths, detect_mime=False, batch_size=PATH_VALIDATION_BATCH_SIZE, workers=0):
+    """
+    Validates the file paths of a large inventory (e.g., millions of archived file names) by extracting their attributes.
+
+    Each path gets the same attributes as in validate_path_name, but the file name is split once, the
+    patterns are precompiled and the collection matcher is looked up once. Paths are consumed in batches,
+    so the inventory does not need to fit in memory, and files are only opened if MIME types are requested.
+
+    Args:
+        paths (iterable): The file paths to be validated.
+        detect_mime (bool, optional): Whether to open each file to detect its MIME type. Defaults to False.
+        batch_size (int, optional): The number of paths validated at a time. Defaults to PATH_VALIDATION_BATCH_SIZE.
+        workers (int, optional): The number of threads reading the files whose MIME type is detected. Defaults to 0
+                                 (files are read by the calling thread).
+
+    Yields:
+        tuple: Each path and a dictionary containing the extracted attributes, in the order of the paths.
+    """
+    matcher = file_utils.get_default_collection_matcher()
+    date_patterns = file_utils.DATE_PATTERNS
+    paperboy_pattern = file_utils.PAPERBOY_PATTERN
+    executor = ThreadPoolExecutor(max_workers=workers) if detect_mime and workers > 0 else None
+
+    paths = iter(paths)
+    try:
+        while True:
+            batch = list(islice(paths, batch_size))
+            if not batch:
+                break
+
+            if detect_mime:
+                mimetypes = list(executor.map(detect_mime_from_path, batch)) if executor else [detect_mime_from_path(p) for p in batch]
+
+            for i, path in enumerate(batch):
+                tail = os.path.basename(path)
+
+                date = None
+                for pattern in date_patterns:
+                    match = pattern.search(tail)
+                    if match:
+                        date = date_utils.clean_date(match.group())
+                        break
+
+                identifier = matcher.match(tail)
+                extension = os.path.splitext(tail)[1]
+
+                results = {
+                    'date': date,
+                    'collection': matcher.collection_identifiers[identifier] if identifier is not None else None,
+                    'paperboy': paperboy_pattern.match(tail) is not None,
+                }
+                if detect_mime:
+                    results['mimetype'] = mimetypes[i]
+                results['extension'] = extension if extension else {'error': 'Could not extract extension from %s' % path}
+
+                yield path, results
+    finally:
+        if executor is not None:
+            executor.shutdown()
+
+
+def validate_content(path, sample_size=0.1, buffer_size=2048, min_lines=MIN_NUMBER_OF_SAMPLE_LINES, total_lines=None, block_size=READ_BLOCK_SIZE, queue_depth=READER_QUEUE_DEPTH, adaptive_sampling=False, time_budget=budget.CONTENT_TIME_BUDGET, byte_budget=budget.CONTENT_BYTE_BUDGET, distinct_ips=False, user_agents=False, invalid_samples=invalid_lines.INVALID_LINE_SAMPLE_SIZE, content_budget=None):
     """
     Validates the content of a log file by analyzing a sample of its lines.
 
     Args:
         path (str): The file path to the log file.
-        sample_size (float): The fraction of lines to sample for analysis (default is 0.1).
+        sample_size (float): The fraction of lines to sample for analysis (default is 0.1). Ignored with adaptive sampling.
+        total_lines (int, optional): The number of lines of the file, if already known. Defaults to None (lines are counted).
+        block_size (int, optional): The number of decompressed bytes read at a time in the content analysis.
+        queue_depth (int, optional): The number of blocks a reader thread may decompress ahead of the content analysis.
+        adaptive_sampling (bool, optional): Whether to size the sample for a target precision of the estimates instead
+                                            of using a fixed fraction of lines (see analyze_log_content_adaptive).
+                                            Defaults to False.
+        time_budget (float, optional): The maximum number of seconds spent in the content analysis, after which
+                                       a partial summary is returned. Defaults to CONTENT_TIME_BUDGET (0 for no limit).
+        byte_budget (int, optional): The maximum number of decompressed bytes read in the content analysis, after which
+                                     a partial summary is returned. Defaults to CONTENT_BYTE_BUDGET (0 for no limit).
+        distinct_ips (bool, optional): Whether to sketch the distinct local and remote IPs of the sampled lines
+                                       (see cardinality.DistinctIpSketches). Defaults to False.
+        user_agents (bool, optional): Whether to count the bot and human user agents of the sampled lines
+                                      (see bots.UserAgentClassifier). Defaults to False.
+        invalid_samples (int, optional): The number of invalid lines of the sample kept as examples, with their line numbers,
+                                         byte offsets and categories. Defaults to INVALID_LINE_SAMPLE_SIZE (0, none).
+        content_budget (budget.ContentBudget, optional): A budget already partly spent (e.g., by fingerprinting the file), used
+                                                         instead of time_budget and byte_budget. Defaults to None.
 
     Returns:
-        dict: A dictionary containing the summary of the content analysis.
+        dict: A dictionary containing the summary of the content analysis. A partial summary has a 'budget' key.
 
     Raises:
         exceptions.TruncatedLogFileError: If the log file is truncated.
@@ -400,21 +1085,175 @@ def validate_content(path, sample_size=0.1, buffer_size=2048, min_lines=MIN_NUMB
     if sample_size > 1.0 or sample_size < 0.001:
         sample_size = 1.0
 
+    if content_budget is None and (time_budget > 0 or byte_budget > 0):
+        content_budget = budget.ContentBudget(time_budget, byte_budget)
+
     try:
-        total_lines = get_total_lines(path=path, buffer_size=buffer_size)
+        if adaptive_sampling:
+            return {'summary': analyze_log_content_adaptive(path, total_lines=total_lines, min_lines=min_lines, buffer_size=buffer_size, block_size=block_size, queue_depth=queue_depth, content_budget=content_budget, distinct_ips=distinct_ips, user_agents=user_agents, invalid_samples=invalid_samples)}
+        if content_budget is not None and total_lines is None:
+            # Counting the lines first would already read the whole file, so the sample is drawn in a single pass, at the
+            # lines evaluated in a file with many lines, and the pass is only stopped early by the budget
+            with file_utils.open_file(path=path, buffer_size=buffer_size) as data:
+                summary = analyze_log_stream(data, sample_size=sample_size, min_lines=min_lines, block_size=block_size, queue_depth=queue_depth, content_budget=content_budget, distinct_ips=distinct_ips, user_agents=user_agents, invalid_samples=invalid_samples)
+            if 'budget' in summary or summary['total_lines'] <= min_lines or get_sample_stride(sample_size, summary['total_lines'], min_lines) == get_sample_stride(sample_size):
+                return {'summary': summary}
+            # A file with few lines is sampled at another stride, so it is sampled again now that its lines are counted
+            total_lines = summary['total_lines']
+        if total_lines is None:
+            total_lines = get_total_lines(path=path, buffer_size=buffer_size)
         if total_lines <= min_lines:
             sample_size = 1.0
         sample_lines = int(total_lines * sample_size)
-        return {'summary': analyze_log_content(path, total_lines, sample_lines)}
-    except exceptions.TruncatedLogFileError:
-        return {'summary': {'total_lines': {'error': 'File is truncated'},}}
-    except exceptions.InvalidLogFileMimeError:
-        return {'summary': {'total_lines': {'error': 'File is invalid'},}}
-    except exceptions.LogFileIsEmptyError:
-        return {'summary': {'total_lines': {'error': 'File is empty'},}}
+        return {'summary': analyze_log_content(path, total_lines, sample_lines, block_size=block_size, queue_depth=queue_depth, content_budget=content_budget, distinct_ips=distinct_ips, user_agents=user_agents, invalid_samples=invalid_samples)}
+    except tuple(CONTENT_ERRORS) as e:
+        return {'summary': {'total_lines': {'error': CONTENT_ERRORS[type(e)]},}}
+    except EOFError:
+        return {'summary': {'total_lines': {'error': CONTENT_ERRORS[exceptions.TruncatedLogFileError]},}}
+
+
+def validate_stream(fileobj, sample_size=0.1, buffer_size=2048, min_lines=MIN_NUMBER_OF_SAMPLE_LINES, block_size=READ_BLOCK_SIZE, queue_depth=READER_QUEUE_DEPTH, distinct_ips=False, user_agents=False, invalid_samples=invalid_lines.INVALID_LINE_SAMPLE_SIZE):
+    """
+    Validates the content of a log stream by analyzing a sample of its lines in a single pass.
+
+    Args:
+        fileobj (file): A readable binary file object (e.g., the standard input), compressed or not.
+        sample_size (float): The fraction of lines to sample for analysis (default is 0.1).
+        buffer_size (int, optional): The number of bytes used for MIME type detection. Defaults to 2048.
+        min_lines (int, optional): The number of lines up to which every line is evaluated.
+        block_size (int, optional): The number of decompressed bytes read at a time in the content analysis.
+        queue_depth (int, optional): The number of blocks a reader thread may decompress ahead of the content analysis.
+        distinct_ips (bool, optional): Whether to sketch the distinct local and remote IPs of the sampled lines. Defaults to False.
+        user_agents (bool, optional): Whether to count the bot and human user agents of the sampled lines. Defaults to False.
+        invalid_samples (int, optional): The number of invalid lines of the sample kept as examples. Defaults to INVALID_LINE_SAMPLE_SIZE (0, none).
+
+    Returns:
+        tuple: The MIME type of the stream (None if it could not be opened) and a dictionary containing
+               the summary of the content analysis.
+    """
+    stream_mime = None
+    try:
+        stream_mime, data = file_utils.open_stream(fileobj, buffer_size=buffer_size)
+        summary = analyze_log_stream(data, sample_size=sample_size, min_lines=min_lines, block_size=block_size, queue_depth=queue_depth, distinct_ips=distinct_ips, user_agents=user_agents, invalid_samples=invalid_samples)
+        return stream_mime, {'summary': summary}
+    except tuple(CONTENT_ERRORS) as e:
+        return stream_mime, {'summary': {'total_lines': {'error': CONTENT_ERRORS[type(e)]},}}
+    except EOFError:
+        return stream_mime, {'summary': {'total_lines': {'error': CONTENT_ERRORS[exceptions.TruncatedLogFileError]},}}
+
+
+def validate_content_with_fingerprint(path, fingerprint_index, sample_size=0.1, buffer_size=2048, block_size=READ_BLOCK_SIZE, queue_depth=READER_QUEUE_DEPTH, adaptive_sampling=False, time_budget=budget.CONTENT_TIME_BUDGET, byte_budget=budget.CONTENT_BYTE_BUDGET, distinct_ips=False, user_agents=False, invalid_samples=invalid_lines.INVALID_LINE_SAMPLE_SIZE):
+    """
+    Validates the content of a log file, reusing the content summary of an indexed duplicate when there is one.
 
+    The file fingerprint is computed in the pass that counts its lines, so fingerprinting costs no extra reading.
+    The file is then added to the index. The fingerprint pass is counted against the time and byte budgets, but may
+    only spend FINGERPRINT_BUDGET_SHARE of them. If it exceeds its share, the index is neither searched nor updated
+    and the rest of the budget is left to the analysis, which returns a partial summary of the lines it parsed.
 
-def pipeline_validate(path, sample_size=0.1, buffer_size=2048, days_delta=5, apply_path_validation=True, apply_content_validation=True):
+    Args:
+        path (str): The file path to the log file.
+        fingerprint_index (fingerprint.FingerprintIndex): The index of the fingerprints of validated files.
+        sample_size (float): The fraction of lines to sample for analysis (default is 0.1).
+        buffer_size (int, optional): The buffer size for file type checking. Defaults to 2048.
+        block_size (int, optional): The number of decompressed bytes read at a time in the content analysis.
+        queue_depth (int, optional): The number of blocks a reader thread may decompress ahead of the content analysis.
+        adaptive_sampling (bool, optional): Whether to use adaptive sampling. Defaults to False.
+        time_budget (float, optional): The maximum number of seconds spent in the content analysis. Defaults to CONTENT_TIME_BUDGET.
+        byte_budget (int, optional): The maximum number of decompressed bytes read in the content analysis. Defaults to CONTENT_BYTE_BUDGET.
+        distinct_ips (bool, optional): Whether to sketch the distinct IPs of the sampled lines. Defaults to False.
+        user_agents (bool, optional): Whether to count the bot and human user agents of the sampled lines. Defaults to False.
+        invalid_samples (int, optional): The number of invalid lines of the sample kept as examples. Defaults to INVALID_LINE_SAMPLE_SIZE (0, none).
+
+    Returns:
+        tuple: The content validation results (as returned by validate_content) and a dictionary describing
+               the duplicates of the file, with the keys 'exact' (bool) and 'of' (list), or None if there are none.
+    """
+    content_budget = budget.ContentBudget(time_budget, byte_budget) if time_budget > 0 or byte_budget > 0 else None
+    fingerprint_budget = content_budget.get_share(fingerprint.FINGERPRINT_BUDGET_SHARE) if content_budget is not None else None
+
+    try:
+        file_fingerprint = fingerprint.compute_fingerprint(path, buffer_size=buffer_size, content_budget=fingerprint_budget)
+    except tuple(CONTENT_ERRORS) as e:
+        return {'summary': {'total_lines': {'error': CONTENT_ERRORS[type(e)]},}}, None
+
+    # A fingerprint of part of the file would match other files, so the index is left aside
+    if fingerprint_budget is not None and fingerprint_budget.is_exhausted():
+        content = validate_content(
+            path=path,
+            sample_size=sample_size,
+            buffer_size=buffer_size,
+            block_size=block_size,
+            queue_depth=queue_depth,
+            adaptive_sampling=adaptive_sampling,
+            distinct_ips=distinct_ips,
+            user_agents=user_agents,
+            invalid_samples=invalid_samples,
+            content_budget=content_budget)
+        return content, None
+
+    # Summaries of adaptive sampling are reusable whatever the sample size
+    cache_key = 'adaptive' if adaptive_sampling else sample_size
+
+    original_path = fingerprint_index.find_exact(file_fingerprint, cache_key)
+    cached_summary = fingerprint_index.entries[original_path]['summary'] if original_path is not None else None
+
+    # Summaries without the optional entries requested are not reused
+    requested = [key for key, value in (('distinct_ips', distinct_ips), ('user_agents', user_agents), ('invalid_details', invalid_samples)) if value]
+    if cached_summary is not None and all(key in cached_summary for key in requested):
+        content = {'summary': fingerprint.deserialize_summary(cached_summary)}
+    else:
+        content = validate_content(
+            path=path,
+            sample_size=sample_size,
+            buffer_size=buffer_size,
+            total_lines=file_fingerprint['total_lines'],
+            block_size=block_size,
+            queue_depth=queue_depth,
+            adaptive_sampling=adaptive_sampling,
+            distinct_ips=distinct_ips,
+            user_agents=user_agents,
+            invalid_samples=invalid_samples,
+            content_budget=content_budget)
+
+    summary = content['summary']
+    hours = traffic.get_hour_histogram(summary.get('datetimes', {}))
+
+    if original_path is not None and original_path != path:
+        duplicate = {'exact': True, 'of': [original_path]}
+    else:
+        near_paths = fingerprint_index.find_near(path, file_fingerprint, hours)
+        duplicate = {'exact': False, 'of': near_paths} if near_paths else None
+
+    # Partial summaries are not reused, as a duplicate may be analyzed in full with a larger budget
+    entry = dict(file_fingerprint, hours=hours, sample_size=cache_key)
+    if isinstance(summary.get('total_lines'), int) and 'budget' not in summary:
+        entry['summary'] = fingerprint.serialize_summary(summary)
+    fingerprint_index.add(path, entry)
+
+    return content, duplicate
+
+
+def compute_verdicts(results, days_delta=5, distinct_ip_rule=False):
+    """
+    Adds the verdicts of the IP distribution and date consistency validations to the results of a content validation.
+
+    Args:
+        results (dict): The results dictionary, with the keys 'content' and, optionally, 'path'.
+        days_delta (int, optional): The number of days to determine the threshold for significant date difference. Defaults to 5.
+        distinct_ip_rule (bool, optional): Whether the IP distribution is validated from the distinct IPs. Defaults to False.
+
+    Returns:
+        dict: The same results dictionary, with the keys 'is_valid' and 'probably_date'.
+    """
+    results['is_valid'] = {'ips': validate_ip_distribution(results, distinct_ips=distinct_ip_rule)}
+    results['probably_date'] = get_probably_date(results)
+    results['is_valid'].update({'dates': validate_date_consistency(results, days_delta=days_delta)})
+    results['is_valid'].update({'all': results['is_valid']['ips'] and results['is_valid']['dates']})
+    return results
+
+
+def pipeline_validate(path, sample_size=0.1, buffer_size=2048, days_delta=5, apply_path_validation=True, apply_content_validation=True, traffic_baseline=None, fingerprint_index=None, block_size=READ_BLOCK_SIZE, queue_depth=READER_QUEUE_DEPTH, adaptive_sampling=False, detect_mime=True, time_budget=budget.CONTENT_TIME_BUDGET, byte_budget=budget.CONTENT_BYTE_BUDGET, distinct_ips=False, distinct_ip_rule=False, user_agents=False, invalid_samples=invalid_lines.INVALID_LINE_SAMPLE_SIZE, profiler=None):
     """
     Validates a log file by applying various validation checks.
     
@@ -425,6 +1264,30 @@ def pipeline_validate(path, sample_size=0.1, buffer_size=2048, days_delta=5, app
         days_delta (int, optional): The number of days to determine the threshold for significant date difference. Defaults to 5.
         apply_path_validation (bool, optional): Whether to apply path validation. Defaults to True.
         apply_content_validation (bool, optional): Whether to apply content validation. Defaults to True.
+        traffic_baseline (traffic.TrafficBaseline, optional): The per-collection hour-of-day baseline used to analyze
+                                                              the traffic profile. Defaults to None (no analysis).
+        fingerprint_index (fingerprint.FingerprintIndex, optional): The index used to detect duplicated files and reuse
+                                                                    their content summaries. Defaults to None (no detection).
+        block_size (int, optional): The number of decompressed bytes read at a time in the content analysis. Defaults to 1 MB.
+        queue_depth (int, optional): The number of blocks a reader thread may decompress ahead of the content analysis.
+                                     Defaults to 0 (no reader thread).
+        adaptive_sampling (bool, optional): Whether to size the content sample for a target precision of the estimates
+                                            instead of using sample_size. Defaults to False.
+        detect_mime (bool, optional): Whether the path validation detects the MIME type of the file. Defaults to True.
+        time_budget (float, optional): The maximum number of seconds spent in the content analysis, after which the verdicts
+                                       are computed from a partial summary. Defaults to CONTENT_TIME_BUDGET (0 for no limit).
+        byte_budget (int, optional): The maximum number of decompressed bytes read in the content analysis, after which the verdicts
+                                     are computed from a partial summary. Defaults to CONTENT_BYTE_BUDGET (0 for no limit).
+        distinct_ips (bool, optional): Whether to add HyperLogLog sketches of the distinct local and remote IPs, overall and
+                                       per hour, to the content summary. Defaults to False.
+        distinct_ip_rule (bool, optional): Whether the IP distribution is validated from the distinct IPs instead of the lines
+                                           (implies distinct_ips). Defaults to False.
+        user_agents (bool, optional): Whether to add the number of lines with bot, human and empty user agents to the
+                                      content summary. Defaults to False.
+        invalid_samples (int, optional): The number of invalid lines kept as examples in the content summary, which then also
+                                         counts the invalid lines by category. Defaults to INVALID_LINE_SAMPLE_SIZE (0, none).
+        profiler (profiling.FileProfiler, optional): The profiler the validation runs under, which writes the profile of
+                                                     the file if it is slow. Defaults to None (no profiling).
     
     Returns:
         dict: A dictionary containing the results of the validation checks. The keys include:
@@ -435,63 +1298,164 @@ def pipeline_validate(path, sample_size=0.1, buffer_size=2048, days_delta=5, app
                 - 'dates': The result of the date consistency validation.
                 - 'all': A boolean indicating if both IP and date validations passed.
             - 'probably_date': The probable date extracted from the log file.
+            - 'traffic': The traffic profile analysis (if a baseline is given).
+            - 'duplicate': The indexed files with the same content (if an index is given and there are any).
     """
+    if profiler is not None:
+        kwargs = {argument: value for argument, value in locals().items() if argument != 'profiler'}
+        return profiler.profile(path, pipeline_validate, **kwargs)
+
     results = {'mode': {'path_validation': apply_path_validation, 'content_validation': apply_content_validation}}
 
     if apply_path_validation:
-        results['path'] = validate_path_name(path)
+        results['path'] = validate_path_name(path, detect_mime=detect_mime)
     
     if apply_content_validation:
-        results['content'] = validate_content(path=path, sample_size=sample_size, buffer_size=buffer_size)
-        results['is_valid'] = {'ips': validate_ip_distribution(results)}
-        results['probably_date'] = get_probably_date(results)
-        results['is_valid'].update({'dates': validate_date_consistency(results, days_delta=days_delta)})
-        results['is_valid'].update({'all': results['is_valid']['ips'] and results['is_valid']['dates']})
+        if fingerprint_index is not None:
+            results['content'], duplicate = validate_content_with_fingerprint(
+                path,
+                fingerprint_index,
+                sample_size=sample_size,
+                buffer_size=buffer_size,
+                block_size=block_size,
+                queue_depth=queue_depth,
+                adaptive_sampling=adaptive_sampling,
+                time_budget=time_budget,
+                byte_budget=byte_budget,
+                distinct_ips=distinct_ips or distinct_ip_rule,
+                user_agents=user_agents,
+                invalid_samples=invalid_samples)
+            if duplicate is not None:
+                results['duplicate'] = duplicate
+        else:
+            results['content'] = validate_content(path=path, sample_size=sample_size, buffer_size=buffer_size, block_size=block_size, queue_depth=queue_depth, adaptive_sampling=adaptive_sampling, time_budget=time_budget, byte_budget=byte_budget, distinct_ips=distinct_ips or distinct_ip_rule, user_agents=user_agents, invalid_samples=invalid_samples)
+        compute_verdicts(results, days_delta=days_delta, distinct_ip_rule=distinct_ip_rule)
+
+        if traffic_baseline is not None:
+            results['traffic'] = validate_traffic_profile(path, results, traffic_baseline)
+
+    return results
+
+
+def pipeline_validate_stream(fileobj, name=None, sample_size=0.1, buffer_size=2048, days_delta=5, apply_path_validation=True, apply_content_validation=True, block_size=READ_BLOCK_SIZE, queue_depth=READER_QUEUE_DEPTH, distinct_ips=False, distinct_ip_rule=False, user_agents=False, invalid_samples=invalid_lines.INVALID_LINE_SAMPLE_SIZE, profiler=None):
+    """
+    Validates a log read from a stream (e.g., the standard input) in a single pass, without storing it in a file.
+
+    Args:
+        fileobj (file): A readable binary file object, compressed or not.
+        name (str, optional): The original file name of the log, used for path validation. Defaults to None (no path validation).
+        sample_size (float, optional): The percentage of the log to sample for content validation. Defaults to 0.1.
+        buffer_size (int, optional): The number of bytes used for MIME type detection. Defaults to 2048.
+        days_delta (int, optional): The number of days to determine the threshold for significant date difference. Defaults to 5.
+        apply_path_validation (bool, optional): Whether to apply path validation (requires a name). Defaults to True.
+        apply_content_validation (bool, optional): Whether to apply content validation. Defaults to True.
+        block_size (int, optional): The number of decompressed bytes read at a time in the content analysis. Defaults to 1 MB.
+        queue_depth (int, optional): The number of blocks a reader thread may decompress ahead of the content analysis.
+                                     Defaults to 0 (no reader thread).
+        distinct_ips (bool, optional): Whether to sketch the distinct IPs (see pipeline_validate). Defaults to False.
+        distinct_ip_rule (bool, optional): Whether the IP distribution is validated from the distinct IPs. Defaults to False.
+        user_agents (bool, optional): Whether to count the bot and human user agents (see pipeline_validate). Defaults to False.
+        invalid_samples (int, optional): The number of invalid lines kept as examples (see pipeline_validate). Defaults to 0.
+        profiler (profiling.FileProfiler, optional): The profiler the validation runs under (see pipeline_validate). Defaults to None.
+
+    Returns:
+        dict: A dictionary containing the results of the validation checks, as described in pipeline_validate.
+              The MIME type in the path validation results is the one detected from the stream.
+    """
+    if profiler is not None:
+        kwargs = {argument: value for argument, value in locals().items() if argument != 'profiler'}
+        return profiler.profile(name or '', pipeline_validate_stream, **kwargs)
+
+    apply_path_validation = apply_path_validation and name is not None
+    results = {'mode': {'path_validation': apply_path_validation, 'content_validation': apply_content_validation}}
+
+    if apply_path_validation:
+        results['path'] = validate_path_name(name, detect_mime=False)
+
+    if apply_content_validation:
+        stream_mime, results['content'] = validate_stream(
+            fileobj,
+            sample_size=sample_size,
+            buffer_size=buffer_size,
+            block_size=block_size,
+            queue_depth=queue_depth,
+            distinct_ips=distinct_ips or distinct_ip_rule,
+            user_agents=user_agents,
+            invalid_samples=invalid_samples)
+        if apply_path_validation and stream_mime is not None:
+            results['path']['mimetype'] = stream_mime
+        compute_verdicts(results, days_delta=days_delta, distinct_ip_rule=distinct_ip_rule)
 
     return results
 
 
+def pipeline_validate_paths(paths, apply_path_validation=True, detect_mime=False, batch_size=PATH_VALIDATION_BATCH_SIZE, workers=0):
+    """
+    Validates many file paths without reading their content, e.g., the file names of an archive inventory.
+
+    Args:
+        paths (iterable): The file paths to be validated.
+        apply_path_validation (bool, optional): Whether to apply path validation. Defaults to True.
+        detect_mime (bool, optional): Whether to open each file to detect its MIME type. Defaults to False.
+        batch_size (int, optional): The number of paths validated at a time. Defaults to PATH_VALIDATION_BATCH_SIZE.
+        workers (int, optional): The number of threads reading the files whose MIME type is detected. Defaults to 0.
+
+    Yields:
+        tuple: Each path and its results, as returned by pipeline_validate without content validation.
+    """
+    mode = {'path_validation': apply_path_validation, 'content_validation': False}
+
+    if not apply_path_validation:
+        for path in paths:
+            yield path, {'mode': dict(mode)}
+        return
+
+    for path, path_results in validate_path_names(paths, detect_mime=detect_mime, batch_size=batch_size, workers=workers):
+        results = {'mode': dict(mode), 'path': path_results}
+        yield path, results
+
+
+def iter_directory_files(path):
+    """
+    Iterates over the paths of all files in a directory and its subdirectories.
+
+    Args:
+        path (str): The directory path, or the URL of a remote directory (e.g., s3://bucket/prefix/).
+
+    Yields:
+        str: The file paths.
+    """
+    if storage.is_remote_path(path):
+        yield from storage.list_remote(path)
+        return
+
+    for root, _, files in os.walk(path):
+        for file in files:
+            yield os.path.join(root, file)
+
+
+def iter_inventory_paths(path):
+    """
+    Iterates over the file paths listed in an inventory file, one per line.
+
+    Args:
+        path (str): The inventory file path, or '-' to read the list from the standard input.
+
+    Yields:
+        str: The file paths, without surrounding whitespace. Blank lines are skipped.
+    """
+    fin = sys.stdin if path == '-' else open(path)
+    try:
+        for line in fin:
+            line = line.strip()
+            if line:
+                yield line
+    finally:
+        if fin is not sys.stdin:
+            fin.close()
+
+
 def main():
-    parser = ArgumentParser()
-
-    parser.add_argument('-p', '--path', help='File or directory to be checked', required=True)
-    parser.add_argument('-s', '--sample_size', help='Sample size to be checked (must be between 0 and 1)', default=0.1, type=float)
-    parser.add_argument('-b', '--buffer_size', help='Buffer size for file type checking', default=2048, type=int)
-    parser.add_argument('-d', '--days_delta', help='Number of days to determine the threshold for significant date difference', default=5, type=int)
-    parser.add_argument('--no_path_validation', help='Deactivate path validation', action='store_false', dest='apply_path_validation', default=True)
-    parser.add_argument('--no_content_validation', help='Deactivate content validation', action='store_false', dest='apply_content_validation', default=True)
-
-    params = parser.parse_args()
-
-    # Determine the execution mode based on the provided path
-    execution_mode = get_execution_mode(params.path)
-
-    print(COMMAND_LINE_SCRIPT_MESSAGE)
-    from pprint import pprint
-
-    if execution_mode == 'validate-file':
-        # Validate a single file
-        results = pipeline_validate(
-            path=params.path, 
-            sample_size=params.sample_size,
-            buffer_size=params.buffer_size,
-            days_delta=params.days_delta,
-            apply_path_validation=params.apply_path_validation,
-            apply_content_validation=params.apply_content_validation)
-        print(params.path)
-        pprint(results)
-
-    elif execution_mode == 'validate-directory':
-        # Validate all files in a directory
-        for root, _, files in os.walk(params.path):
-            for file in files:
-                file_path = os.path.join(root, file)
-                results = pipeline_validate(
-                    path=file_path, 
-                    sample_size=params.sample_size,
-                    buffer_size=params.buffer_size,
-                    days_delta=params.days_delta,
-                    apply_path_validation=params.apply_path_validation,
-                    apply_content_validation=params.apply_content_validation)
-                print(file_path)
-                pprint(results)
+    # The command line is implemented by the cli module, which imports this one
+    from scielo_log_validator import cli
+    cli.main()
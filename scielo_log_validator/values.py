@@ -61,3 +61,16 @@ PATTERN_NCSA_EXTENDED_LOG_FORMAT_DOMAIN = (
 PATTERN_NCSA_EXTENDED_LOG_FORMAT_DOMAIN_WITH_IP_LIST = (
     r'(?P<domain>.*?)\s' + PATTERN_COMMON_LOG_FORMAT_WITH_IP_LIST + r'\s+"(?P<referrer>.*?)"\s+"(?P<user_agent>.*?)"'
 )
+
+# Case-insensitive patterns of the user agents of crawlers, monitors and HTTP libraries (e.g., as listed by COUNTER and Matomo).
+# Only tokens that browsers and apps do not use are listed (e.g., not 'index', 'monitor' or 'fetch', nor search engine names,
+# which also name their browsers and apps), so that a human user agent is never counted as a bot
+BOT_USER_AGENT_SIGNATURES = [
+    r'bot\b', r'bot[/_;-]', r'crawl', r'spider', r'slurp', r'scrapy', r'feedfetcher', r'archiver',
+    r'facebookexternalhit', r'ia_archiver', r'heritrix', r'nutch', r'httrack', r'wget', r'curl/',
+    r'python-requests', r'python-urllib', r'aiohttp', r'httpx', r'go-http-client', r'java/', r'okhttp',
+    r'apache-httpclient', r'libwww-perl', r'lwp::', r'node-fetch', r'axios/', r'guzzlehttp', r'^ruby$',
+    r'headlesschrome', r'phantomjs', r'lighthouse', r'pingdom', r'uptimerobot', r'nagios', r'zabbix',
+    r'check_http', r'ahrefs', r'semrush', r'bytespider', r'petalbot', r'qwantify', r'dataprovider',
+    r'mediapartners', r'feedburner',
+]
@@ -0,0 +1,425 @@
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+import ctypes
+import ctypes.util
+import os
+import select
+import signal
+import struct
+import time
+
+from scielo_log_validator import bots, cidr, file_utils
+
+
+# Number of seconds a file must stay unchanged after it is written before it is validated
+WATCH_DEBOUNCE_SECONDS = float(os.environ.get('WATCH_DEBOUNCE_SECONDS', '5'))
+
+# Number of seconds between two scans of the watched directories when inotify is not available
+WATCH_POLL_INTERVAL = float(os.environ.get('WATCH_POLL_INTERVAL', '10'))
+
+# Suffixes of the temporary files written by upload tools, which are renamed when the upload is complete
+WATCH_IGNORED_SUFFIXES = ('.tmp', '.part', '.partial', '.filepart', '.crdownload')
+
+# Events of inotify(7)
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_ISDIR = 0x40000000
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+
+INOTIFY_MASK = IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE
+
+INOTIFY_EVENT = struct.Struct('iIII')
+
+
+def is_ignored(path):
+    """
+    Checks whether a file is a temporary file of an upload in progress (e.g., a hidden rsync file).
+
+    Args:
+        path (str): The file path.
+
+    Returns:
+        bool: True if the file must not be validated, False otherwise.
+    """
+    name = os.path.basename(path)
+    return name.startswith('.') or name.endswith(WATCH_IGNORED_SUFFIXES)
+
+
+def load_libc():
+    """
+    Loads the C library, if it provides inotify.
+
+    Returns:
+        ctypes.CDLL: The C library, or None if inotify is not available (e.g., not on Linux).
+    """
+    name = ctypes.util.find_library('c')
+    if name is None:
+        return None
+    try:
+        libc = ctypes.CDLL(name, use_errno=True)
+        libc.inotify_init1
+        libc.inotify_add_watch
+    except (OSError, AttributeError):
+        return None
+    return libc
+
+
+class InotifyWatcher:
+    """
+    Reports the files written or moved into directories (and their subdirectories) through inotify.
+
+    Args:
+        paths (list): The directories to be watched.
+        libc (ctypes.CDLL, optional): The C library. Defaults to the one returned by load_libc.
+
+    Raises:
+        OSError: If inotify is not available or a directory cannot be watched.
+    """
+
+    def __init__(self, paths, libc=None):
+        self.libc = libc or load_libc()
+        if self.libc is None:
+            raise OSError('inotify is not available')
+
+        self.fd = self.libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), 'inotify_init1 failed')
+
+        self.directories = {}
+        self._pending = []
+        for path in paths:
+            self._add_tree(path, report_files=False)
+
+    def _add_tree(self, path, report_files=True):
+        for root, _, files in os.walk(path):
+            wd = self.libc.inotify_add_watch(self.fd, os.fsencode(root), INOTIFY_MASK)
+            if wd < 0:
+                raise OSError(ctypes.get_errno(), 'inotify_add_watch failed for %s' % root)
+            self.directories[wd] = root
+
+            # Files written into a new directory before it was watched
+            if report_files:
+                self._pending.extend(os.path.join(root, f) for f in files)
+
+    def poll(self, timeout):
+        """
+        Waits for files to be written.
+
+        Args:
+            timeout (float): The maximum number of seconds to wait.
+
+        Returns:
+            list: The paths of the files closed after writing or moved into the directories.
+        """
+        paths, self._pending = self._pending, []
+        if paths:
+            timeout = 0
+
+        readable, _, _ = select.select([self.fd], [], [], timeout)
+        if not readable:
+            return paths
+
+        try:
+            data = os.read(self.fd, 64 * 1024)
+        except BlockingIOError:
+            return paths
+
+        offset = 0
+        while offset < len(data):
+            wd, mask, _, length = INOTIFY_EVENT.unpack_from(data, offset)
+            name = data[offset + INOTIFY_EVENT.size:offset + INOTIFY_EVENT.size + length].rstrip(b'\0')
+            offset += INOTIFY_EVENT.size + length
+
+            directory = self.directories.get(wd)
+            if directory is None or not name:
+                continue
+            path = os.path.join(directory, os.fsdecode(name))
+
+            if mask & IN_ISDIR:
+                if mask & (IN_CREATE | IN_MOVED_TO):
+                    self._add_tree(path)
+            elif mask & (IN_CLOSE_WRITE | IN_MOVED_TO):
+                paths.append(path)
+
+        paths.extend(self._pending)
+        self._pending = []
+        return paths
+
+    def close(self):
+        if self.fd >= 0:
+            os.close(self.fd)
+            self.fd = -1
+
+
+class PollingWatcher:
+    """
+    Reports the files created or changed in directories (and their subdirectories) by scanning them periodically.
+
+    Files already present when the watcher is created are not reported unless they change.
+
+    Args:
+        paths (list): The directories to be watched.
+        interval (float, optional): The number of seconds between two scans. Defaults to WATCH_POLL_INTERVAL.
+    """
+
+    def __init__(self, paths, interval=WATCH_POLL_INTERVAL):
+        self.paths = list(paths)
+        self.interval = interval
+        self.states = self._scan()
+        self._next_scan = time.monotonic() + interval
+
+    def _scan(self):
+        states = {}
+        for path in self.paths:
+            for root, _, files in os.walk(path):
+                for file in files:
+                    file_path = os.path.join(root, file)
+                    try:
+                        stat = os.stat(file_path)
+                    except FileNotFoundError:
+                        continue
+                    states[file_path] = (stat.st_size, stat.st_mtime_ns)
+        return states
+
+    def poll(self, timeout):
+        """
+        Waits for the next scan, if it is due within the timeout, and reports the files created or changed.
+
+        Args:
+            timeout (float): The maximum number of seconds to wait.
+
+        Returns:
+            list: The paths of the files created or changed since the previous scan.
+        """
+        delay = self._next_scan - time.monotonic()
+        if delay > timeout:
+            time.sleep(max(0, timeout))
+            return []
+        time.sleep(max(0, delay))
+
+        states = self._scan()
+        paths = [p for p, state in states.items() if self.states.get(p) != state]
+        self.states = states
+        self._next_scan = time.monotonic() + self.interval
+        return paths
+
+    def close(self):
+        pass
+
+
+def open_watcher(paths, use_inotify=True, poll_interval=WATCH_POLL_INTERVAL):
+    """
+    Opens a watcher of directories, using inotify when it is available and polling otherwise.
+
+    Args:
+        paths (list): The directories to be watched.
+        use_inotify (bool, optional): Whether to try inotify. Defaults to True.
+        poll_interval (float, optional): The number of seconds between two scans when polling. Defaults to WATCH_POLL_INTERVAL.
+
+    Returns:
+        InotifyWatcher or PollingWatcher: The watcher.
+    """
+    if use_inotify:
+        try:
+            return InotifyWatcher(paths)
+        except OSError:
+            pass
+    return PollingWatcher(paths, poll_interval)
+
+
+class Debouncer:
+    """
+    Holds the files reported by a watcher until they stay unchanged for a while, so that files still being
+    uploaded (or written again right after being closed) are not validated too early.
+
+    Args:
+        delay (float, optional): The number of seconds a file must stay unchanged. Defaults to WATCH_DEBOUNCE_SECONDS.
+    """
+
+    def __init__(self, delay=WATCH_DEBOUNCE_SECONDS):
+        self.delay = delay
+        self.pending = {}
+
+    @staticmethod
+    def _stat(path):
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            return None
+        return stat.st_size, stat.st_mtime_ns
+
+    def add(self, path, now=None):
+        """
+        Adds or refreshes a file reported by a watcher.
+
+        Args:
+            path (str): The file path.
+            now (float, optional): The current time.monotonic() value.
+        """
+        if is_ignored(path):
+            return
+        self.pending[path] = (self._stat(path), time.monotonic() if now is None else now)
+
+    def pop_ready(self, now=None):
+        """
+        Removes and returns the files that did not change during the delay.
+
+        Args:
+            now (float, optional): The current time.monotonic() value.
+
+        Returns:
+            list: The paths of the files ready to be validated, in the order they were reported.
+        """
+        now = time.monotonic() if now is None else now
+        ready = []
+        for path, (state, since) in list(self.pending.items()):
+            if now - since < self.delay:
+                continue
+
+            current = self._stat(path)
+            if current is None:
+                # The file was removed or renamed, in which case its new name is reported
+                del self.pending[path]
+            elif current != state:
+                self.pending[path] = (current, now)
+            else:
+                del self.pending[path]
+                ready.append(path)
+        return ready
+
+    def get_timeout(self, now=None):
+        """
+        Gets the number of seconds until the next pending file may be ready.
+
+        Returns:
+            float: The number of seconds, or None if there are no pending files.
+        """
+        if not self.pending:
+            return None
+        now = time.monotonic() if now is None else now
+        return max(0.0, min(since for _, since in self.pending.values()) + self.delay - now)
+
+
+def init_worker(collection_identifiers, cidr_blocks, use_external_decompressor, bot_signatures=None):
+    """
+    Initializes a worker process with the configuration of the main process.
+
+    Args:
+        collection_identifiers (dict): The default collection identifiers table.
+        cidr_blocks (dict): The blocks of the default CIDR table, or None if there is none.
+        use_external_decompressor (bool): Whether external decompressors are used.
+        bot_signatures (list, optional): The signatures of the default user agent classifier. Defaults to the built-in ones.
+    """
+    # The main process handles interruptions, waiting for the validations running in the workers
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+    file_utils.set_default_collection_identifiers(collection_identifiers)
+    cidr.set_default_cidr_table(cidr.CidrTable(cidr_blocks) if cidr_blocks is not None else None)
+    file_utils.USE_EXTERNAL_DECOMPRESSOR = use_external_decompressor
+    if bot_signatures is not None:
+        bots.set_default_classifier(bots.UserAgentClassifier(bot_signatures))
+
+
+def get_worker_initargs():
+    """
+    Gets the configuration of the main process that init_worker applies to a worker process.
+
+    Returns:
+        tuple: The arguments of init_worker.
+    """
+    cidr_table = cidr.get_default_cidr_table()
+    return (
+        file_utils.get_default_collection_matcher().collection_identifiers,
+        cidr_table.blocks if cidr_table is not None else None,
+        file_utils.USE_EXTERNAL_DECOMPRESSOR,
+        bots.get_default_classifier().signatures,
+    )
+
+
+def create_worker_pool(workers):
+    """
+    Creates a pool of processes configured like the main process.
+
+    Args:
+        workers (int): The number of processes.
+
+    Returns:
+        concurrent.futures.ProcessPoolExecutor: The pool.
+    """
+    return ProcessPoolExecutor(max_workers=max(1, workers), initializer=init_worker, initargs=get_worker_initargs())
+
+
+def watch(paths, validate, on_result, executor, watcher=None, debounce=WATCH_DEBOUNCE_SECONDS, should_stop=None, poll_timeout=1.0):
+    """
+    Validates the files written into directories as they land, until should_stop returns True or it is interrupted.
+
+    Files are validated by a pool of warm workers as soon as they stay unchanged for the debounce delay,
+    and each result is reported as soon as it is ready, in completion order. When watching stops, including
+    on KeyboardInterrupt, the validations already running are waited for and reported before returning.
+
+    Args:
+        paths (list): The directories to be watched.
+        validate (callable): A picklable function that receives a file path and returns its results
+                             (e.g., a functools.partial of validator.pipeline_validate).
+        on_result (callable): A function called in this process with each file path and its results.
+        executor (concurrent.futures.Executor): The pool the validations are submitted to.
+        watcher (optional): The watcher of the directories. Defaults to the one returned by open_watcher.
+        debounce (float, optional): The number of seconds a file must stay unchanged. Defaults to WATCH_DEBOUNCE_SECONDS.
+        should_stop (callable, optional): A function returning True when watching must stop. Defaults to never.
+        poll_timeout (float, optional): The maximum number of seconds between two checks of should_stop.
+
+    Returns:
+        int: The number of validated files.
+    """
+    watcher = watcher or open_watcher(paths)
+    debouncer = Debouncer(debounce)
+    running = {}
+    validated = 0
+
+    try:
+        while should_stop is None or not should_stop():
+            timeout = debouncer.get_timeout()
+            timeout = poll_timeout if timeout is None else min(timeout, poll_timeout)
+            if running:
+                timeout = min(timeout, 0.1)
+
+            for path in watcher.poll(timeout):
+                debouncer.add(path)
+
+            for path in debouncer.pop_ready():
+                running[executor.submit(validate, path)] = path
+
+            if running:
+                done, _ = wait(list(running), timeout=0, return_when=FIRST_COMPLETED)
+                for future in done:
+                    on_result(running.pop(future), get_future_results(future))
+                    validated += 1
+    except KeyboardInterrupt:
+        pass
+    finally:
+        watcher.close()
+
+    # Report the validations that were already running
+    for future, path in running.items():
+        on_result(path, get_future_results(future))
+        validated += 1
+
+    return validated
+
+
+def get_future_results(future):
+    """
+    Gets the results of a validation run by a worker, so that a file that cannot be validated does not stop the watch.
+
+    Args:
+        future (concurrent.futures.Future): The future of the validation.
+
+    Returns:
+        dict: The results, or a dictionary with the error raised by the validation.
+    """
+    try:
+        return future.result()
+    except Exception as e:
+        return {'error': str(e)}
@@ -0,0 +1,399 @@
+from datetime import datetime
+
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+
+from scielo_log_validator import fingerprint
+
+
+# Number of seconds a worker holds a job before it may be leased by another worker, unless the lease is renewed
+QUEUE_LEASE_SECONDS = float(os.environ.get('QUEUE_LEASE_SECONDS', '300'))
+
+# Number of seconds between two renewals of the lease of the job being validated
+QUEUE_HEARTBEAT_SECONDS = float(os.environ.get('QUEUE_HEARTBEAT_SECONDS', '60'))
+
+# Number of times a job is leased before it is marked as failed
+QUEUE_MAX_ATTEMPTS = int(os.environ.get('QUEUE_MAX_ATTEMPTS', '3'))
+
+# Number of seconds an idle worker waits before checking again for jobs whose lease expired
+QUEUE_POLL_SECONDS = float(os.environ.get('QUEUE_POLL_SECONDS', '5'))
+
+# States of a job
+JOB_PENDING = 'pending'
+JOB_LEASED = 'leased'
+JOB_DONE = 'done'
+JOB_FAILED = 'failed'
+
+JOB_STATES = (JOB_PENDING, JOB_LEASED, JOB_DONE, JOB_FAILED)
+
+
+def serialize_results(results):
+    """
+    Converts the results of pipeline_validate into JSON.
+
+    Args:
+        results (dict): The validation results.
+
+    Returns:
+        str: The JSON document.
+    """
+    serialized = dict(results)
+    summary = results.get('content', {}).get('summary', {})
+    if 'datetimes' in summary:
+        serialized['content'] = dict(results['content'], summary=fingerprint.serialize_summary(summary))
+    if isinstance(results.get('probably_date'), datetime):
+        serialized['probably_date'] = results['probably_date'].isoformat()
+    return json.dumps(serialized)
+
+
+def deserialize_results(document):
+    """
+    Converts a JSON document created by serialize_results back into validation results.
+
+    Args:
+        document (str): The JSON document.
+
+    Returns:
+        dict: The validation results.
+    """
+    results = json.loads(document)
+    summary = results.get('content', {}).get('summary', {})
+    if 'datetimes' in summary:
+        results['content'] = dict(results['content'], summary=fingerprint.deserialize_summary(summary))
+    if isinstance(results.get('probably_date'), str):
+        results['probably_date'] = datetime.fromisoformat(results['probably_date'])
+    return results
+
+
+def get_worker_id():
+    """
+    Gets an identifier of the current process that is unique across the nodes sharing a queue.
+
+    Returns:
+        str: The host name and the process ID.
+    """
+    return '%s:%d' % (socket.gethostname(), os.getpid())
+
+
+class SqliteWorkQueue:
+    """
+    Queue of validation jobs stored in a SQLite file, which may be on storage shared by several nodes.
+
+    Each job is a file path. Workers lease jobs for a limited time and renew their leases with heartbeats
+    while validating; a job whose lease expires (e.g., its worker died) is leased again, up to max_attempts
+    times. Results are written back idempotently: the first result of a job is kept, so a job validated twice
+    after a lease expired is counted once.
+
+    Other queue backends may be used by the workers as long as they provide the methods enqueue, lease,
+    heartbeat, complete, fail and release.
+
+    Args:
+        path (str): The path to the SQLite file, created if it does not exist.
+        lease_seconds (float, optional): The duration of a lease. Defaults to QUEUE_LEASE_SECONDS.
+        max_attempts (int, optional): The number of leases of a job before it fails. Defaults to QUEUE_MAX_ATTEMPTS.
+        clock (callable, optional): The function giving the current time, in seconds. Defaults to time.time
+                                    (which must be synchronized between the nodes).
+    """
+
+    def __init__(self, path, lease_seconds=QUEUE_LEASE_SECONDS, max_attempts=QUEUE_MAX_ATTEMPTS, clock=time.time):
+        self.path = path
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.clock = clock
+        self._local = threading.local()
+
+        with self._transaction() as connection:
+            connection.execute(
+                'CREATE TABLE IF NOT EXISTS jobs ('
+                'id INTEGER PRIMARY KEY, path TEXT UNIQUE NOT NULL, state TEXT NOT NULL, attempts INTEGER NOT NULL DEFAULT 0, '
+                'worker TEXT, lease_until REAL, result TEXT, error TEXT, updated REAL)')
+            connection.execute('CREATE INDEX IF NOT EXISTS jobs_state ON jobs (state, lease_until)')
+
+    def _get_connection(self):
+        # Connections cannot be shared between threads, and the heartbeats are sent from a separate thread
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            # Rollback journal instead of WAL, which does not work on network file systems
+            connection = sqlite3.connect(self.path, timeout=60, isolation_level=None)
+            connection.execute('PRAGMA journal_mode=DELETE')
+            self._local.connection = connection
+        return connection
+
+    def _transaction(self):
+        return _Transaction(self._get_connection())
+
+    def enqueue(self, paths):
+        """
+        Adds jobs to the queue. Paths already in the queue are ignored, so enqueuing is idempotent.
+
+        Args:
+            paths (iterable): The file paths.
+
+        Returns:
+            int: The number of jobs added.
+        """
+        now = self.clock()
+        with self._transaction() as connection:
+            before = connection.total_changes
+            connection.executemany(
+                'INSERT OR IGNORE INTO jobs (path, state, updated) VALUES (?, ?, ?)',
+                ((path, JOB_PENDING, now) for path in paths))
+            return connection.total_changes - before
+
+    def lease(self, worker, count=1):
+        """
+        Leases the next pending jobs, or jobs whose lease expired.
+
+        Args:
+            worker (str): The identifier of the worker.
+            count (int, optional): The maximum number of jobs. Defaults to 1.
+
+        Returns:
+            list: The paths of the leased jobs.
+        """
+        now = self.clock()
+        with self._transaction() as connection:
+            # Jobs abandoned too many times are not leased again
+            connection.execute(
+                'UPDATE jobs SET state = ?, error = coalesce(error, ?), updated = ? WHERE state = ? AND lease_until < ? AND attempts >= ?',
+                (JOB_FAILED, 'Lease expired', now, JOB_LEASED, now, self.max_attempts))
+
+            rows = connection.execute(
+                'SELECT id, path FROM jobs WHERE state = ? OR (state = ? AND lease_until < ?) ORDER BY id LIMIT ?',
+                (JOB_PENDING, JOB_LEASED, now, count)).fetchall()
+            connection.executemany(
+                'UPDATE jobs SET state = ?, worker = ?, lease_until = ?, attempts = attempts + 1, updated = ? WHERE id = ?',
+                ((JOB_LEASED, worker, now + self.lease_seconds, now, job_id) for job_id, _ in rows))
+        return [path for _, path in rows]
+
+    def heartbeat(self, worker, paths):
+        """
+        Renews the leases of jobs being validated by a worker.
+
+        Args:
+            worker (str): The identifier of the worker.
+            paths (list): The paths of the jobs.
+
+        Returns:
+            int: The number of leases renewed, which is lower than the number of paths if some leases were lost.
+        """
+        now = self.clock()
+        with self._transaction() as connection:
+            before = connection.total_changes
+            connection.executemany(
+                'UPDATE jobs SET lease_until = ?, updated = ? WHERE path = ? AND worker = ? AND state = ?',
+                ((now + self.lease_seconds, now, path, worker, JOB_LEASED) for path in paths))
+            return connection.total_changes - before
+
+    def complete(self, worker, path, results):
+        """
+        Writes the results of a job. Results of a job that is already done are ignored.
+
+        Args:
+            worker (str): The identifier of the worker.
+            path (str): The path of the job.
+            results (dict): The validation results, as returned by validator.pipeline_validate.
+
+        Returns:
+            bool: True if the results were written, False if the job was already done.
+        """
+        with self._transaction() as connection:
+            cursor = connection.execute(
+                'UPDATE jobs SET state = ?, worker = ?, result = ?, error = NULL, lease_until = NULL, updated = ? WHERE path = ? AND state != ?',
+                (JOB_DONE, worker, serialize_results(results), self.clock(), path, JOB_DONE))
+            return cursor.rowcount > 0
+
+    def fail(self, worker, path, error):
+        """
+        Records that a worker could not validate a job, which is retried unless it reached max_attempts.
+
+        Args:
+            worker (str): The identifier of the worker.
+            path (str): The path of the job.
+            error (str): The reason of the failure.
+
+        Returns:
+            str: The new state of the job, or None if the worker no longer held its lease.
+        """
+        with self._transaction() as connection:
+            row = connection.execute(
+                'SELECT attempts FROM jobs WHERE path = ? AND worker = ? AND state = ?', (path, worker, JOB_LEASED)).fetchone()
+            if row is None:
+                return None
+
+            state = JOB_FAILED if row[0] >= self.max_attempts else JOB_PENDING
+            connection.execute(
+                'UPDATE jobs SET state = ?, error = ?, lease_until = NULL, updated = ? WHERE path = ?',
+                (state, error, self.clock(), path))
+            return state
+
+    def release(self, worker):
+        """
+        Returns the jobs leased by a worker to the queue (e.g., when it is stopped), without counting the attempts.
+
+        Args:
+            worker (str): The identifier of the worker.
+
+        Returns:
+            int: The number of jobs released.
+        """
+        with self._transaction() as connection:
+            cursor = connection.execute(
+                'UPDATE jobs SET state = ?, attempts = max(attempts - 1, 0), lease_until = NULL, updated = ? WHERE worker = ? AND state = ?',
+                (JOB_PENDING, self.clock(), worker, JOB_LEASED))
+            return cursor.rowcount
+
+    def get_counts(self):
+        """
+        Counts the jobs of each state.
+
+        Returns:
+            dict: A dictionary mapping each state to its number of jobs.
+        """
+        counts = dict.fromkeys(JOB_STATES, 0)
+        with self._transaction() as connection:
+            counts.update(connection.execute('SELECT state, count(*) FROM jobs GROUP BY state').fetchall())
+        return counts
+
+    def iter_results(self):
+        """
+        Iterates over the results of the jobs that are done.
+
+        Yields:
+            tuple: The path of each job and its validation results.
+        """
+        cursor = self._get_connection().execute('SELECT path, result FROM jobs WHERE state = ? ORDER BY id', (JOB_DONE,))
+        for path, result in cursor:
+            yield path, deserialize_results(result)
+
+    def iter_failures(self):
+        """
+        Iterates over the jobs that failed.
+
+        Yields:
+            tuple: The path of each job and the reason of its last failure.
+        """
+        cursor = self._get_connection().execute('SELECT path, error FROM jobs WHERE state = ? ORDER BY id', (JOB_FAILED,))
+        yield from cursor
+
+    def close(self):
+        connection = getattr(self._local, 'connection', None)
+        if connection is not None:
+            connection.close()
+            self._local.connection = None
+
+
+class _Transaction:
+    """
+    Runs statements in an immediate transaction, which takes the write lock of the database at once so that
+    two workers cannot lease the same job.
+    """
+
+    def __init__(self, connection):
+        self.connection = connection
+
+    def __enter__(self):
+        self.connection.execute('BEGIN IMMEDIATE')
+        return self.connection
+
+    def __exit__(self, exc_type, exc, traceback):
+        self.connection.execute('ROLLBACK' if exc_type is not None else 'COMMIT')
+        return False
+
+
+class Heartbeat:
+    """
+    Renews the leases of the jobs being validated by a worker on a separate thread.
+
+    Args:
+        work_queue (SqliteWorkQueue): The queue.
+        worker (str): The identifier of the worker.
+        paths (list): The paths of the jobs.
+        interval (float, optional): The number of seconds between two renewals. Defaults to QUEUE_HEARTBEAT_SECONDS.
+    """
+
+    def __init__(self, work_queue, worker, paths, interval=QUEUE_HEARTBEAT_SECONDS):
+        self.work_queue = work_queue
+        self.worker = worker
+        self.paths = list(paths)
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='heartbeat', daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.work_queue.heartbeat(self.worker, self.paths)
+            except sqlite3.Error:
+                # The lease is renewed at the next beat, unless the database stays unavailable
+                continue
+        self.work_queue.close()
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stop.set()
+        self._thread.join()
+        return False
+
+
+def run_worker(work_queue, validate, on_result=None, worker=None, batch_size=1, heartbeat_seconds=QUEUE_HEARTBEAT_SECONDS, poll_seconds=QUEUE_POLL_SECONDS, should_stop=None):
+    """
+    Validates the jobs of a queue until it has no pending or leased jobs left, or should_stop returns True.
+
+    Workers on several nodes may run on the same queue, each leasing batch_size jobs at a time. While the jobs
+    of a batch are validated, their leases are renewed every heartbeat_seconds; a job that raises an exception
+    is returned to the queue to be retried (see SqliteWorkQueue.fail).
+
+    Args:
+        work_queue (SqliteWorkQueue): The queue.
+        validate (callable): A function that receives a file path and returns its results
+                             (e.g., a functools.partial of validator.pipeline_validate).
+        on_result (callable, optional): A function called with each file path and its results.
+        worker (str, optional): The identifier of the worker. Defaults to the one returned by get_worker_id.
+        batch_size (int, optional): The number of jobs leased at a time. Defaults to 1.
+        heartbeat_seconds (float, optional): The number of seconds between two renewals of the leases.
+        poll_seconds (float, optional): The number of seconds to wait for leases of other workers to expire.
+        should_stop (callable, optional): A function returning True when the worker must stop. Defaults to never.
+
+    Returns:
+        int: The number of jobs validated by this worker.
+    """
+    worker = worker or get_worker_id()
+    validated = 0
+
+    try:
+        while should_stop is None or not should_stop():
+            paths = work_queue.lease(worker, batch_size)
+            if not paths:
+                # Jobs leased by other workers may still be abandoned and leased again
+                if work_queue.get_counts()[JOB_LEASED] == 0:
+                    break
+                time.sleep(poll_seconds)
+                continue
+
+            with Heartbeat(work_queue, worker, paths, heartbeat_seconds):
+                for path in paths:
+                    if should_stop is not None and should_stop():
+                        break
+                    try:
+                        results = validate(path)
+                    except Exception as e:
+                        work_queue.fail(worker, path, '%s: %s' % (type(e).__name__, e))
+                        continue
+
+                    work_queue.complete(worker, path, results)
+                    validated += 1
+                    if on_result is not None:
+                        on_result(path, results)
+    finally:
+        # Jobs leased but not validated are given back at once instead of waiting for their leases to expire
+        work_queue.release(worker)
+
+    return validated
@@ -0,0 +1,270 @@
+from collections import deque
+from multiprocessing import connection
+
+import multiprocessing
+import os
+
+from scielo_log_validator import watch
+
+
+# Number of files a worker process validates before it is replaced by a new one (0 for no limit)
+WORKER_MAX_FILES = int(os.environ.get('WORKER_MAX_FILES', '0'))
+
+# Resident memory, in megabytes, above which a worker process is replaced by a new one (0 for no limit)
+WORKER_MAX_RSS_MB = int(os.environ.get('WORKER_MAX_RSS_MB', '0'))
+
+# Number of seconds between two checks of the resident memory of the workers validating a file
+WORKER_WATCHDOG_INTERVAL = float(os.environ.get('WORKER_WATCHDOG_INTERVAL', '1'))
+
+# Number of times a file is validated again after its worker was stopped by the watchdog or died
+WORKER_MAX_RETRIES = int(os.environ.get('WORKER_MAX_RETRIES', '1'))
+
+# Reasons a worker process is replaced
+RESTART_MAX_FILES = 'max_files'
+RESTART_RSS = 'rss'
+RESTART_WATCHDOG = 'watchdog'
+RESTART_CRASH = 'crash'
+
+PAGE_SIZE = os.sysconf('SC_PAGE_SIZE') if hasattr(os, 'sysconf') else 4096
+
+
+def get_rss(pid=None):
+    """
+    Gets the resident memory of a process, from /proc.
+
+    Args:
+        pid (int, optional): The process ID. Defaults to the current process.
+
+    Returns:
+        int: The resident memory, in bytes, or None if it is not available (e.g., not on Linux or the process ended).
+    """
+    try:
+        with open('/proc/%s/statm' % (pid or 'self')) as fin:
+            return int(fin.read().split()[1]) * PAGE_SIZE
+    except (OSError, IndexError, ValueError):
+        return None
+
+
+def run_pool_worker(conn, validate, initializer, initargs, max_files, max_rss):
+    """
+    Validates the files received from the pool until it is told to stop or it must be replaced.
+
+    After each file, the worker sends the file path, whether it was validated, its results (or the error), its
+    resident memory and whether it is retiring, which it does after max_files files or when its resident memory
+    exceeds max_rss, so that memory kept by the validations (e.g., by fragmentation) is returned to the system.
+    """
+    if initializer is not None:
+        initializer(*initargs)
+
+    files = 0
+    while True:
+        try:
+            path = conn.recv()
+        except EOFError:
+            return
+        if path is None:
+            return
+
+        try:
+            ok, value = True, validate(path)
+        except Exception as e:
+            ok, value = False, str(e)
+
+        files += 1
+        rss = get_rss()
+        retiring = bool(max_files and files >= max_files) or bool(max_rss and rss and rss > max_rss)
+        conn.send((path, ok, value, rss, retiring))
+        if retiring:
+            return
+
+
+class PoolWorker:
+    """
+    A worker process of a RecyclingWorkerPool, and the memory statistics of the processes that held its place.
+    """
+
+    def __init__(self, index):
+        self.index = index
+        self.process = None
+        self.conn = None
+        self.path = None
+        self.stats = {
+            'worker': index,
+            'pid': None,
+            'files': 0,
+            'processes': 0,
+            'restarts': {RESTART_MAX_FILES: 0, RESTART_RSS: 0, RESTART_WATCHDOG: 0, RESTART_CRASH: 0},
+            'rss': None,
+            'peak_rss': None,
+        }
+
+    def update_rss(self, rss):
+        if rss is None:
+            return
+        self.stats['rss'] = rss
+        self.stats['peak_rss'] = max(rss, self.stats['peak_rss'] or 0)
+
+    def stop(self, reason=None, terminate=False):
+        if terminate:
+            self.process.terminate()
+        self.process.join()
+        self.conn.close()
+        self.process = None
+        self.conn = None
+        self.path = None
+        if reason is not None:
+            self.stats['restarts'][reason] += 1
+
+
+class RecyclingWorkerPool:
+    """
+    Pool of worker processes that are replaced after a number of files or when their resident memory grows too large,
+    so that long batch runs keep a flat memory footprint.
+
+    A worker that exceeds max_rss after a file retires gracefully once it reports its results. While a worker
+    validates a file, a watchdog checks its resident memory every watchdog_interval seconds and stops it if it
+    exceeds max_rss; the file is then validated again by a new worker, as is the file of a worker that died
+    (e.g., killed by the OOM killer), up to max_retries times.
+
+    Args:
+        validate (callable): A function that receives a file path and returns its results (e.g., a functools.partial of
+                             validator.pipeline_validate). It must be picklable where processes are not forked.
+        workers (int): The number of worker processes.
+        max_files (int, optional): The number of files validated by a process before it is replaced. Defaults to WORKER_MAX_FILES (0, no limit).
+        max_rss (int, optional): The resident memory, in bytes, above which a process is replaced. Defaults to WORKER_MAX_RSS_MB (0, no limit).
+        initializer (callable, optional): A function called by each new process. Defaults to watch.init_worker.
+        initargs (tuple, optional): The arguments of the initializer. Defaults to those of watch.get_worker_initargs.
+        watchdog_interval (float, optional): The number of seconds between two checks of the resident memory. Defaults to WORKER_WATCHDOG_INTERVAL.
+        max_retries (int, optional): The number of times a file is validated again. Defaults to WORKER_MAX_RETRIES.
+    """
+
+    def __init__(self, validate, workers, max_files=WORKER_MAX_FILES, max_rss=WORKER_MAX_RSS_MB * 1024 * 1024, initializer=watch.init_worker, initargs=None, watchdog_interval=WORKER_WATCHDOG_INTERVAL, max_retries=WORKER_MAX_RETRIES):
+        self.validate = validate
+        self.max_files = max_files
+        self.max_rss = max_rss
+        self.initializer = initializer
+        self.initargs = watch.get_worker_initargs() if initargs is None and initializer is watch.init_worker else initargs or ()
+        self.watchdog_interval = watchdog_interval
+        self.max_retries = max_retries
+        self.workers = [PoolWorker(i) for i in range(max(1, workers))]
+        self._context = multiprocessing.get_context()
+
+    def _start(self, worker):
+        parent_conn, child_conn = self._context.Pipe()
+        worker.process = self._context.Process(
+            target=run_pool_worker,
+            args=(child_conn, self.validate, self.initializer, self.initargs, self.max_files, self.max_rss),
+            daemon=True)
+        worker.process.start()
+        child_conn.close()
+        worker.conn = parent_conn
+        worker.stats['pid'] = worker.process.pid
+        worker.stats['processes'] += 1
+
+    def imap_unordered(self, paths):
+        """
+        Validates files, reporting each result as soon as it is ready.
+
+        Args:
+            paths (iterable): The file paths, consumed as workers become idle.
+
+        Yields:
+            tuple: Each file path and its results, or a dictionary with the error of a file that could not be validated.
+        """
+        paths = iter(paths)
+        retries = deque()
+        attempts = {}
+
+        while True:
+            for worker in self.workers:
+                if worker.path is not None:
+                    continue
+                path = retries.popleft() if retries else next(paths, None)
+                if path is None:
+                    break
+                if worker.process is None:
+                    self._start(worker)
+                worker.path = path
+                worker.conn.send(path)
+
+            busy = {w.conn: w for w in self.workers if w.path is not None}
+            if not busy:
+                return
+
+            for conn in connection.wait(list(busy), timeout=self.watchdog_interval):
+                worker = busy[conn]
+                try:
+                    path, ok, value, rss, retiring = conn.recv()
+                except EOFError:
+                    # The process died while validating the file
+                    path = worker.path
+                    worker.process.join()
+                    exitcode = worker.process.exitcode
+                    worker.stop(RESTART_CRASH)
+                    failed = self._retry(path, attempts, retries, 'Worker process exited with code %s' % exitcode)
+                    if failed is not None:
+                        yield failed
+                    continue
+
+                worker.path = None
+                worker.stats['files'] += 1
+                worker.update_rss(rss)
+                if retiring:
+                    worker.stop(RESTART_RSS if self.max_rss and rss and rss > self.max_rss else RESTART_MAX_FILES)
+                attempts.pop(path, None)
+                yield path, value if ok else {'error': value}
+
+            if self.max_rss:
+                for worker in self.workers:
+                    if worker.path is None:
+                        continue
+                    rss = get_rss(worker.process.pid)
+                    worker.update_rss(rss)
+                    if rss is not None and rss > self.max_rss:
+                        path = worker.path
+                        worker.stop(RESTART_WATCHDOG, terminate=True)
+                        failed = self._retry(path, attempts, retries, 'Worker process exceeded %d MB of resident memory' % (self.max_rss // (1024 * 1024)))
+                        if failed is not None:
+                            yield failed
+
+    def _retry(self, path, attempts, retries, error):
+        attempts[path] = attempts.get(path, 0) + 1
+        if attempts[path] > self.max_retries:
+            del attempts[path]
+            return path, {'error': error}
+        retries.append(path)
+        return None
+
+    def get_stats(self):
+        """
+        Gets the memory statistics of the workers.
+
+        Returns:
+            list: A dictionary per worker with the PID of its current (or last) process, the number of 'files' validated and of
+                  'processes' started, the number of 'restarts' of each reason, and the last and peak resident memory ('rss'
+                  and 'peak_rss', in bytes) of its processes.
+        """
+        return [dict(w.stats, restarts=dict(w.stats['restarts'])) for w in self.workers]
+
+    def close(self):
+        """
+        Stops the worker processes.
+        """
+        for worker in self.workers:
+            if worker.process is None:
+                continue
+            if worker.path is None:
+                try:
+                    worker.conn.send(None)
+                except OSError:
+                    pass
+                worker.stop()
+            else:
+                worker.stop(terminate=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+        return False
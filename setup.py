@@ -44,7 +44,7 @@ setuptools.setup(
     ],
     entry_points={
         'console_scripts': [
-            'log_validator=scielo_log_validator.validator:main',
+            'log_validator=scielo_log_validator.cli:main',
         ],
     },
 )
\ No newline at end of file
@@ -0,0 +1,172 @@
+import gzip
+import json
+import os
+import re
+import tempfile
+import time
+import tracemalloc
+import unittest
+
+from scielo_log_validator import validator
+
+
+# Benchmarks only run when requested, e.g. RUN_BENCHMARKS=1 python -m unittest tests.benchmarks.test_benchmarks
+RUN_BENCHMARKS = os.environ.get('RUN_BENCHMARKS', '') not in ('', '0')
+
+# Rewrites the baseline file with the measured values instead of comparing them
+UPDATE_BENCHMARK_BASELINE = os.environ.get('UPDATE_BENCHMARK_BASELINE', '') not in ('', '0')
+
+# Maximum relative loss of throughput (or gain of peak memory) tolerated with respect to the baseline
+BENCHMARK_TOLERANCE = float(os.environ.get('BENCHMARK_TOLERANCE', '0.3'))
+
+# Number of times each benchmark is run; the best run is kept
+BENCHMARK_REPEAT = int(os.environ.get('BENCHMARK_REPEAT', '3'))
+
+BASELINE_PATH = os.path.join(os.path.dirname(__file__), 'baseline.json')
+
+BENCHMARK_LINES = 100000
+
+CALIBRATION_LINE = '200.1.2.3 - - [15/May/2024:10:20:30 -0300] "GET /scielo.php?pid=1 HTTP/1.1" 200 1234 "-" "Mozilla/5.0"'
+
+
+def write_benchmark_log(path, total_lines):
+    """
+    Writes a deterministic gzipped log mixing remote, local and invalid lines over two days.
+    """
+    with gzip.open(path, 'wt') as fout:
+        for i in range(total_lines):
+            if i % 50 == 0:
+                fout.write('invalid line %d\n' % i)
+                continue
+            ip = '10.0.%d.%d' % ((i >> 8) % 256, i % 256) if i % 7 == 0 else '200.%d.%d.%d' % ((i >> 16) % 256, (i >> 8) % 256, i % 256)
+            day = 15 if i % 10 else 16
+            fout.write(
+                '%s - - [%02d/May/2024:%02d:%02d:%02d -0300] "GET /scielo.php?pid=%d HTTP/1.1" 200 %d "-" "Mozilla/5.0"\n'
+                % (ip, day, (i // 3600) % 24, (i // 60) % 60, i % 60, i, i % 5000)
+            )
+
+
+def calibrate():
+    """
+    Measures the speed of this machine with a fixed workload similar to line parsing.
+
+    Throughputs are multiplied by the calibration time, so that a baseline recorded on one machine
+    can be compared with measures taken on a faster or slower one.
+
+    Returns:
+        float: The best time, in seconds, of the calibration workload.
+    """
+    pattern = re.compile(r'(?P<ip>\S+) \S+ \S+ \[(?P<date>[^\]]+)\] "(?P<request>[^"]*)"')
+    best = None
+    for _ in range(BENCHMARK_REPEAT):
+        start = time.perf_counter()
+        counts = {}
+        for i in range(20000):
+            match = pattern.match(CALIBRATION_LINE.encode().decode().strip())
+            key = match.group('ip').split('.')[i % 4]
+            counts[key] = counts.get(key, 0) + 1
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def measure(func):
+    """
+    Runs a function several times and returns its best time, in seconds.
+    """
+    best = None
+    for _ in range(BENCHMARK_REPEAT):
+        start = time.perf_counter()
+        func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def measure_peak_memory(func):
+    """
+    Runs a function once and returns the peak of memory allocated by Python while it ran, in bytes.
+    """
+    tracemalloc.start()
+    try:
+        func()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return peak
+
+
+@unittest.skipUnless(RUN_BENCHMARKS or UPDATE_BENCHMARK_BASELINE, 'set RUN_BENCHMARKS=1 to run the benchmarks')
+class TestBenchmarks(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.tmp_dir = tempfile.TemporaryDirectory()
+        cls.path = os.path.join(cls.tmp_dir.name, '2024-05-15_scielo.1.br.log.gz')
+        write_benchmark_log(cls.path, BENCHMARK_LINES)
+
+        cls.calibration = calibrate()
+        cls.measures = {}
+
+        cls.baseline = {}
+        if os.path.exists(BASELINE_PATH):
+            with open(BASELINE_PATH) as fin:
+                cls.baseline = json.load(fin)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.tmp_dir.cleanup()
+
+        if UPDATE_BENCHMARK_BASELINE:
+            baseline = dict(cls.baseline)
+            baseline.update(cls.measures)
+            with open(BASELINE_PATH, 'w') as fout:
+                json.dump(baseline, fout, indent=2, sort_keys=True)
+                fout.write('\n')
+
+    def check_throughput(self, name, lines, elapsed):
+        # Lines processed per calibration run, which does not depend much on the speed of the machine
+        score = lines / elapsed * self.calibration
+        self.measures[name] = score
+
+        if UPDATE_BENCHMARK_BASELINE or name not in self.baseline:
+            return
+        self.assertGreaterEqual(
+            score,
+            self.baseline[name] * (1 - BENCHMARK_TOLERANCE),
+            '%s regressed: %.1f normalized lines/s against a baseline of %.1f' % (name, score, self.baseline[name]))
+
+    def check_peak_memory(self, name, peak):
+        self.measures[name] = peak
+
+        if UPDATE_BENCHMARK_BASELINE or name not in self.baseline:
+            return
+        self.assertLessEqual(
+            peak,
+            self.baseline[name] * (1 + BENCHMARK_TOLERANCE),
+            '%s regressed: %d bytes against a baseline of %d' % (name, peak, self.baseline[name]))
+
+    def test_get_total_lines(self):
+        elapsed = measure(lambda: validator.get_total_lines(self.path))
+        self.check_throughput('get_total_lines', BENCHMARK_LINES, elapsed)
+
+    def test_analyze_log_content(self):
+        sample_lines = BENCHMARK_LINES // 10
+        elapsed = measure(lambda: validator.analyze_log_content(self.path, BENCHMARK_LINES, sample_lines))
+        self.check_throughput('analyze_log_content', BENCHMARK_LINES, elapsed)
+
+        peak = measure_peak_memory(lambda: validator.analyze_log_content(self.path, BENCHMARK_LINES, sample_lines))
+        self.check_peak_memory('analyze_log_content_peak_memory', peak)
+
+    def test_analyze_log_content_full_sample(self):
+        elapsed = measure(lambda: validator.analyze_log_content(self.path, BENCHMARK_LINES, BENCHMARK_LINES))
+        self.check_throughput('analyze_log_content_full_sample', BENCHMARK_LINES, elapsed)
+
+    def test_pipeline_validate(self):
+        elapsed = measure(lambda: validator.pipeline_validate(self.path))
+        self.check_throughput('pipeline_validate', BENCHMARK_LINES, elapsed)
+
+    def test_validate_path_names(self):
+        paths = ['/logs/2024-05-%02d_scielo.%d.br.log.gz' % (i % 28 + 1, i % 3) for i in range(BENCHMARK_LINES)]
+        elapsed = measure(lambda: sum(1 for _ in validator.validate_path_names(paths)))
+        self.check_throughput('validate_path_names', BENCHMARK_LINES, elapsed)
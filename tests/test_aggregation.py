@@ -0,0 +1,78 @@
+import csv
+import io
+import json
+import unittest
+
+from datetime import date, datetime
+
+from scielo_log_validator import aggregation
+
+
+def build_results(collection, probably_date, is_valid=True):
+    return {
+        'path': {'collection': collection, 'date': probably_date.strftime('%Y-%m-%d')},
+        'is_valid': {'ips': is_valid, 'dates': is_valid, 'all': is_valid},
+        'probably_date': probably_date,
+    }
+
+
+class TestCoverageReport(unittest.TestCase):
+
+    def setUp(self):
+        self.report = aggregation.CoverageReport(collections=['scl', 'chl'])
+        self.report.add('/logs/2024-05-15_scielo.1.br.log.gz', build_results('scl', datetime(2024, 5, 15)))
+        self.report.add('/logs/2024-05-15_scielo.2.br.log.gz', build_results('scl', datetime(2024, 5, 15)))
+        self.report.add('/logs/2024-05-17_scielo.1.br.log.gz', build_results('scl', datetime(2024, 5, 17)))
+        self.report.add('/logs/again/2024-05-17_scielo.1.br.log.gz', build_results('scl', datetime(2024, 5, 17)))
+        self.report.add('/logs/2024-05-16_scielo.cl.log.gz', build_results('chl', datetime(2024, 5, 16), is_valid=False))
+
+    def get_statuses(self):
+        return {(r['collection'], r['date']): r['status'] for r in self.report.iter_rows()}
+
+    def test_iter_rows_covers_every_collection_day(self):
+        statuses = self.get_statuses()
+        self.assertEqual(len(statuses), 6)
+        self.assertEqual(statuses[('scl', '2024-05-15')], 'valid')
+        self.assertEqual(statuses[('scl', '2024-05-16')], 'missing')
+        self.assertEqual(statuses[('scl', '2024-05-17')], 'duplicate')
+        self.assertEqual(statuses[('chl', '2024-05-15')], 'missing')
+        self.assertEqual(statuses[('chl', '2024-05-16')], 'invalid')
+
+    def test_different_servers_of_a_collection_are_not_duplicates(self):
+        row = self.report.to_dict()['collections']['scl']['2024-05-15']
+        self.assertEqual(row['files'], 2)
+        self.assertEqual(row['servers'], {'_scielo.1.br': 1, '_scielo.2.br': 1})
+
+    def test_unchecked_results_use_path_date(self):
+        report = aggregation.CoverageReport(collections=[])
+        report.add('/logs/2024-05-15_scielo.cl.log.gz', {'path': {'collection': 'chl', 'date': '2024-05-15'}})
+        self.assertEqual(self.get_single_status(report), ('chl', '2024-05-15', 'unchecked'))
+
+    def test_undated_results_are_counted_apart(self):
+        report = aggregation.CoverageReport(collections=[])
+        report.add('/logs/invalid_file_name.log.gz', {'probably_date': {'error': 'Date dictionary is empty'}})
+        self.assertEqual(report.to_dict()['undated_files'], {'unknown': 1})
+        self.assertEqual(list(report.iter_rows()), [])
+
+    def test_explicit_date_range(self):
+        report = aggregation.CoverageReport(collections=['chl'], start_date=date(2024, 5, 1), end_date=date(2024, 5, 31))
+        self.assertEqual(len(list(report.iter_rows())), 31)
+
+    def test_write_csv(self):
+        fout = io.StringIO()
+        self.report.write_csv(fout)
+        rows = list(csv.DictReader(io.StringIO(fout.getvalue())))
+        self.assertEqual(len(rows), 6)
+        self.assertEqual(rows[-1]['servers'], '_scielo.1.br:2')
+
+    def test_write_json(self):
+        fout = io.StringIO()
+        self.report.write_json(fout)
+        obtained = json.loads(fout.getvalue())
+        self.assertEqual(obtained['start_date'], '2024-05-15')
+        self.assertEqual(obtained['end_date'], '2024-05-17')
+        self.assertEqual(obtained['collections']['chl']['2024-05-16']['invalid'], 1)
+
+    def get_single_status(self, report):
+        row, = report.iter_rows()
+        return row['collection'], row['date'], row['status']
@@ -0,0 +1,79 @@
+import os
+import tempfile
+import unittest
+
+from scielo_log_validator import bots
+
+
+class TestBots(unittest.TestCase):
+
+    def setUp(self):
+        self.classifier = bots.UserAgentClassifier()
+
+    def test_classify_bots(self):
+        for user_agent in (
+            'Mozilla/5.0 (compatible; Googlebot/2.1; +http://www.google.com/bot.html)',
+            'Mozilla/5.0 (compatible; bingbot/2.0; +http://www.bing.com/bingbot.htm)',
+            'Mozilla/5.0 (compatible; YandexBot/3.0; +http://yandex.com/bots)',
+            'Mozilla/5.0 (compatible; AhrefsBot/7.0; +http://ahrefs.com/robot/)',
+            'facebookexternalhit/1.1 (+http://www.facebook.com/externalhit_uatext.php)',
+            'python-requests/2.31.0',
+            'curl/8.4.0',
+            'Wget/1.21.4',
+            'Go-http-client/1.1',
+            'Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) HeadlessChrome/120.0.0.0 Safari/537.36',
+            'Mozilla/5.0 (compatible; Baiduspider/2.0; +http://www.baidu.com/search/spider.html)',
+            'Sogou web spider/4.0(+http://www.sogou.com/docs/help/webmasters.htm#07)',
+            'FeedFetcher-Google; (+http://www.google.com/feedfetcher.html)',
+            'Ruby',
+        ):
+            self.assertEqual(self.classifier.classify(user_agent), bots.USER_AGENT_BOT, user_agent)
+
+    def test_classify_humans(self):
+        for user_agent in (
+            'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
+            'Mozilla/5.0 (iPhone; CPU iPhone OS 17_1 like Mac OS X) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/17.1 Mobile/15E148 Safari/604.1',
+            'Mozilla/5.0 (X11; Ubuntu; Linux x86_64; rv:120.0) Gecko/20100101 Firefox/120.0',
+        ):
+            self.assertEqual(self.classifier.classify(user_agent), bots.USER_AGENT_HUMAN, user_agent)
+
+    def test_classify_browsers_and_apps_with_words_of_bots(self):
+        for user_agent in (
+            'Mozilla/5.0 (Linux; Android 10; V2002A Build/QP1A.190711.020; wv) AppleWebKit/537.36 (KHTML, like Gecko) Version/4.0 Chrome/78.0.3904.108 Mobile Safari/537.36 SogouMobileBrowser/5.28.12',
+            'Mozilla/5.0 (Linux; Android 10; ELE-AL00 Build/HUAWEIELE-AL0001; wv) AppleWebKit/537.36 (KHTML, like Gecko) Version/4.0 Chrome/76.0.3809.89 Mobile Safari/537.36 T7/12.10 SP-engine/2.28.0 baiduboxapp/12.10.0.10 (Baidu; P1 10)',
+            'Mozilla/5.0 (iPhone; CPU iPhone OS 16_5 like Mac OS X) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/16.0 YandexSearch/23.61 Mobile/15E148 Safari/604.1',
+            'Mozilla/5.0 (Linux; Android 12; SM-T220 Build/SP1A.210812.016; wv) AppleWebKit/537.36 (KHTML, like Gecko) Version/4.0 Chrome/119.0.6045.163 Safari/537.36 Seznam.cz/8.4.1',
+            'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36 Edg/120.0.0.0 (Index Monitor Fetch)',
+            'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/17.1 Safari/605.1.15 RubyMine/2023.3',
+            'Mozilla/5.0',
+        ):
+            self.assertEqual(self.classifier.classify(user_agent), bots.USER_AGENT_HUMAN, user_agent)
+
+    def test_classify_empty_user_agents(self):
+        for user_agent in ('', '-', None):
+            self.assertEqual(self.classifier.classify(user_agent), bots.USER_AGENT_UNKNOWN)
+
+    def test_memo_is_bounded(self):
+        classifier = bots.UserAgentClassifier(memo_size=10)
+        for i in range(100):
+            classifier.classify('Mozilla/5.0 (Windows NT 10.0) Chrome/%d.0' % i)
+        classifier.classify('Mozilla/5.0 (Windows NT 10.0) Chrome/99.0')
+        info = classifier.classify.cache_info()
+        self.assertEqual(info.currsize, 10)
+        self.assertEqual(info.hits, 1)
+
+    def test_load_bot_signatures(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, 'signatures.txt')
+            with open(path, 'w') as fout:
+                fout.write('# Institutional harvester\nharvester\n\n')
+            signatures = bots.load_bot_signatures(path)
+
+        self.assertEqual(signatures, ['harvester'])
+        classifier = bots.UserAgentClassifier(signatures)
+        self.assertEqual(classifier.classify('OAI Harvester 1.0'), bots.USER_AGENT_BOT)
+        self.assertEqual(classifier.classify('Mozilla/5.0 (compatible; Googlebot/2.1)'), bots.USER_AGENT_HUMAN)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,71 @@
+import io
+import unittest
+
+from scielo_log_validator import budget
+
+
+class FakeClock:
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestBudget(unittest.TestCase):
+
+    def test_check_time_without_limit(self):
+        clock = FakeClock()
+        content_budget = budget.ContentBudget(clock=clock)
+        clock.now = 1e6
+        self.assertTrue(content_budget.check_time())
+        self.assertIsNone(content_budget.exceeded)
+
+    def test_check_time_stays_exceeded(self):
+        clock = FakeClock()
+        content_budget = budget.ContentBudget(seconds=2, clock=clock)
+        clock.now = 1.5
+        self.assertTrue(content_budget.check_time())
+        clock.now = 2.5
+        self.assertFalse(content_budget.check_time())
+        self.assertEqual(content_budget.exceeded, budget.BUDGET_EXCEEDED_TIME)
+        self.assertFalse(content_budget.check_time())
+
+    def test_reader_counts_bytes_without_limit(self):
+        content_budget = budget.ContentBudget()
+        reader = content_budget.wrap(io.BytesIO(b'a\nb\nc\n'))
+        self.assertEqual(reader.read(4), b'a\nb\n')
+        self.assertEqual(reader.read(4), b'c\n')
+        self.assertEqual(reader.read(4), b'')
+        self.assertEqual(content_budget.bytes_read, 6)
+        self.assertIsNone(content_budget.exceeded)
+
+    def test_reader_cuts_after_last_complete_line(self):
+        content_budget = budget.ContentBudget(max_bytes=7)
+        reader = content_budget.wrap(io.BytesIO(b'aa\nbb\ncc\ndd\n'))
+        self.assertEqual(reader.read(1024), b'aa\nbb\n')
+        self.assertEqual(reader.read(1024), b'')
+        self.assertEqual(content_budget.exceeded, budget.BUDGET_EXCEEDED_BYTES)
+        self.assertEqual(content_budget.bytes_read, 6)
+
+    def test_reader_of_file_as_large_as_budget(self):
+        content_budget = budget.ContentBudget(max_bytes=6)
+        reader = content_budget.wrap(io.BytesIO(b'aa\nbb\n'))
+        self.assertEqual(reader.read(3), b'aa\n')
+        self.assertEqual(reader.read(3), b'bb\n')
+        self.assertEqual(reader.read(3), b'')
+        self.assertIsNone(content_budget.exceeded)
+
+    def test_reader_stops_when_time_is_exceeded(self):
+        clock = FakeClock()
+        content_budget = budget.ContentBudget(seconds=1, clock=clock)
+        reader = content_budget.wrap(io.BytesIO(b'aa\nbb\n'))
+        self.assertEqual(reader.read(3), b'aa\n')
+        clock.now = 2
+        self.assertEqual(reader.read(3), b'')
+        self.assertEqual(content_budget.get_report(1), {'exceeded': 'time', 'elapsed': 2, 'bytes_read': 3, 'lines_read': 1})
+
+
+if __name__ == '__main__':
+    unittest.main()
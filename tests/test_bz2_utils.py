@@ -0,0 +1,97 @@
+import bz2
+import gzip
+import io
+import os
+import shutil
+import tempfile
+import unittest
+
+from unittest import mock
+
+from scielo_log_validator import bz2_utils, file_utils, validator
+
+
+class TestBZ2Utils(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        with gzip.open('tests/fixtures/logs/scielo.wi/2024-02-20_caribbean.scielo.org.1.log.gz') as fin:
+            self.content = fin.read()
+
+        # Level 1 makes blocks of 100 kB, so the fixture is compressed into several blocks
+        self.single_stream_path = os.path.join(self.tmp_dir, 'single.log.bz2')
+        with open(self.single_stream_path, 'wb') as fout:
+            fout.write(bz2.compress(self.content, 1))
+
+        # Files compressed by pbzip2 are made of several streams
+        self.multi_stream_path = os.path.join(self.tmp_dir, 'multi.log.bz2')
+        with open(self.multi_stream_path, 'wb') as fout:
+            for i in range(0, len(self.content), 300000):
+                fout.write(bz2.compress(self.content[i:i + 300000]))
+
+        # The parallel reader is only used on machines with several CPUs
+        cpu_count_patcher = mock.patch.object(bz2_utils.os, 'cpu_count', return_value=4)
+        cpu_count_patcher.start()
+        self.addCleanup(cpu_count_patcher.stop)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_find_block_segments(self):
+        with open(self.single_stream_path, 'rb') as fin:
+            segments, truncated = bz2_utils.find_block_segments(fin.read())
+        self.assertEqual(len(segments), len(self.content) // 100000 + 1)
+        self.assertFalse(truncated)
+
+    def test_open_bz2_single_stream(self):
+        with bz2_utils.open_bz2(self.single_stream_path, workers=3, min_size=0) as fin:
+            self.assertIsInstance(fin, io.BufferedReader)
+            self.assertEqual(fin.read(), self.content)
+
+    def test_open_bz2_multi_stream(self):
+        with bz2_utils.open_bz2(self.multi_stream_path, workers=3, min_size=0) as fin:
+            self.assertEqual(fin.readlines(), self.content.splitlines(keepends=True))
+
+    def test_open_bz2_single_block_uses_bz2file(self):
+        path = os.path.join(self.tmp_dir, 'small.log.bz2')
+        with open(path, 'wb') as fout:
+            fout.write(bz2.compress(self.content[:1000]))
+        with bz2_utils.open_bz2(path, workers=3, min_size=0) as fin:
+            self.assertIsInstance(fin, bz2.BZ2File)
+            self.assertEqual(fin.read(), self.content[:1000])
+
+    def test_open_bz2_truncated_file_raises_exception(self):
+        path = os.path.join(self.tmp_dir, 'truncated.log.bz2')
+        with open(self.single_stream_path, 'rb') as fin, open(path, 'wb') as fout:
+            fout.write(fin.read()[:30000])
+        with self.assertRaises(EOFError):
+            with bz2_utils.open_bz2(path, workers=3, min_size=0) as fin:
+                fin.read()
+
+    def test_open_bz2_small_file_uses_bz2file(self):
+        with bz2_utils.open_bz2(self.single_stream_path, workers=3, min_size=os.path.getsize(self.single_stream_path) + 1) as fin:
+            self.assertIsInstance(fin, bz2.BZ2File)
+            self.assertEqual(fin.read(), self.content)
+
+    def test_open_bz2_single_cpu_uses_bz2file(self):
+        with mock.patch.object(bz2_utils.os, 'cpu_count', return_value=1):
+            with bz2_utils.open_bz2(self.single_stream_path, workers=3, min_size=0) as fin:
+                self.assertIsInstance(fin, bz2.BZ2File)
+
+    def test_reader_block_count(self):
+        raw = bz2_utils.ParallelBZ2RawReader(self.single_stream_path, workers=2)
+        with io.BufferedReader(raw) as fin:
+            self.assertEqual(raw.block_count, len(self.content) // 100000 + 1)
+            fin.read()
+            self.assertEqual(raw.block_count, len(self.content) // 100000 + 1)
+
+    def test_reader_joins_segments_split_by_false_magic_numbers(self):
+        raw = bz2_utils.ParallelBZ2RawReader(self.single_stream_path, workers=2)
+        start, end = raw._segments.popleft()
+        raw._segments.extendleft([((start + end) // 2, end), (start, (start + end) // 2)])
+        with io.BufferedReader(raw) as fin:
+            self.assertEqual(fin.read(), self.content)
+
+    def test_get_total_lines_of_bz2_file(self):
+        self.assertIs(file_utils.DEFAULT_MIME_HANDLERS['application/x-bzip2'], bz2_utils.open_bz2)
+        self.assertEqual(validator.get_total_lines(self.single_stream_path), 7160)
@@ -0,0 +1,81 @@
+import pickle
+import unittest
+
+from scielo_log_validator import cardinality
+
+
+class TestCardinality(unittest.TestCase):
+
+    def test_count_is_within_error_bounds(self):
+        for n in (0, 10, 1000, 50000):
+            sketch = cardinality.HyperLogLog()
+            for i in range(n):
+                sketch.add('200.%d.%d.%d' % (i >> 16, (i >> 8) % 256, i % 256))
+            self.assertLessEqual(abs(sketch.count() - n), max(1, 0.05 * n))
+
+    def test_adding_a_value_twice_does_not_change_the_sketch(self):
+        sketch = cardinality.HyperLogLog()
+        sketch.add('200.1.1.1')
+        registers = bytes(sketch.registers)
+        sketch.add('200.1.1.1')
+        sketch.add(b'200.1.1.1')
+        self.assertEqual(bytes(sketch.registers), registers)
+        self.assertEqual(sketch.count(), 1)
+
+    def test_merge_estimates_the_union(self):
+        first, second, union = cardinality.HyperLogLog(), cardinality.HyperLogLog(), cardinality.HyperLogLog()
+        for i in range(20000):
+            first.add(str(i))
+            union.add(str(i))
+        for i in range(10000, 30000):
+            second.add(str(i))
+            union.add(str(i))
+        self.assertEqual(first.merge(second), union)
+
+    def test_merge_requires_same_precision(self):
+        with self.assertRaises(ValueError):
+            cardinality.HyperLogLog(10).merge(cardinality.HyperLogLog(12))
+
+    def test_invalid_precision(self):
+        with self.assertRaises(ValueError):
+            cardinality.HyperLogLog(20)
+
+    def test_sketch_string_round_trip(self):
+        sketch = cardinality.HyperLogLog(10)
+        for i in range(500):
+            sketch.add(str(i))
+        self.assertEqual(cardinality.HyperLogLog.from_string(sketch.to_string()), sketch)
+
+    def test_distinct_ip_sketches(self):
+        sketches = cardinality.DistinctIpSketches()
+        for i in range(100):
+            sketches.add('remote', '200.0.0.%d' % i, (2024, 5, 15, i % 2))
+        for _ in range(1000):
+            sketches.add('local', '10.0.0.1', (2024, 5, 15, 0))
+        sketches.add('unknown', '-', (2024, 5, 15, 0))
+
+        counts = sketches.get_counts()
+        self.assertEqual(counts['local'], 1)
+        self.assertAlmostEqual(counts['remote'], 100, delta=5)
+
+        hour_counts = sketches.get_hour_counts()
+        self.assertEqual(set(hour_counts), {(2024, 5, 15, 0), (2024, 5, 15, 1)})
+        self.assertEqual(hour_counts[(2024, 5, 15, 1)]['local'], 0)
+        for counts in hour_counts.values():
+            self.assertAlmostEqual(counts['remote'], 50, delta=5)
+
+        deserialized = cardinality.DistinctIpSketches.deserialize(sketches.serialize())
+        self.assertEqual(deserialized, sketches)
+        self.assertEqual(pickle.loads(pickle.dumps(sketches)), sketches)
+
+    def test_merge_distinct_ip_sketches(self):
+        first, second = cardinality.DistinctIpSketches(), cardinality.DistinctIpSketches()
+        for i in range(100):
+            (first if i % 2 else second).add('remote', '200.0.0.%d' % i, (2024, 5, 15, i % 3))
+        first.merge(second)
+        self.assertAlmostEqual(first.get_counts()['remote'], 100, delta=5)
+        self.assertAlmostEqual(sum(c['remote'] for c in first.get_hour_counts().values()), 100, delta=10)
+
+
+if __name__ == '__main__':
+    unittest.main()
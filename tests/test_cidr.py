@@ -0,0 +1,76 @@
+import json
+import os
+import tempfile
+import unittest
+
+from scielo_log_validator import cidr, validator
+
+
+class TestCidr(unittest.TestCase):
+
+    def setUp(self):
+        self.table = cidr.CidrTable({
+            '0.0.0.0/0': 'remote',
+            '200.136.72.0/21': 'proxy',
+            '200.136.74.0/24': 'local',
+            '10.0.0.0/8': 'local',
+            '66.249.64.0/19': 'unknown',
+            '2001:db8::/32': 'proxy',
+            '2001:db8:1::/48': 'local',
+        })
+
+    def tearDown(self):
+        cidr.set_default_cidr_table(None)
+
+    def test_lookup_longest_block(self):
+        self.assertEqual(self.table.lookup('200.136.73.1'), 'proxy')
+        self.assertEqual(self.table.lookup('200.136.74.1'), 'local')
+        self.assertEqual(self.table.lookup('200.136.80.1'), 'remote')
+        self.assertEqual(self.table.lookup('10.255.0.1'), 'local')
+        self.assertEqual(self.table.lookup('66.249.95.255'), 'unknown')
+        self.assertEqual(self.table.lookup('66.249.96.0'), 'remote')
+
+    def test_lookup_ipv6(self):
+        self.assertEqual(self.table.lookup('2001:db8::1'), 'proxy')
+        self.assertEqual(self.table.lookup('2001:db8:1::1'), 'local')
+        self.assertIsNone(self.table.lookup('2001:db9::1'))
+
+    def test_lookup_invalid_address(self):
+        self.assertIsNone(self.table.lookup('not an address'))
+        self.assertIsNone(self.table.lookup('300.1.1.1'))
+
+    def test_lookup_matches_ipaddress(self):
+        from ipaddress import ip_address, ip_network
+
+        networks = [(ip_network(block), label) for block, label in self.table.blocks.items()]
+        for ip in ['200.136.%d.%d' % (i, j) for i in range(70, 80) for j in (0, 128, 255)]:
+            containing = [(n.prefixlen, label) for n, label in networks if n.version == 4 and ip_address(ip) in n]
+            self.assertEqual(self.table.lookup(ip), max(containing)[1])
+
+    def test_get_ip_type_with_table(self):
+        self.assertEqual(validator.get_ip_type('200.136.74.1', self.table), 'local')
+        self.assertEqual(validator.get_ip_type('200.136.73.1', self.table), 'unknown')
+        self.assertEqual(validator.get_ip_type('2001:db9::1', self.table), 'remote')
+        self.assertEqual(validator.get_ip_type('8.8.8.8', cidr.CidrTable({})), 'remote')
+
+    def test_proxy_address_falls_back_to_ip_list(self):
+        line = '45.65.189.47 45.65.189.47, 198.41.230.129 - [15/Sep/2024:00:00:16 -0300] "GET / HTTP/1.1" 304 166 "-" "Mozilla/5.0"'
+        self.assertEqual(validator.parse_log_line(line)[0], 'remote')
+
+        cidr.set_default_cidr_table(cidr.CidrTable({'45.65.189.0/24': 'local'}))
+        self.assertEqual(validator.parse_log_line(line)[0], 'local')
+
+        cidr.set_default_cidr_table(cidr.CidrTable({'45.65.189.0/24': 'proxy', '198.41.128.0/17': 'local'}))
+        self.assertEqual(validator.parse_log_line(line)[0], 'local')
+
+    def test_load_cidr_table(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, 'cidr.json')
+            with open(path, 'w') as fout:
+                json.dump({'10.0.0.0/8': 'proxy'}, fout)
+            self.assertEqual(cidr.load_cidr_table(path).lookup('10.1.2.3'), 'proxy')
+
+            with open(path, 'w') as fout:
+                json.dump({'10.0.0.0/8': 'cdn'}, fout)
+            with self.assertRaises(ValueError):
+                cidr.load_cidr_table(path)
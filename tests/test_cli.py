@@ -0,0 +1,45 @@
+from contextlib import redirect_stderr, redirect_stdout
+from unittest import mock
+
+import io
+import unittest
+
+from scielo_log_validator import cli, validator
+
+
+class TestCli(unittest.TestCase):
+
+    def setUp(self):
+        self.log_file = 'tests/fixtures/logs/scielo.cl/2024-05-15_scielo.cl.log.gz'
+
+    def run_main(self, *args):
+        stdout = io.StringIO()
+        with mock.patch('sys.argv', ['log_validator'] + list(args)), redirect_stdout(stdout), redirect_stderr(io.StringIO()):
+            cli.main()
+        return stdout.getvalue()
+
+    def test_main_validates_file(self):
+        output = self.run_main('-p', self.log_file)
+        self.assertIn(cli.COMMAND_LINE_SCRIPT_MESSAGE, output)
+        self.assertIn(self.log_file + '\n', output)
+        self.assertIn("'is_valid'", output)
+
+    def test_main_of_validator_runs_cli(self):
+        stdout = io.StringIO()
+        with mock.patch('sys.argv', ['log_validator', '-p', self.log_file]), redirect_stdout(stdout):
+            validator.main()
+        self.assertIn(self.log_file + '\n', stdout.getvalue())
+
+    def test_main_rejects_http_directory(self):
+        with self.assertRaises(SystemExit):
+            self.run_main('-p', 'http://127.0.0.1:1/logs/')
+
+    def test_build_validate_kwargs(self):
+        params = cli.build_parser().parse_args(['-p', self.log_file, '--no_mime_detection', '--byte_budget', '1000'])
+        kwargs = cli.build_validate_kwargs(params)
+        self.assertFalse(kwargs['detect_mime'])
+        self.assertEqual(kwargs['byte_budget'], 1000)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,111 @@
+import os
+import tempfile
+import unittest
+
+from datetime import datetime
+
+from scielo_log_validator import columnar, validator
+
+
+FIXTURES_DIR = 'tests/fixtures/logs'
+
+
+def build_results(collection, probably_date, datetimes, is_valid=True):
+    return {
+        'path': {'collection': collection, 'date': probably_date.strftime('%Y-%m-%d')},
+        'content': {'summary': {
+            'ips': {'local': 1, 'remote': 9},
+            'datetimes': datetimes,
+            'invalid_lines': 2,
+            'total_lines': 12,
+        }},
+        'is_valid': {'ips': is_valid, 'dates': is_valid, 'all': is_valid},
+        'probably_date': probably_date,
+    }
+
+
+class TestColumnarStore(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.root = self.tmp_dir.name
+        with columnar.ColumnarStore(self.root, flush_files=2) as store:
+            store.add('/logs/2024-05-15_scielo.1.br.log.gz', build_results('scl', datetime(2024, 5, 15), {(2024, 5, 15, 0): 4, (2024, 5, 15, 1): 6}))
+            store.add('/logs/2024-05-15_scielo.2.br.log.gz', build_results('scl', datetime(2024, 5, 15), {(2024, 5, 15, 1): 10}, is_valid=False))
+            store.add('/logs/2024-06-01_scielo.1.br.log.gz', build_results('scl', datetime(2024, 6, 1), {(2024, 6, 1, 0): 10}))
+            store.add('/logs/2024-05-16_scielo.cl.log.gz', build_results('chl', datetime(2024, 5, 16), {(2024, 5, 16, 2): 10}))
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_files_are_partitioned_by_collection_and_month(self):
+        store = columnar.ColumnarStore(self.root)
+        self.assertEqual(list(store.iter_partitions()), [('chl', '2024-05'), ('scl', '2024-05'), ('scl', '2024-06')])
+        self.assertEqual(list(store.iter_partitions(collections=['scl'], months=['2024-06'])), [('scl', '2024-06')])
+
+    def test_load_round_trip(self):
+        partition = columnar.ColumnarStore(self.root).load('scl', '2024-05')
+        self.assertEqual(len(partition), 2)
+        self.assertEqual(partition.servers, ['_scielo.1.br', '_scielo.2.br'])
+        self.assertEqual(list(partition.files['server']), [0, 1])
+        self.assertEqual(list(partition.files['day']), [15, 15])
+        self.assertEqual([columnar.STATUSES[s] for s in partition.files['status']], ['valid', 'invalid'])
+        self.assertEqual(list(partition.files['remote_ips']), [9, 9])
+        self.assertEqual(list(partition.hours['file']), [0, 0, 1])
+        self.assertEqual(list(partition.hours['hour']), [0, 1, 1])
+        self.assertEqual(list(partition.hours['lines']), [4, 6, 10])
+        self.assertEqual(partition.get_paths(), ['/logs/2024-05-15_scielo.1.br.log.gz', '/logs/2024-05-15_scielo.2.br.log.gz'])
+
+    def test_appending_keeps_existing_rows(self):
+        with columnar.ColumnarStore(self.root) as store:
+            store.add('/logs/2024-05-16_scielo.1.br.log.gz', build_results('scl', datetime(2024, 5, 16), {(2024, 5, 16, 5): 3}))
+
+        partition = columnar.ColumnarStore(self.root).load('scl', '2024-05')
+        self.assertEqual(partition.servers, ['_scielo.1.br', '_scielo.2.br'])
+        self.assertEqual(list(partition.files['server']), [0, 1, 0])
+        self.assertEqual(list(partition.hours['file']), [0, 0, 1, 2])
+
+    def test_partial_writes_are_left_out_and_repaired(self):
+        path = os.path.join(self.root, 'scl', '2024-05')
+        # Simulate a write interrupted after the hours and part of the files columns of a new file
+        for name, value in (('hours.file', b'\x02\x00\x00\x00'), ('files.day', b'\x10')):
+            with open(os.path.join(path, name), 'ab') as fout:
+                fout.write(value)
+
+        store = columnar.ColumnarStore(self.root)
+        partition = store.load('scl', '2024-05')
+        self.assertEqual(len(partition), 2)
+        self.assertEqual(list(partition.hours['file']), [0, 0, 1])
+
+        with store:
+            store.add('/logs/2024-05-16_scielo.1.br.log.gz', build_results('scl', datetime(2024, 5, 16), {(2024, 5, 16, 5): 3}))
+        partition = store.load('scl', '2024-05')
+        self.assertEqual(list(partition.files['day']), [15, 15, 16])
+        self.assertEqual(list(partition.hours['file']), [0, 0, 1, 2])
+        self.assertEqual(list(partition.hours['hour']), [0, 1, 1, 5])
+
+    def test_get_hour_counts_adds_up_the_files_of_each_server(self):
+        counts = columnar.ColumnarStore(self.root).get_hour_counts(collections=['scl'])
+        self.assertEqual(counts[('scl', '_scielo.1.br')], {(2024, 5, 15, 0): 4, (2024, 5, 15, 1): 6, (2024, 6, 1, 0): 10})
+        self.assertEqual(counts[('scl', '_scielo.2.br')], {(2024, 5, 15, 1): 10})
+
+    def test_find_silent_hours(self):
+        counts = columnar.ColumnarStore(self.root).get_hour_counts(months=['2024-05'])
+        silent = columnar.find_silent_hours(counts, datetime(2024, 5, 15, 0), datetime(2024, 5, 15, 2))
+        self.assertEqual(silent[('scl', '_scielo.1.br')], [(2024, 5, 15, 2)])
+        self.assertEqual(silent[('scl', '_scielo.2.br')], [(2024, 5, 15, 0), (2024, 5, 15, 2)])
+        self.assertEqual(silent[('chl', '_scielo.cl')], [(2024, 5, 15, 0), (2024, 5, 15, 1), (2024, 5, 15, 2)])
+
+    def test_add_validated_files(self):
+        paths = sorted(os.path.join(root, f) for root, _, files in os.walk(FIXTURES_DIR) for f in files)
+        with columnar.ColumnarStore(self.root) as store:
+            for path in paths:
+                store.add(path, validator.pipeline_validate(path, sample_size=0.1))
+
+        store = columnar.ColumnarStore(self.root)
+        rows = sum(len(store.load(c, m)) for c, m in store.iter_partitions())
+        self.assertEqual(rows, len(paths) + 4)
+
+
+if __name__ == '__main__':
+    unittest.main()
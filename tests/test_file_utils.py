@@ -1,6 +1,15 @@
+import bz2
+import gzip
+import io
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
 import unittest
 
-from scielo_log_validator import file_utils
+from scielo_log_validator import exceptions, file_utils
 
 
 class TestFileUtils(unittest.TestCase):
@@ -28,6 +37,66 @@ class TestFileUtils(unittest.TestCase):
         log_file_collection = file_utils.extract_collection_from_path(path_to_non_existing_file)
         self.assertIsNone(log_file_collection)
 
+    def test_extract_file_identifier_from_path_is_valid(self):
+        self.assertEqual(file_utils.extract_file_identifier_from_path(self.log_file), '_caribbean.scielo.org.1')
+
+    def test_extract_file_identifier_from_path_is_none(self):
+        self.assertIsNone(file_utils.extract_file_identifier_from_path('/path/to/nothing'))
+
+    def test_extract_collection_from_path_prefers_longest_identifier(self):
+        collection_identifiers = {'_scielo.sp': 'abc', '_scielo.sp.1': 'ssp'}
+        path = '/logs/2024-02-20_scielo.sp.1.log.gz'
+        self.assertEqual(file_utils.extract_collection_from_path(path, collection_identifiers), 'ssp')
+        self.assertEqual(file_utils.extract_collection_from_path(path, dict(reversed(collection_identifiers.items()))), 'ssp')
+
+    def test_build_trie_pattern(self):
+        self.assertEqual(file_utils.build_trie_pattern(['_scielo.pe', '_scielo.pepsic', '_scielo.py']), r'_scielo\.p(?:e(?:psic)?|y)')
+        self.assertEqual(file_utils.build_trie_pattern([]), '')
+
+    def test_collection_matcher_finds_overlapping_identifiers(self):
+        # The longer identifier starts inside the shorter one, after which a non-overlapping search would resume
+        matcher = file_utils.CollectionMatcher({'_scielo.sp': 'abc', 'scielo.sp.1': 'ssp'})
+        self.assertEqual(matcher.match('2024-05-15_scielo.sp.1.log.gz'), 'scielo.sp.1')
+        self.assertEqual(matcher.get_collection('2024-05-15_scielo.sp.1.log.gz'), 'ssp')
+        self.assertEqual(matcher.match('2024-05-15_scielo.sp.log.gz'), '_scielo.sp')
+
+    def test_extract_collection_from_path_ignores_directories(self):
+        path = '/logs/_scielo.cl/invalid_file_name.log.gz'
+        self.assertIsNone(file_utils.extract_collection_from_path(path))
+
+    def test_extract_collection_from_path_with_matcher(self):
+        matcher = file_utils.CollectionMatcher({'_caribbean.scielo.org.1': 'wid'})
+        self.assertEqual(file_utils.extract_collection_from_path(self.log_file, matcher), 'wid')
+        self.assertIsNone(file_utils.CollectionMatcher({}).match(self.log_file))
+
+    def test_load_collection_identifiers_extends_defaults(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            config_path = os.path.join(tmp_dir, 'collections.json')
+            with open(config_path, 'w') as fout:
+                json.dump({'_scielo.new': 'new'}, fout)
+            collection_identifiers = file_utils.load_collection_identifiers(config_path)
+
+        self.assertEqual(collection_identifiers['_scielo.new'], 'new')
+        self.assertEqual(collection_identifiers['_scielo.cl'], 'chl')
+        self.assertEqual(file_utils.extract_collection_from_path('2024-02-20_scielo.new.log.gz', collection_identifiers), 'new')
+
+    def test_load_collection_identifiers_raises_exception(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            config_path = os.path.join(tmp_dir, 'collections.json')
+            with open(config_path, 'w') as fout:
+                json.dump(['_scielo.new'], fout)
+            with self.assertRaises(ValueError):
+                file_utils.load_collection_identifiers(config_path)
+
+    def test_set_default_collection_identifiers(self):
+        default_matcher = file_utils.get_default_collection_matcher()
+        try:
+            file_utils.set_default_collection_identifiers({'_scielo.new': 'new'})
+            self.assertEqual(file_utils.extract_collection_from_path('2024-02-20_scielo.new.log.gz'), 'new')
+            self.assertIsNone(file_utils.extract_collection_from_path(self.log_file))
+        finally:
+            file_utils._default_collection_matcher = default_matcher
+
     def test_extract_file_extension_from_path_is_gz(self):
         self.assertEqual(file_utils.extract_file_extension_from_path(self.log_file), '.gz')
 
@@ -54,3 +123,110 @@ class TestFileUtils(unittest.TestCase):
 
     def test_has_paperboy_format_results_false(self):
         self.assertFalse(file_utils.has_paperboy_format(self.log_file_invalid_name))
+
+    def test_iter_line_batches_splits_blocks_into_lines(self):
+        fin = io.BytesIO(b'first line\nsecond line\nthird line')
+        batches = list(file_utils.iter_line_batches(fin, block_size=7))
+        self.assertEqual([line for batch in batches for line in batch], [b'first line', b'second line', b'third line'])
+
+    def test_iter_line_batches_in_text_mode(self):
+        fin = io.StringIO('first line\nsecond line\n')
+        self.assertEqual(list(file_utils.iter_line_batches(fin)), [['first line', 'second line']])
+
+    def test_iter_line_batches_threaded_yields_same_lines(self):
+        with file_utils.open_file(self.log_file) as fin:
+            expected = [line for batch in file_utils.iter_line_batches(fin, block_size=4096) for line in batch]
+        with file_utils.open_file(self.log_file) as fin:
+            obtained = [line for batch in file_utils.iter_line_batches_threaded(fin, block_size=4096, queue_depth=2) for line in batch]
+        self.assertEqual(len(obtained), 7160)
+        self.assertEqual(obtained, expected)
+
+    def test_iter_line_batches_threaded_raises_reader_errors(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            truncated_path = os.path.join(tmp_dir, 'truncated.log.gz')
+            with open(self.log_file, 'rb') as fin, open(truncated_path, 'wb') as fout:
+                fout.write(fin.read()[:20000])
+
+            with gzip.open(truncated_path) as fin:
+                with self.assertRaises(EOFError):
+                    for _ in file_utils.iter_line_batches_threaded(fin, block_size=4096):
+                        pass
+
+    def test_iter_line_batches_threaded_stops_early(self):
+        with file_utils.open_file(self.log_file) as fin:
+            batches = file_utils.iter_line_batches_threaded(fin, block_size=1024, queue_depth=1)
+            self.assertTrue(next(batches))
+            batches.close()
+
+    def test_find_external_decompressor(self):
+        external_decompressors = {'application/gzip': [['not-a-decompressor', '-dc'], ['gzip', '-dc']]}
+        self.assertEqual(file_utils.find_external_decompressor('application/gzip', external_decompressors), ['gzip', '-dc'])
+        self.assertIsNone(file_utils.find_external_decompressor('application/x-bzip2', external_decompressors))
+
+    def test_open_file_with_external_decompressor(self):
+        external_decompressors = {'application/gzip': [['gzip', '-dc']]}
+        with file_utils.open_file(self.log_file) as fin:
+            expected = fin.read()
+        with file_utils.open_file(self.log_file, use_external_decompressor=True, external_decompressors=external_decompressors) as fin:
+            self.assertIsInstance(fin.raw, file_utils.ExternalDecompressorReader)
+            self.assertEqual(fin.read(), expected)
+
+    def test_open_file_falls_back_to_in_process_decompressor(self):
+        external_decompressors = {'application/gzip': [['not-a-decompressor', '-dc']]}
+        with file_utils.open_file(self.log_file, use_external_decompressor=True, external_decompressors=external_decompressors) as fin:
+            self.assertEqual(sum(1 for _ in fin), 7160)
+
+    def test_open_file_with_external_decompressor_raises_truncated_error(self):
+        external_decompressors = {'application/gzip': [['gzip', '-dc']]}
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            truncated_path = os.path.join(tmp_dir, 'truncated.log.gz')
+            with open(self.log_file, 'rb') as fin, open(truncated_path, 'wb') as fout:
+                fout.write(fin.read()[:20000])
+
+            with self.assertRaises(exceptions.TruncatedLogFileError):
+                with file_utils.open_file(truncated_path, use_external_decompressor=True, external_decompressors=external_decompressors) as fin:
+                    fin.read()
+
+    def test_external_decompressor_writing_to_stderr_does_not_block(self):
+        # More than a pipe buffer of warnings is written before any output
+        command = [sys.executable, '-c', 'import gzip, sys; sys.stderr.write("warning\\n" * 100000); sys.stderr.flush(); sys.stdout.buffer.write(gzip.open(sys.argv[1]).read())']
+        with file_utils.open_file(self.log_file) as fin:
+            expected = fin.read()
+        with io.BufferedReader(file_utils.ExternalDecompressorReader(command, self.log_file)) as fin:
+            self.assertEqual(fin.read(), expected)
+
+    def test_open_file_closes_external_decompressor_early(self):
+        external_decompressors = {'application/gzip': [['gzip', '-dc']]}
+        with file_utils.open_file(self.log_file, use_external_decompressor=True, external_decompressors=external_decompressors) as fin:
+            self.assertTrue(fin.readline())
+        self.assertIsNotNone(fin.raw._process.returncode)
+
+    @unittest.skipUnless(shutil.which('zstd'), 'zstd is not available')
+    def test_open_file_zstd_with_external_decompressor(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, 'log.zst')
+            with file_utils.open_file(self.log_file) as fin, open(path + '.tmp', 'wb') as fout:
+                fout.write(fin.read())
+            subprocess.run(['zstd', '-q', path + '.tmp', '-o', path], check=True)
+
+            with self.assertRaises(exceptions.InvalidLogFileMimeError):
+                file_utils.open_file(path, use_external_decompressor=False)
+            with file_utils.open_file(path, use_external_decompressor=True) as fin:
+                self.assertEqual(sum(1 for _ in fin), 7160)
+
+    def test_open_stream_detects_compression(self):
+        with file_utils.open_file(self.log_file) as fin:
+            content = fin.read()
+
+        for compress in (gzip.compress, bz2.compress, lambda data: data):
+            mime, fin = file_utils.open_stream(io.BytesIO(compress(content)))
+            self.assertIn(mime, file_utils.DEFAULT_STREAM_MIME_HANDLERS)
+            self.assertEqual(fin.read(), content)
+
+    def test_open_stream_raises_empty_error(self):
+        with self.assertRaises(exceptions.LogFileIsEmptyError):
+            file_utils.open_stream(io.BytesIO(b''))
+
+    def test_open_stream_raises_invalid_mime_error(self):
+        with self.assertRaises(exceptions.InvalidLogFileMimeError):
+            file_utils.open_stream(io.BytesIO(b'%PDF-1.4\n' + bytes(range(256)) * 8))
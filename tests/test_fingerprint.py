@@ -0,0 +1,108 @@
+import gzip
+import os
+import shutil
+import tempfile
+import unittest
+
+from scielo_log_validator import fingerprint, validator
+
+
+class TestFingerprint(unittest.TestCase):
+
+    def setUp(self):
+        self.log_file_wi = 'tests/fixtures/logs/scielo.wi/2024-02-20_caribbean.scielo.org.1.log.gz'
+        self.log_file_cl = 'tests/fixtures/logs/scielo.cl/2024-09-15_scielo.cl.log.gz'
+        self.tmp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_compute_fingerprint_counts_lines(self):
+        for path in (self.log_file_wi, self.log_file_cl):
+            self.assertEqual(fingerprint.compute_fingerprint(path)['total_lines'], validator.get_total_lines(path))
+
+    def test_compute_fingerprint_counts_last_line_without_line_break(self):
+        path = os.path.join(self.tmp_dir, 'log.txt')
+        with open(path, 'w') as fout:
+            fout.write('first line\nsecond line')
+        self.assertEqual(fingerprint.compute_fingerprint(path)['total_lines'], 2)
+
+    def test_compute_fingerprint_ignores_compression(self):
+        path = os.path.join(self.tmp_dir, '2024-02-20_caribbean.scielo.org.2.log.gz')
+        with gzip.open(self.log_file_wi) as fin, gzip.open(path, 'wb', compresslevel=1) as fout:
+            fout.write(fin.read())
+        self.assertTrue(fingerprint.is_same_content(fingerprint.compute_fingerprint(path), fingerprint.compute_fingerprint(self.log_file_wi)))
+
+    def test_serialize_summary(self):
+        summary = {'datetimes': {(2024, 2, 21, 0): 22}, 'total_lines': 10}
+        self.assertEqual(fingerprint.deserialize_summary(fingerprint.serialize_summary(summary)), summary)
+
+    def test_pipeline_validate_reuses_summary_of_exact_duplicate(self):
+        index = fingerprint.FingerprintIndex()
+        copy_path = os.path.join(self.tmp_dir, '2024-02-20_caribbean.scielo.org.2.log.gz')
+        shutil.copy(self.log_file_wi, copy_path)
+
+        original_results = validator.pipeline_validate(self.log_file_wi, fingerprint_index=index)
+        self.assertNotIn('duplicate', original_results)
+
+        copy_results = validator.pipeline_validate(copy_path, fingerprint_index=index)
+        self.assertEqual(copy_results['duplicate'], {'exact': True, 'of': [self.log_file_wi]})
+        self.assertEqual(copy_results['content'], original_results['content'])
+        self.assertEqual(copy_results['is_valid'], original_results['is_valid'])
+
+    def test_pipeline_validate_reuses_summary_of_adaptive_sampling(self):
+        index = fingerprint.FingerprintIndex()
+        copy_path = os.path.join(self.tmp_dir, '2024-09-15_scielo.cl.log.gz')
+        shutil.copy(self.log_file_cl, copy_path)
+
+        original_results = validator.pipeline_validate(self.log_file_cl, fingerprint_index=index, adaptive_sampling=True)
+        self.assertIsInstance(original_results['content']['summary']['total_lines'], int)
+        self.assertEqual(index.entries[self.log_file_cl]['sample_size'], 'adaptive')
+
+        copy_results = validator.pipeline_validate(copy_path, fingerprint_index=index, adaptive_sampling=True, sample_size=0.5)
+        self.assertEqual(copy_results['duplicate'], {'exact': True, 'of': [self.log_file_cl]})
+        self.assertEqual(copy_results['content'], original_results['content'])
+
+    def test_pipeline_validate_detects_near_duplicate(self):
+        index = fingerprint.FingerprintIndex()
+        truncated_path = os.path.join(self.tmp_dir, '2024-02-20_caribbean.scielo.org.2.log.gz')
+        with gzip.open(self.log_file_wi) as fin, gzip.open(truncated_path, 'wb') as fout:
+            fout.writelines(fin.readlines()[:5000])
+
+        validator.pipeline_validate(self.log_file_wi, fingerprint_index=index)
+        results = validator.pipeline_validate(truncated_path, fingerprint_index=index)
+        self.assertEqual(results['duplicate'], {'exact': False, 'of': [self.log_file_wi]})
+        self.assertEqual(results['content']['summary']['total_lines'], 5000)
+
+    def test_pipeline_validate_counts_fingerprint_against_budget(self):
+        index = fingerprint.FingerprintIndex()
+        results = validator.pipeline_validate(self.log_file_wi, fingerprint_index=index, sample_size=1.0, byte_budget=100000)
+
+        summary = results['content']['summary']
+        self.assertEqual(summary['budget']['exceeded'], 'bytes')
+        self.assertLessEqual(summary['budget']['bytes_read'], 100000)
+        self.assertNotIn('duplicate', results)
+        self.assertEqual(index.entries, {})
+
+        # The analysis keeps its share of the budget, so the partial summary has the lines it parsed
+        self.assertGreater(summary['budget']['lines_read'], 0)
+        self.assertEqual(sum(summary['ips'].values()), summary['total_lines'])
+        self.assertGreater(summary['ips']['local'] + summary['ips']['remote'], 0)
+        self.assertNotEqual(results['probably_date'], {'error': 'Date dictionary is empty'})
+
+    def test_fingerprint_index_save_and_load(self):
+        index_path = os.path.join(self.tmp_dir, 'index.json')
+        index = fingerprint.FingerprintIndex(index_path)
+        validator.pipeline_validate(self.log_file_wi, fingerprint_index=index)
+        index.save()
+
+        loaded = fingerprint.FingerprintIndex(index_path)
+        self.assertEqual(loaded.entries, index.entries)
+        self.assertEqual(loaded.find_exact(fingerprint.compute_fingerprint(self.log_file_wi), 0.1), self.log_file_wi)
+        self.assertIsNone(loaded.find_exact(fingerprint.compute_fingerprint(self.log_file_wi), 1))
+
+    def test_pipeline_validate_with_invalid_file(self):
+        path = os.path.join(self.tmp_dir, 'empty.log')
+        open(path, 'w').close()
+        results = validator.pipeline_validate(path, fingerprint_index=fingerprint.FingerprintIndex())
+        self.assertEqual(results['content'], {'summary': {'total_lines': {'error': 'File is empty'}}})
@@ -0,0 +1,55 @@
+import random
+import unittest
+
+from scielo_log_validator import invalid_lines
+
+
+class TestInvalidLines(unittest.TestCase):
+
+    def test_categorize_invalid_line(self):
+        self.assertEqual(invalid_lines.categorize_invalid_line(b'200.0.0.1 - - [99/Foo/2024]', '200.0.0.1 - - [99/Foo/2024]', True), invalid_lines.INVALID_BAD_DATE)
+        self.assertEqual(invalid_lines.categorize_invalid_line(b'\xff\xfe garbage', ' garbage', False), invalid_lines.INVALID_UNDECODABLE)
+        self.assertEqual(invalid_lines.categorize_invalid_line(b'200.0.0.1 - - [15/May/2024:10:00:00 -0300] "GET /scielo', '200.0.0.1 - - [15/May/2024:10:00:00 -0300] "GET /scielo', False), invalid_lines.INVALID_TRUNCATED)
+        self.assertEqual(invalid_lines.categorize_invalid_line('hello world', 'hello world', False), invalid_lines.INVALID_NO_MATCH)
+
+    def test_reservoir_is_bounded_and_uniform(self):
+        counts = [0] * 100
+        for seed in range(300):
+            collector = invalid_lines.InvalidLineCollector(size=5, rng=random.Random(seed))
+            for i in range(100):
+                collector.add(b'line %d' % i, invalid_lines.INVALID_NO_MATCH, i + 1)
+            report = collector.get_report()
+            self.assertEqual(len(report['samples']), 5)
+            self.assertEqual(report['categories'][invalid_lines.INVALID_NO_MATCH], 100)
+            for sample in report['samples']:
+                counts[sample['line_number'] - 1] += 1
+
+        # Each line is kept with probability 5%, i.e., 15 times out of 300 on average
+        self.assertLess(max(counts), 40)
+        self.assertGreater(sum(counts[50:]), 500)
+
+    def test_offsets_are_only_computed_for_kept_lines(self):
+        computed = []
+
+        def get_offset(i):
+            computed.append(i)
+            return i * 10
+
+        collector = invalid_lines.InvalidLineCollector(size=3)
+        for i in range(1000):
+            collector.add('line %d' % i, invalid_lines.INVALID_NO_MATCH, i + 1, lambda i=i: get_offset(i))
+
+        self.assertLess(len(computed), 50)
+        for sample in collector.get_report()['samples']:
+            self.assertEqual(sample['offset'], (sample['line_number'] - 1) * 10)
+
+    def test_long_lines_are_cut(self):
+        collector = invalid_lines.InvalidLineCollector(size=1, max_length=10)
+        collector.add(b'\xff' + b'x' * 100, invalid_lines.INVALID_UNDECODABLE)
+        self.assertEqual(collector.get_report()['samples'], [
+            {'line_number': None, 'offset': None, 'category': invalid_lines.INVALID_UNDECODABLE, 'text': '\\xffxxxxxx'},
+        ])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,73 @@
+from unittest import mock
+
+import os
+import tempfile
+import time
+import unittest
+
+from scielo_log_validator import prefetch
+
+
+class TestPrefetch(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.paths = []
+        for i, size in enumerate([3000, 0, 5000, 7000, 2000]):
+            path = os.path.join(self.tmp_dir.name, '2024-05-%02d_scielo.cl.log' % (i + 1))
+            with open(path, 'wb') as fout:
+                fout.write(b'x' * size)
+            self.paths.append(path)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_iterates_over_all_paths_in_order(self):
+        paths = self.paths + [os.path.join(self.tmp_dir.name, 'missing.log')]
+        for files in (0, 1, 3, 10):
+            self.assertEqual(list(prefetch.Prefetcher(iter(paths), files=files)), paths)
+
+    def test_does_not_start_a_thread_without_prefetching(self):
+        prefetcher = prefetch.Prefetcher(self.paths, files=0)
+        for _ in prefetcher:
+            self.assertIsNone(prefetcher._thread)
+
+    def test_respects_byte_budget(self):
+        prefetcher = prefetch.Prefetcher(self.paths, files=3, max_bytes=8000)
+        for _ in prefetcher:
+            self.assertLessEqual(prefetcher.allocated_bytes, 8000)
+            self.assertLessEqual(len(prefetcher.window), 3)
+
+    def test_reads_next_files_ahead(self):
+        prefetcher = prefetch.Prefetcher(self.paths, files=2)
+        iterator = iter(prefetcher)
+        self.assertEqual(next(iterator), self.paths[0])
+
+        # The second path is empty, so the next files read ahead are the second and the third ones
+        deadline = time.monotonic() + 5
+        while prefetcher.prefetched_bytes < 5000 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        self.assertEqual(prefetcher.prefetched_bytes, 5000)
+
+        self.assertEqual(list(iterator), self.paths[1:])
+        self.assertIsNone(prefetcher._thread)
+
+    def test_drops_validated_files_from_cache(self):
+        with mock.patch.object(prefetch, 'drop_from_cache') as drop_from_cache:
+            iterator = iter(prefetch.Prefetcher(self.paths, files=1, drop_cache=True))
+            next(iterator)
+            drop_from_cache.assert_not_called()
+            list(iterator)
+        self.assertEqual([c.args[0] for c in drop_from_cache.call_args_list], self.paths)
+
+    def test_advise_remote_path(self):
+        self.assertFalse(prefetch.drop_from_cache('s3://logs/2024-05-15_scielo.cl.log.gz'))
+
+    @unittest.skipUnless(hasattr(os, 'posix_fadvise'), 'posix_fadvise is not available')
+    def test_drop_from_cache(self):
+        self.assertTrue(prefetch.drop_from_cache(self.paths[0]))
+        self.assertFalse(prefetch.drop_from_cache(os.path.join(self.tmp_dir.name, 'missing.log')))
+
+
+if __name__ == '__main__':
+    unittest.main()
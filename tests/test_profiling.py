@@ -0,0 +1,69 @@
+import json
+import os
+import pstats
+import tempfile
+import tracemalloc
+import unittest
+
+from scielo_log_validator import profiling, validator
+
+
+FIXTURES_DIR = 'tests/fixtures/logs'
+
+
+class TestFileProfiler(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.paths = sorted(os.path.join(root, f) for root, _, files in os.walk(FIXTURES_DIR) for f in files)[:3]
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_profile_returns_the_results(self):
+        profiler = profiling.FileProfiler(self.tmp_dir.name, min_seconds=1000)
+        for path in self.paths:
+            self.assertEqual(validator.pipeline_validate(path, profiler=profiler), validator.pipeline_validate(path))
+
+        summary = profiler.get_summary(limit=5)
+        self.assertEqual(summary['files'], len(self.paths))
+        self.assertEqual(summary['slow_files'], [])
+        self.assertEqual(len(summary['top_functions']), 5)
+        self.assertEqual(os.listdir(self.tmp_dir.name), [])
+
+    def test_profiles_of_slow_files_are_written(self):
+        profiler = profiling.FileProfiler(self.tmp_dir.name, min_seconds=0, trace_memory=True)
+        validator.pipeline_validate(self.paths[0], sample_size=0.5, profiler=profiler)
+        self.assertFalse(tracemalloc.is_tracing())
+
+        slow_file, = profiler.slow_files
+        self.assertEqual(slow_file['path'], self.paths[0])
+        self.assertGreater(slow_file['peak_memory'], 0)
+        self.assertTrue(pstats.Stats(slow_file['profile']).total_calls > 0)
+        self.assertIsInstance(tracemalloc.Snapshot.load(slow_file['allocations']), tracemalloc.Snapshot)
+
+    def test_top_functions_are_added_up_over_files(self):
+        profiler = profiling.FileProfiler(self.tmp_dir.name, min_seconds=1000)
+        for path in self.paths:
+            validator.pipeline_validate(path, profiler=profiler)
+
+        top_functions = {f['function']: f for f in profiler.get_top_functions(limit=1000)}
+        name, = [f for f in top_functions if f.endswith('(pipeline_validate)')]
+        self.assertEqual(top_functions[name]['calls'], len(self.paths))
+        self.assertEqual(
+            [f['total_time'] for f in profiler.get_top_functions()],
+            sorted((f['total_time'] for f in profiler.get_top_functions()), reverse=True))
+
+    def test_save_summary(self):
+        profiler = profiling.FileProfiler(self.tmp_dir.name, min_seconds=0)
+        with open(self.paths[0], 'rb') as fin:
+            validator.pipeline_validate_stream(fin, name=os.path.basename(self.paths[0]), profiler=profiler)
+
+        with open(profiler.save_summary()) as fin:
+            summary = json.load(fin)
+        self.assertEqual(summary['files'], 1)
+        self.assertTrue(os.path.exists(summary['slow_files'][0]['profile']))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,72 @@
+import random
+import unittest
+
+from scielo_log_validator import sampling
+
+
+class TestSampling(unittest.TestCase):
+
+    def test_get_z_score(self):
+        self.assertAlmostEqual(sampling.get_z_score(0.95), 1.96, places=2)
+
+    def test_compute_margin_is_zero_for_full_sample(self):
+        self.assertEqual(sampling.compute_margin(50, 100, 100), 0.0)
+
+    def test_compute_margin_decreases_with_sample_size(self):
+        small = sampling.compute_margin(500, 1000, 10 ** 7)
+        large = sampling.compute_margin(5000, 10000, 10 ** 7)
+        self.assertAlmostEqual(small, 0.031, places=3)
+        self.assertLess(large, small)
+
+    def test_compute_margin_does_not_collapse_for_uniform_sample(self):
+        self.assertGreater(sampling.compute_margin(1000, 1000, 10 ** 7), 0.0)
+
+    def test_compute_required_sample_size(self):
+        # Worst case at a 1 percentage point margin with 95% confidence
+        self.assertAlmostEqual(sampling.compute_required_sample_size(500, 1000, 10 ** 9), 9604, delta=5)
+        # Skewed proportions need fewer lines
+        self.assertLess(sampling.compute_required_sample_size(990, 1000, 10 ** 9), 1000)
+        # Small files need fewer lines than large ones, and never more than every line
+        self.assertLess(sampling.compute_required_sample_size(500, 1000, 2000), 2000)
+        self.assertEqual(sampling.compute_required_sample_size(500, 1000, 10, margin=0.0001), 10)
+
+    def test_get_dominant_day(self):
+        datetimes = {(2024, 5, 15, 0): 10, (2024, 5, 15, 1): 10, (2024, 5, 16, 0): 15}
+        self.assertEqual(sampling.get_dominant_day(datetimes), ((2024, 5, 15), 20))
+        self.assertEqual(sampling.get_dominant_day({}), (None, 0))
+
+    def test_get_error_bounds(self):
+        summary = {
+            'ips': {'local': 250, 'remote': 750, 'unknown': 0},
+            'datetimes': {(2024, 5, 15, 0): 900, (2024, 5, 16, 0): 100},
+        }
+        bounds = sampling.get_error_bounds(summary, 10 ** 6)
+        self.assertEqual(bounds['sample_lines'], 1000)
+        self.assertEqual(bounds['remote_ratio']['estimate'], 0.75)
+        self.assertEqual(bounds['dominant_day']['date'], '2024-05-15')
+        self.assertEqual(bounds['dominant_day']['share'], 0.9)
+        self.assertLess(bounds['dominant_day']['margin'], bounds['remote_ratio']['margin'])
+
+    def test_reservoir_sampler_keeps_every_line_of_short_sequences(self):
+        reservoir = sampling.ReservoirSampler(10, random.Random(0))
+        reservoir.add_batch(list(range(4)))
+        reservoir.add_batch(list(range(4, 7)))
+        self.assertEqual(reservoir.lines, list(range(7)))
+        self.assertEqual(reservoir.positions, list(range(7)))
+        self.assertEqual(reservoir.line_counter, 7)
+
+    def test_reservoir_sampler_is_uniform(self):
+        rng = random.Random(0)
+        counts = [0] * 10
+        for _ in range(2000):
+            reservoir = sampling.ReservoirSampler(2, rng)
+            for start in range(0, 1000, 100):
+                reservoir.add_batch(list(range(start, start + 100)))
+            self.assertEqual(len(set(reservoir.lines)), 2)
+            self.assertEqual(reservoir.positions, reservoir.lines)
+            for line in reservoir.lines:
+                counts[line // 100] += 1
+
+        # Each tenth of the sequence holds about a tenth of the 4000 sampled lines
+        for count in counts:
+            self.assertAlmostEqual(count, 400, delta=80)
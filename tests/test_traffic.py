@@ -0,0 +1,110 @@
+import os
+import tempfile
+import unittest
+
+from scielo_log_validator import traffic, validator
+
+
+# A daily profile with less traffic at night
+DAILY_HOURS = [20, 10, 10, 10, 10, 20, 40, 60, 80, 90, 100, 100, 90, 90, 100, 100, 90, 80, 70, 60, 50, 40, 30, 20]
+
+
+def build_datetimes(hours, day=15):
+    return {(2024, 5, day, hour): count for hour, count in enumerate(hours) if count}
+
+
+class TestTraffic(unittest.TestCase):
+
+    def setUp(self):
+        self.log_file_wi = 'tests/fixtures/logs/scielo.wi/2024-02-20_caribbean.scielo.org.1.log.gz'
+
+    def test_get_hour_histogram(self):
+        datetimes = {(2024, 5, 15, 23): 2, (2024, 5, 16, 0): 3, (2024, 5, 16, 23): 4}
+        histogram = traffic.get_hour_histogram(datetimes)
+        self.assertEqual(len(histogram), 24)
+        self.assertEqual(histogram[0], 3)
+        self.assertEqual(histogram[23], 6)
+
+    def test_find_gaps(self):
+        hours = list(DAILY_HOURS)
+        baseline_shares = traffic.get_shares(hours)
+        hours[10] = 0
+        self.assertEqual(traffic.find_gaps(hours, baseline_shares), [10])
+
+    def test_find_gaps_ignores_hours_without_expected_traffic(self):
+        hours = list(DAILY_HOURS)
+        hours[3] = 0
+        baseline_shares = traffic.get_shares(hours)
+        self.assertEqual(traffic.find_gaps(hours, baseline_shares), [])
+
+    def test_is_flat(self):
+        self.assertTrue(traffic.is_flat([100] * 24))
+        self.assertFalse(traffic.is_flat(DAILY_HOURS))
+        self.assertFalse(traffic.is_flat([1] * 24))
+
+    def test_analyze_traffic_profile_compares_with_baseline(self):
+        baseline = traffic.TrafficBaseline()
+        for _ in range(traffic.MIN_BASELINE_FILES):
+            baseline.learn('scl', DAILY_HOURS)
+
+        profile = traffic.analyze_traffic_profile(build_datetimes(DAILY_HOURS), baseline.get('scl'))
+        self.assertAlmostEqual(profile['distance'], 0.0)
+        self.assertFalse(profile['anomalous'])
+
+        shifted = DAILY_HOURS[12:] + DAILY_HOURS[:12]
+        profile = traffic.analyze_traffic_profile(build_datetimes(shifted), baseline.get('scl'))
+        self.assertGreater(profile['distance'], traffic.MAX_PROFILE_DISTANCE)
+        self.assertTrue(profile['anomalous'])
+
+    def test_baseline_forms_for_collections_with_quiet_hours(self):
+        baseline = traffic.TrafficBaseline()
+        quiet_hours = list(DAILY_HOURS)
+        quiet_hours[3] = 0
+        for day in range(1, traffic.MIN_BASELINE_FILES + 2):
+            results = {'path': {'collection': 'scl'}, 'content': {'summary': {'datetimes': build_datetimes(quiet_hours, day)}}}
+            profile = validator.validate_traffic_profile('2024-05-%02d_scielo.1.br.log.gz' % day, results, baseline)
+            self.assertEqual(profile['gaps'], [])
+            self.assertFalse(profile['anomalous'])
+
+        self.assertEqual(baseline.get('scl')['files'], traffic.MIN_BASELINE_FILES + 1)
+
+        # Once the baseline is formed, an hour it expects traffic in is a gap
+        outage_hours = list(quiet_hours)
+        outage_hours[10] = 0
+        profile = traffic.analyze_traffic_profile(build_datetimes(outage_hours, 20), baseline.get('scl'))
+        self.assertEqual(profile['gaps'], [10])
+
+    def test_analyze_traffic_profile_detects_duplicates(self):
+        baseline = traffic.TrafficBaseline()
+        datetimes = build_datetimes(DAILY_HOURS)
+        baseline.remember('scl', traffic.get_profile_fingerprint(datetimes), '2024-05-15_scielo.1.br.log.gz')
+
+        profile = traffic.analyze_traffic_profile(datetimes, baseline.get('scl'), '2024-05-15_scielo.2.br.log.gz')
+        self.assertEqual(profile['duplicate_of'], '2024-05-15_scielo.1.br.log.gz')
+        self.assertTrue(profile['anomalous'])
+
+        profile = traffic.analyze_traffic_profile(datetimes, baseline.get('scl'), '2024-05-15_scielo.1.br.log.gz')
+        self.assertIsNone(profile['duplicate_of'])
+
+    def test_traffic_baseline_save_and_load(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            baseline_path = os.path.join(tmp_dir, 'baseline.json')
+            baseline = traffic.TrafficBaseline(baseline_path)
+            baseline.learn('scl', DAILY_HOURS)
+            baseline.remember('scl', 'abc', 'file.log.gz')
+            baseline.save()
+
+            loaded = traffic.TrafficBaseline(baseline_path)
+            self.assertEqual(loaded.get('scl')['files'], 1)
+            self.assertEqual(loaded.get('scl')['fingerprints'], {'abc': 'file.log.gz'})
+
+    def test_pipeline_validate_with_traffic_baseline(self):
+        baseline = traffic.TrafficBaseline()
+        results = validator.pipeline_validate(self.log_file_wi, traffic_baseline=baseline)
+        self.assertEqual(sum(results['traffic']['hours']), 7160 // 10)
+        self.assertEqual(results['traffic']['gaps'], [])
+        self.assertEqual(baseline.get('wid')['files'], 1)
+
+        results = validator.pipeline_validate(self.log_file_wi, traffic_baseline=baseline)
+        self.assertIsNone(results['traffic']['duplicate_of'])
+        self.assertEqual(baseline.get('wid')['files'], 1)
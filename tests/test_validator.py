@@ -1,9 +1,23 @@
 import datetime
+import gzip
+import io
+import os
+import tempfile
+import tracemalloc
 import unittest
 
 from scielo_log_validator import validator
 
 
+def write_generated_log(path, total_lines):
+    with gzip.open(path, 'wt') as fout:
+        for i in range(total_lines):
+            fout.write(
+                '200.%d.%d.%d - - [15/May/2024:%02d:%02d:%02d -0300] "GET /scielo.php?pid=%d HTTP/1.1" 200 %d "-" "Mozilla/5.0"\n'
+                % ((i >> 16) % 256, (i >> 8) % 256, i % 256, (i // 3600) % 24, (i // 60) % 60, i % 60, i, i % 5000)
+            )
+
+
 class TestValidator(unittest.TestCase):
 
     def setUp(self):
@@ -390,4 +404,271 @@ class TestValidator(unittest.TestCase):
             'probably_date': datetime.datetime(2024, 12, 10, 0, 0)
         }
 
-        self.assertDictEqual(results, expected)
\ No newline at end of file
+        self.assertDictEqual(results, expected)
+
+    def test_analyze_log_content_peak_memory_is_independent_of_file_size(self):
+        peaks = []
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            for total_lines in (10000, 100000):
+                path = os.path.join(tmp_dir, '2024-05-15_scielo.cl.%d.log.gz' % total_lines)
+                write_generated_log(path, total_lines)
+
+                tracemalloc.start()
+                summary = validator.analyze_log_content(path, total_lines, int(total_lines * 0.1))
+                _, peak = tracemalloc.get_traced_memory()
+                tracemalloc.stop()
+
+                self.assertEqual(sum(summary['ips'].values()), int(total_lines * 0.1))
+                peaks.append(peak)
+
+        # A tenfold larger file must not need noticeably more memory to be sampled
+        self.assertLess(peaks[1], peaks[0] * 1.5)
+
+    def test_analyze_log_content_with_reader_thread(self):
+        path = self.log_file_cl_2_list_pattern
+        total_lines = validator.get_total_lines(path)
+        expected = validator.analyze_log_content(path, total_lines, total_lines)
+        obtained = validator.analyze_log_content(path, total_lines, total_lines, block_size=512, queue_depth=2)
+        self.assertDictEqual(obtained, expected)
+
+    def test_get_execution_mode_is_stream(self):
+        exec_mode = validator.get_execution_mode('-')
+        self.assertEqual(exec_mode, 'validate-stream')
+
+    def test_pipeline_validate_stream_matches_pipeline_validate(self):
+        path = self.log_file_cl_1_default_pattern
+        expected = validator.pipeline_validate(path, sample_size=1.0)
+        with open(path, 'rb') as fin:
+            obtained = validator.pipeline_validate_stream(fin, name=path, sample_size=1.0)
+        self.assertDictEqual(obtained, expected)
+
+    def test_pipeline_validate_stream_without_name(self):
+        with open(self.log_file_wi_1_invalid_content, 'rb') as fin:
+            results = validator.pipeline_validate_stream(fin)
+        self.assertNotIn('path', results)
+        self.assertFalse(results['mode']['path_validation'])
+        self.assertFalse(results['is_valid']['all'])
+
+    def test_validate_stream_of_truncated_file(self):
+        with open(self.log_file_cl_2_list_pattern, 'rb') as fin:
+            data = fin.read()
+        _, results = validator.validate_stream(io.BytesIO(data[:len(data) // 2]))
+        self.assertDictEqual(results, {'summary': {'total_lines': {'error': 'File is truncated'}}})
+
+    def test_analyze_log_stream_samples_large_streams(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, '2024-05-15_scielo.cl.log.gz')
+            write_generated_log(path, 20000)
+            with gzip.open(path, 'rb') as fin:
+                summary = validator.analyze_log_stream(fin, sample_size=0.1)
+
+        self.assertEqual(summary['total_lines'], 20000)
+        self.assertEqual(sum(summary['ips'].values()), 2000)
+
+    def test_analyze_log_content_adaptive_evaluates_small_files_fully(self):
+        path = self.log_file_cl_2_list_pattern
+        total_lines = validator.get_total_lines(path)
+        expected = validator.analyze_log_content(path, total_lines, total_lines)
+        summary = validator.analyze_log_content_adaptive(path)
+        bounds = summary.pop('sampling')
+        self.assertDictEqual(summary, expected)
+        self.assertEqual(bounds['sample_lines'], total_lines)
+        self.assertEqual(bounds['remote_ratio']['margin'], 0.0)
+
+    def test_analyze_log_content_adaptive_reaches_target_margin(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, '2024-05-15_scielo.cl.log.gz')
+            write_generated_log(path, 50000)
+            with gzip.open(path, 'at') as fout:
+                for i in range(50000):
+                    fout.write('10.0.%d.%d - - [16/May/2024:10:00:00 -0300] "GET / HTTP/1.1" 200 1 "-" "-"\n' % ((i >> 8) % 256, i % 256))
+
+            summary = validator.analyze_log_content_adaptive(path, margin=0.02)
+            total_lines = validator.get_total_lines(path)
+            same_summary = validator.analyze_log_content_adaptive(path, total_lines=total_lines, margin=0.02)
+
+        bounds = summary['sampling']
+        self.assertEqual(summary['total_lines'], 100000)
+        self.assertLess(bounds['sample_lines'], 5000)
+        self.assertLessEqual(bounds['remote_ratio']['margin'], 0.02)
+        self.assertAlmostEqual(bounds['remote_ratio']['estimate'], 0.5, delta=0.04)
+        self.assertLessEqual(same_summary['sampling']['remote_ratio']['margin'], 0.02)
+
+    def test_analyze_log_content_adaptive_evaluates_each_line_once(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, '2024-05-15_scielo.cl.log.gz')
+            write_generated_log(path, 10000)
+            with gzip.open(path, 'at') as fout:
+                for i in range(10000):
+                    fout.write('10.0.%d.%d - - [15/May/2024:10:00:00 -0300] "GET / HTTP/1.1" 200 1 "-" "-"\n' % ((i >> 8) % 256, i % 256))
+
+            # A tiny margin requires every line, so the passes after the pilot sample complete it
+            summaries = [
+                validator.analyze_log_content_adaptive(path, margin=0.001, pilot_lines=500),
+                validator.analyze_log_content_adaptive(path, total_lines=20000, margin=0.001, pilot_lines=500),
+            ]
+
+        for summary in summaries:
+            self.assertEqual(sum(summary['ips'].values()), 20000)
+            self.assertEqual(sum(summary['datetimes'].values()) + summary['invalid_lines'], 20000)
+            self.assertEqual(summary['sampling']['sample_lines'], 20000)
+
+    def test_log_content_analyzer_skips_lines_of_earlier_passes(self):
+        analyzer = validator.LogContentAnalyzer()
+        analyzer.pilot_line_numbers = frozenset([4])
+        analyzer.evaluated_passes = [(3, 2, 11)]
+        self.assertEqual([n for n in range(1, 16) if analyzer.was_evaluated(n)], [2, 4, 5, 8, 11])
+
+        analyzer.rewind(2, 1)
+        analyzer.add_batch(['line %d' % n for n in range(1, 16)])
+        self.assertEqual(analyzer.invalid_lines, 6)
+
+    def test_pipeline_validate_with_adaptive_sampling(self):
+        results = validator.pipeline_validate(self.log_file_cl_1_default_pattern, adaptive_sampling=True)
+        self.assertIn('sampling', results['content']['summary'])
+        self.assertTrue(results['is_valid']['all'])
+
+    def test_validate_content_within_budget(self):
+        expected = validator.validate_content(self.log_file_br_1)
+        obtained = validator.validate_content(self.log_file_br_1, time_budget=3600, byte_budget=10 ** 9)
+        self.assertDictEqual(obtained, expected)
+
+    def test_validate_content_with_budget_samples_the_same_lines(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, '2024-05-15_scielo.cl.log.gz')
+            for total_lines, sample_size in ((20000, 0.15), (1500, 0.01)):
+                write_generated_log(path, total_lines)
+                expected = validator.validate_content(path, sample_size=sample_size)
+                obtained = validator.validate_content(path, sample_size=sample_size, byte_budget=10 ** 9)
+                self.assertDictEqual(obtained, expected)
+
+    def test_validate_content_exceeding_byte_budget(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, '2024-05-15_scielo.cl.log.gz')
+            write_generated_log(path, 20000)
+            summary = validator.validate_content(path, sample_size=1.0, byte_budget=100000)['summary']
+            with_total = validator.validate_content(path, sample_size=1.0, total_lines=20000, byte_budget=100000)['summary']
+
+        self.assertEqual(summary['budget']['exceeded'], 'bytes')
+        self.assertLessEqual(summary['budget']['bytes_read'], 100000)
+        self.assertEqual(summary['budget']['lines_read'], summary['total_lines'])
+        self.assertGreater(summary['total_lines'], 0)
+        self.assertLess(summary['total_lines'], 20000)
+        self.assertEqual(sum(summary['ips'].values()), summary['total_lines'])
+        self.assertEqual(summary['invalid_lines'], 0)
+        self.assertEqual(with_total['total_lines'], summary['total_lines'])
+
+    def test_validate_content_exceeding_time_budget(self):
+        summary = validator.validate_content(self.log_file_br_1, time_budget=1e-9)['summary']
+        self.assertEqual(summary['budget']['exceeded'], 'time')
+        self.assertEqual(summary['total_lines'], 0)
+        self.assertFalse(validator.validate_ip_distribution({'content': {'summary': summary}}))
+
+    def test_analyze_log_content_adaptive_exceeding_byte_budget(self):
+        summary = validator.analyze_log_content_adaptive(self.log_file_br_1, pilot_lines=500, content_budget=validator.budget.ContentBudget(max_bytes=200000))
+        self.assertEqual(summary['budget']['exceeded'], 'bytes')
+        self.assertEqual(summary['sampling']['sample_lines'], 500)
+        self.assertEqual(summary['total_lines'], summary['budget']['lines_read'])
+
+    def test_pipeline_validate_with_partial_summary(self):
+        results = validator.pipeline_validate(self.log_file_br_1, sample_size=1.0, byte_budget=50000)
+        self.assertIn('budget', results['content']['summary'])
+        self.assertIn('all', results['is_valid'])
+
+    def test_validate_content_with_distinct_ips(self):
+        summary = validator.validate_content(self.log_file_cl_1_default_pattern, sample_size=1.0, distinct_ips=True)['summary']
+        self.assertEqual(summary['distinct_ips'].get_counts(), {'local': 0, 'remote': 12})
+        self.assertEqual(set(summary['distinct_ips'].hours), set(summary['datetimes']))
+
+        without_sketches = validator.validate_content(self.log_file_cl_1_default_pattern, sample_size=1.0)['summary']
+        del summary['distinct_ips']
+        self.assertDictEqual(summary, without_sketches)
+
+    def test_distinct_ip_rule_ignores_busy_addresses(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, '2024-05-15_scielo.cl.log.gz')
+            with gzip.open(path, 'wt') as fout:
+                for i in range(2000):
+                    # A local health checker requests the site far more often than the remote clients
+                    ip = '200.0.%d.%d' % (i // 256, i % 256) if i % 20 == 0 else '10.0.0.1'
+                    fout.write('%s - - [15/May/2024:%02d:00:00 -0300] "GET / HTTP/1.1" 200 10 "-" "Mozilla/5.0"\n' % (ip, i % 24))
+
+            by_lines = validator.pipeline_validate(path, sample_size=1.0)
+            by_distinct_ips = validator.pipeline_validate(path, sample_size=1.0, distinct_ip_rule=True)
+
+        self.assertFalse(by_lines['is_valid']['ips'])
+        self.assertTrue(by_distinct_ips['is_valid']['ips'])
+        counts = by_distinct_ips['content']['summary']['distinct_ips'].get_counts()
+        self.assertEqual(counts['local'], 1)
+        self.assertAlmostEqual(counts['remote'], 100, delta=5)
+
+    def test_validate_content_with_user_agents(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, '2024-05-15_scielo.cl.log.gz')
+            user_agents = ['Mozilla/5.0 (compatible; Googlebot/2.1)', 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) Firefox/120.0', '-']
+            with gzip.open(path, 'wt') as fout:
+                for i in range(3000):
+                    fout.write('200.0.0.1 - - [15/May/2024:10:00:00 -0300] "GET / HTTP/1.1" 200 10 "-" "%s"\n' % user_agents[i % 3])
+
+            summary = validator.validate_content(path, sample_size=1.0, user_agents=True)['summary']
+            without_user_agents = validator.validate_content(path, sample_size=1.0)['summary']
+
+        self.assertEqual(summary.pop('user_agents'), {'bot': 1000, 'human': 1000, 'unknown': 1000})
+        self.assertDictEqual(summary, without_user_agents)
+
+    def test_validate_content_with_invalid_samples(self):
+        valid_line = b'200.0.0.1 - - [15/May/2024:10:00:00 -0300] "GET / HTTP/1.1" 200 10 "-" "Mozilla/5.0"'
+        invalid = {
+            500: b'garbage',
+            1000: valid_line.replace(b'15/May', b'15/Foo'),
+            1500: b'\xff\xfe[15/May/2024]',
+            2999: valid_line[:50],
+        }
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, '2024-05-15_scielo.cl.log.gz')
+            with gzip.open(path, 'wb') as fout:
+                for i in range(1, 3000):
+                    fout.write(invalid.get(i, valid_line) + b'\n')
+            with gzip.open(path, 'rb') as fin:
+                content = fin.read()
+
+            summary = validator.validate_content(path, sample_size=1.0, block_size=4096, invalid_samples=10)['summary']
+            without_samples = validator.validate_content(path, sample_size=1.0)['summary']
+
+        details = summary.pop('invalid_details')
+        self.assertDictEqual(summary, without_samples)
+        self.assertEqual(details['categories'], {'no_match': 1, 'bad_date': 1, 'undecodable': 1, 'truncated': 1})
+        self.assertEqual([s['line_number'] for s in details['samples']], sorted(invalid))
+        for sample in details['samples']:
+            line = invalid[sample['line_number']]
+            self.assertEqual(content[sample['offset']:sample['offset'] + len(line)], line)
+        self.assertEqual(details['samples'][0]['category'], 'no_match')
+        self.assertEqual(details['samples'][0]['text'], 'garbage')
+
+    def test_validate_path_names_matches_validate_path_name(self):
+        paths = [
+            self.log_file_br_1,
+            self.log_file_wi_2_invalid_file_name,
+            'archive/20240102_scielo.cl.log.gz',
+            'archive/no_extension',
+        ]
+        for detect_mime in (False, True):
+            expected = [(p, validator.validate_path_name(p, detect_mime=detect_mime)) for p in paths]
+            obtained = list(validator.validate_path_names(iter(paths), detect_mime=detect_mime, batch_size=3, workers=2))
+            self.assertEqual(obtained, expected)
+
+    def test_pipeline_validate_paths_matches_pipeline_validate(self):
+        paths = list(validator.iter_directory_files('tests/fixtures/logs'))
+        obtained = dict(validator.pipeline_validate_paths(paths, detect_mime=True))
+        for path in paths:
+            expected = validator.pipeline_validate(path, apply_content_validation=False)
+            self.assertDictEqual(obtained[path], expected)
+
+    def test_iter_inventory_paths_skips_blank_lines(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            inventory = os.path.join(tmp_dir, 'inventory.txt')
+            with open(inventory, 'w') as fout:
+                fout.write('2024-05-15_scielo.cl.log.gz\n\n  2024-05-16_scielo.cl.log.gz  \n')
+            self.assertEqual(
+                list(validator.iter_inventory_paths(inventory)),
+                ['2024-05-15_scielo.cl.log.gz', '2024-05-16_scielo.cl.log.gz'])
@@ -0,0 +1,159 @@
+import os
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+from scielo_log_validator import validator, watch
+
+
+class TestWatch(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.directory = self.tmp_dir.name
+        self.log_file = 'tests/fixtures/logs/scielo.cl/2024-05-15_scielo.cl.log.gz'
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def write(self, name, content=b'data'):
+        path = os.path.join(self.directory, name)
+        with open(path, 'wb') as fout:
+            fout.write(content)
+        return path
+
+    def test_is_ignored(self):
+        self.assertTrue(watch.is_ignored('/logs/.2024-05-15_scielo.cl.log.gz.AbC123'))
+        self.assertTrue(watch.is_ignored('/logs/2024-05-15_scielo.cl.log.gz.part'))
+        self.assertFalse(watch.is_ignored('/logs/2024-05-15_scielo.cl.log.gz'))
+
+    def test_debouncer_waits_for_unchanged_files(self):
+        debouncer = watch.Debouncer(delay=5)
+        path = self.write('a.log.gz')
+        debouncer.add(path, now=0)
+        debouncer.add(self.write('.a.log.gz.tmp'), now=0)
+
+        self.assertEqual(debouncer.pop_ready(now=4), [])
+        self.assertEqual(debouncer.get_timeout(now=4), 1)
+
+        # A file still being written is held for another delay
+        self.write('a.log.gz', b'more data')
+        self.assertEqual(debouncer.pop_ready(now=5), [])
+        self.assertEqual(debouncer.pop_ready(now=10), [path])
+        self.assertIsNone(debouncer.get_timeout())
+
+    def test_debouncer_drops_removed_files(self):
+        debouncer = watch.Debouncer(delay=0)
+        path = self.write('a.log.gz')
+        debouncer.add(path, now=0)
+        os.remove(path)
+        self.assertEqual(debouncer.pop_ready(now=1), [])
+        self.assertEqual(debouncer.pending, {})
+
+    def test_polling_watcher_reports_new_and_changed_files(self):
+        self.write('old.log.gz')
+        watcher = watch.PollingWatcher([self.directory], interval=0)
+        self.assertEqual(watcher.poll(0), [])
+
+        os.mkdir(os.path.join(self.directory, 'sub'))
+        new_path = self.write(os.path.join('sub', 'new.log.gz'))
+        self.assertEqual(watcher.poll(0), [new_path])
+
+        changed_path = self.write('old.log.gz', b'changed content')
+        self.assertEqual(watcher.poll(0), [changed_path])
+
+    @unittest.skipUnless(watch.load_libc() is not None, 'inotify is not available')
+    def test_inotify_watcher_reports_closed_and_moved_files(self):
+        watcher = watch.InotifyWatcher([self.directory])
+        try:
+            closed_path = self.write('closed.log.gz')
+            moved_path = os.path.join(self.directory, 'moved.log.gz')
+            os.rename(self.write('.moved.log.gz.tmp'), moved_path)
+            os.mkdir(os.path.join(self.directory, 'sub'))
+
+            paths = []
+            deadline = time.monotonic() + 5
+            while time.monotonic() < deadline and moved_path not in paths:
+                paths.extend(watcher.poll(0.1))
+            self.assertIn(closed_path, paths)
+            self.assertIn(moved_path, paths)
+
+            # New subdirectories are watched too
+            nested_path = self.write(os.path.join('sub', 'nested.log.gz'))
+            while time.monotonic() < deadline and nested_path not in paths:
+                paths.extend(watcher.poll(0.1))
+            self.assertIn(nested_path, paths)
+        finally:
+            watcher.close()
+
+    def test_watch_validates_files_as_they_land(self):
+        results = {}
+        stop = threading.Event()
+
+        def on_result(path, file_results):
+            results[path] = file_results
+            stop.set()
+
+        target = os.path.join(self.directory, os.path.basename(self.log_file))
+
+        def upload():
+            time.sleep(0.2)
+            shutil.copy(self.log_file, target + '.part')
+            os.rename(target + '.part', target)
+
+        uploader = threading.Thread(target=upload)
+        uploader.start()
+
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            validated = watch.watch(
+                [self.directory],
+                partial(validator.pipeline_validate, sample_size=1.0),
+                on_result,
+                executor,
+                watcher=watch.PollingWatcher([self.directory], interval=0.05),
+                debounce=0.1,
+                should_stop=stop.is_set,
+                poll_timeout=0.05)
+        uploader.join()
+
+        self.assertEqual(validated, 1)
+        self.assertEqual(list(results), [target])
+        self.assertDictEqual(results[target], validator.pipeline_validate(self.log_file, sample_size=1.0))
+
+    def test_interrupted_watch_reports_running_validations(self):
+        results = {}
+        started = threading.Event()
+
+        def validate(path):
+            started.set()
+            time.sleep(0.3)
+            return {'validated': path}
+
+        def should_stop():
+            if started.is_set():
+                raise KeyboardInterrupt
+            return False
+
+        target = os.path.join(self.directory, '2024-02-20_caribbean.scielo.org.1.log.gz')
+        writer = threading.Timer(0.2, self.write, args=(os.path.basename(target),))
+        writer.start()
+
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            validated = watch.watch(
+                [self.directory],
+                validate,
+                results.__setitem__,
+                executor,
+                watcher=watch.PollingWatcher([self.directory], interval=0.05),
+                debounce=0.1,
+                should_stop=should_stop,
+                poll_timeout=0.05)
+        writer.join()
+
+        self.assertEqual(validated, 1)
+        self.assertEqual(results, {target: {'validated': target}})
@@ -0,0 +1,118 @@
+from functools import partial
+
+import os
+import tempfile
+import threading
+import unittest
+
+from scielo_log_validator import validator, work_queue
+
+
+FIXTURES_DIR = 'tests/fixtures/logs'
+
+
+class FakeClock:
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestWorkQueue(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.queue_path = os.path.join(self.tmp_dir.name, 'queue.db')
+        self.clock = FakeClock()
+        self.queue = work_queue.SqliteWorkQueue(self.queue_path, lease_seconds=60, max_attempts=2, clock=self.clock)
+        self.paths = sorted(
+            os.path.join(root, f) for root, _, files in os.walk(FIXTURES_DIR) for f in files)
+
+    def tearDown(self):
+        self.queue.close()
+        self.tmp_dir.cleanup()
+
+    def test_enqueue_is_idempotent(self):
+        self.assertEqual(self.queue.enqueue(self.paths), len(self.paths))
+        self.assertEqual(self.queue.enqueue(self.paths), 0)
+        self.assertEqual(self.queue.get_counts()[work_queue.JOB_PENDING], len(self.paths))
+
+    def test_leases_are_exclusive_until_they_expire(self):
+        self.queue.enqueue(['a.log', 'b.log'])
+        self.assertEqual(self.queue.lease('w1', 1), ['a.log'])
+        self.assertEqual(self.queue.lease('w2', 2), ['b.log'])
+        self.assertEqual(self.queue.lease('w3', 2), [])
+
+        self.clock.now += 30
+        self.assertEqual(self.queue.heartbeat('w1', ['a.log']), 1)
+        self.clock.now += 40
+        # The lease of w2 expired, the one renewed by w1 did not
+        self.assertEqual(self.queue.lease('w3', 2), ['b.log'])
+        self.assertEqual(self.queue.heartbeat('w2', ['b.log']), 0)
+
+    def test_abandoned_jobs_fail_after_max_attempts(self):
+        self.queue.enqueue(['a.log'])
+        for worker in ('w1', 'w2'):
+            self.assertEqual(self.queue.lease(worker), ['a.log'])
+            self.clock.now += 61
+        self.assertEqual(self.queue.lease('w3'), [])
+        self.assertEqual(list(self.queue.iter_failures()), [('a.log', 'Lease expired')])
+
+    def test_failed_jobs_are_retried(self):
+        self.queue.enqueue(['a.log'])
+        self.queue.lease('w1')
+        self.assertEqual(self.queue.fail('w1', 'a.log', 'OSError: timeout'), work_queue.JOB_PENDING)
+        self.queue.lease('w2')
+        self.assertIsNone(self.queue.fail('w1', 'a.log', 'OSError: timeout'))
+        self.assertEqual(self.queue.fail('w2', 'a.log', 'OSError: timeout'), work_queue.JOB_FAILED)
+        self.assertEqual(list(self.queue.iter_failures()), [('a.log', 'OSError: timeout')])
+
+    def test_results_are_written_once(self):
+        path = self.paths[0]
+        results = validator.pipeline_validate(path)
+        self.queue.enqueue([path])
+        self.queue.lease('w1')
+        self.clock.now += 61
+        self.queue.lease('w2')
+
+        self.assertTrue(self.queue.complete('w2', path, results))
+        self.assertFalse(self.queue.complete('w1', path, {'late': True}))
+        self.assertEqual(list(self.queue.iter_results()), [(path, results)])
+
+    def test_release_returns_jobs_without_counting_attempts(self):
+        self.queue.enqueue(['a.log', 'b.log'])
+        self.queue.lease('w1', 2)
+        self.assertEqual(self.queue.release('w1'), 2)
+        self.assertEqual(self.queue.get_counts()[work_queue.JOB_PENDING], 2)
+        for worker in ('w2', 'w3'):
+            self.queue.lease(worker, 2)
+            self.clock.now += 61
+        self.assertEqual(self.queue.get_counts()[work_queue.JOB_FAILED], 0)
+
+    def test_workers_drain_the_queue(self):
+        self.queue.enqueue(self.paths + ['missing.log.gz'])
+        validate = partial(validator.pipeline_validate, sample_size=0.5)
+        validated = []
+
+        def run(worker):
+            # Each thread opens its own queue, as workers on other nodes do
+            queue = work_queue.SqliteWorkQueue(self.queue_path, max_attempts=2, clock=self.clock)
+            validated.append(work_queue.run_worker(queue, validate, worker=worker, heartbeat_seconds=0.01, poll_seconds=0.01))
+            queue.close()
+
+        threads = [threading.Thread(target=run, args=('w%d' % i,)) for i in range(3)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(sum(validated), len(self.paths))
+        self.assertEqual(self.queue.get_counts(), {'pending': 0, 'leased': 0, 'done': len(self.paths), 'failed': 1})
+        self.assertEqual(dict(self.queue.iter_results()), {p: validate(p) for p in self.paths})
+        self.assertEqual([p for p, _ in self.queue.iter_failures()], ['missing.log.gz'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,91 @@
+import os
+import tempfile
+import time
+import unittest
+
+from functools import partial
+
+from scielo_log_validator import validator, worker_pool
+
+
+FIXTURES_DIR = 'tests/fixtures/logs'
+
+LEAKED = []
+
+
+def crash_once(marker, path):
+    # The first process to validate a file dies, as if it was killed by the OOM killer
+    if not os.path.exists(marker):
+        open(marker, 'w').close()
+        os._exit(1)
+    return {'path': path}
+
+
+def allocate(size, path):
+    data = bytearray(size)
+    for i in range(0, size, 4096):
+        data[i] = 1
+    time.sleep(1)
+    return {'path': path}
+
+
+def leak(size, path):
+    LEAKED.append(b'x' * size)
+    return {'path': path}
+
+
+@unittest.skipUnless(worker_pool.get_rss() is not None, 'the resident memory of processes is not available')
+class TestRecyclingWorkerPool(unittest.TestCase):
+
+    def setUp(self):
+        self.paths = sorted(os.path.join(root, f) for root, _, files in os.walk(FIXTURES_DIR) for f in files)
+
+    def test_results_match_sequential_validation(self):
+        validate = partial(validator.pipeline_validate, sample_size=0.5)
+        with worker_pool.RecyclingWorkerPool(validate, workers=2, max_files=2) as pool:
+            results = dict(pool.imap_unordered(self.paths + ['missing.log.gz']))
+            stats = pool.get_stats()
+
+        self.assertIn('error', results.pop('missing.log.gz'))
+        self.assertEqual(results, {p: validate(p) for p in self.paths})
+        self.assertEqual(sum(s['files'] for s in stats), len(self.paths) + 1)
+        self.assertEqual([s['restarts']['max_files'] for s in stats], [s['files'] // 2 for s in stats])
+        self.assertTrue(all(s['peak_rss'] > 0 for s in stats))
+
+    def test_files_of_crashed_workers_are_retried(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            validate = partial(crash_once, os.path.join(tmp_dir, 'crashed'))
+            with worker_pool.RecyclingWorkerPool(validate, workers=1, initializer=None) as pool:
+                results = list(pool.imap_unordered(['a.log', 'b.log']))
+                stats, = pool.get_stats()
+
+        self.assertEqual(results, [('a.log', {'path': 'a.log'}), ('b.log', {'path': 'b.log'})])
+        self.assertEqual(stats['restarts']['crash'], 1)
+        self.assertEqual(stats['processes'], 2)
+
+    def test_watchdog_stops_workers_above_the_rss_ceiling(self):
+        max_rss = worker_pool.get_rss() + 64 * 1024 * 1024
+        validate = partial(allocate, 128 * 1024 * 1024)
+        with worker_pool.RecyclingWorkerPool(validate, workers=1, max_rss=max_rss, initializer=None, watchdog_interval=0.05, max_retries=1) as pool:
+            results = list(pool.imap_unordered(['a.log']))
+            stats, = pool.get_stats()
+
+        self.assertEqual(results, [('a.log', {'error': 'Worker process exceeded %d MB of resident memory' % (max_rss // (1024 * 1024))})])
+        self.assertEqual(stats['restarts']['watchdog'], 2)
+        self.assertGreater(stats['peak_rss'], max_rss)
+
+    def test_workers_retire_above_the_rss_ceiling(self):
+        max_rss = worker_pool.get_rss() + 48 * 1024 * 1024
+        validate = partial(leak, 32 * 1024 * 1024)
+        paths = ['%d.log' % i for i in range(4)]
+        with worker_pool.RecyclingWorkerPool(validate, workers=1, max_rss=max_rss, initializer=None, watchdog_interval=60) as pool:
+            results = dict(pool.imap_unordered(paths))
+            stats, = pool.get_stats()
+
+        self.assertEqual(results, {p: {'path': p} for p in paths})
+        self.assertEqual(stats['restarts']['rss'], 2)
+        self.assertEqual(stats['processes'], 2)
+
+
+if __name__ == '__main__':
+    unittest.main()